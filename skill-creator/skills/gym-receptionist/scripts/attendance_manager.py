@@ -4,37 +4,407 @@ Gym Attendance Manager
 Tracks member attendance, generates reports, and manages check-in/check-out processes.
 """
 
-import json
+import contextlib
 import datetime
-import csv
+import threading
 from pathlib import Path
 
+from columnar import AttendanceColumns
+from csv_export import ATTENDANCE_FIELDS, report, stream_csv
+from member_registry import get_registry
+from occupancy import OccupancyTracker
+from records import (DAY_MICROS, HOUR_MICROS, MISSING_TIME, AttendanceTable, day_text,
+                     hours_between, parse_time, to_micros)
+from storage import open_store
+
+class AttendanceLog:
+    """Compact attendance history with lazily built lookup indexes
+
+    Rows are kept in the order they were recorded, which is check-in order
+    unless a batch was uploaded late. `order["max_lag"]` is the most, in
+    microseconds, that any row's check-in trails one recorded before it, so
+    scans back from the newest row know how far they must go.
+    """
+
+    def __init__(self, records, order=None):
+        self.records = records if isinstance(records, AttendanceTable) else AttendanceTable(records)
+        self.order = order if order is not None else {}
+        if "max_lag" not in self.order:
+            # Files saved before the lag was kept are measured once
+            self.order["max_lag"] = self._measure_lag()
+        self._newest = None
+        self._indexed = False
+        self._open_sessions = {}
+        self._open_records = {}
+        self._date_index = {}
+        self._hourly_index = {}
+        self._month_index = {}
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _ensure_indexes(self):
+        """Build the indexes on first use after a load"""
+        if self._indexed:
+            return
+        self._indexed = True
+        check_outs = self.records.columns["check_out"]
+        for position in range(len(self.records)):
+            self._index_record(position)
+            if check_outs[position] == MISSING_TIME:
+                # Later open records win over stale ones in legacy files
+                self._open_sessions[self.records.get(position, "member_id")] = position
+
+    def _date(self, position):
+        """ISO date of a record"""
+        return day_text(self.records.columns["check_in"][position] // DAY_MICROS)
+
+    def _index_record(self, position):
+        """Add an attendance record to the date, hour and month indexes"""
+        date = self._date(position)
+        hour = self.records.columns["check_in"][position] // HOUR_MICROS % 24
+        self._date_index.setdefault(date, []).append(position)
+        hourly = self._hourly_index.setdefault(date, {})
+        hourly[hour] = hourly.get(hour, 0) + 1
+
+        # Month rollup doubles as the per-member visits-by-month counter
+        member_id = self.records.get(position, "member_id")
+        month_stats = self._month_index.setdefault(date[:7], {})
+        if member_id not in month_stats:
+            month_stats[member_id] = {
+                "name": self.records.get(position, "name"),
+                "visits": 0,
+                "total_duration": 0
+            }
+        stats = month_stats[member_id]
+        stats["visits"] += 1
+        stats["total_duration"] += self.records.columns["duration"][position]
+
+    def _measure_lag(self):
+        """Largest amount a row's check-in trails an earlier row's"""
+        lag = 0
+        newest = None
+        for position in range(len(self.records)):
+            check_in = self.records.time(position, "check_in")
+            if newest is None or check_in > newest:
+                newest = check_in
+            else:
+                lag = max(lag, newest - check_in)
+        return lag
+
+    def _newest_check_in(self):
+        """Latest check-in recorded so far, found by scanning back from the last row"""
+        if self._newest is None:
+            lag = self.order["max_lag"]
+            for position in range(len(self.records) - 1, -1, -1):
+                check_in = self.records.time(position, "check_in")
+                if self._newest is None or check_in > self._newest:
+                    self._newest = check_in
+                # No row before this one checked in later than check_in + lag
+                if check_in + lag <= self._newest:
+                    break
+        return self._newest
+
+    def append(self, record):
+        """Add a new open attendance record"""
+        if not self.records.paged:
+            self._ensure_indexes()
+        check_in = to_micros(record["check_in"])
+        newest = self._newest_check_in()
+        if newest is not None and check_in < newest:
+            self.order["max_lag"] = max(self.order["max_lag"], newest - check_in)
+        else:
+            self._newest = check_in
+        position = self.records.append(record)
+        # Open visits keep their dict too, so check-out needn't decode the row
+        self._open_records[record["member_id"]] = record
+        if self._indexed:
+            self._open_sessions[record["member_id"]] = position
+            self._index_record(position)
+        return record
+
+    def _open_position(self, member_id):
+        """Position of the member's open record, taking it out of the open sessions"""
+        if self._indexed or not self.records.paged:
+            self._ensure_indexes()
+            return self._open_sessions.pop(member_id, None)
+        # Paged history: the open visit is normally among the last few rows
+        for position in range(len(self.records) - 1, -1, -1):
+            record = self.records.row(position)
+            if record["member_id"] == member_id and record["check_out"] is None:
+                return position
+        return None
+
+    def close_session(self, member_id, timestamp):
+        """Close the member's open record, if the data has one"""
+        position = self._open_position(member_id)
+        if position is None:
+            return None
+
+        check_out = to_micros(timestamp)
+        duration = hours_between(self.records.time(position, "check_in"), check_out)
+        self.records.set(position, "check_out", timestamp)
+        self.records.set(position, "duration", duration)
+        if self._indexed:
+            self._month_index[self._date(position)[:7]][member_id]["total_duration"] += duration
+
+        record = self._open_records.pop(member_id, None) or self.records.row(position)
+        record["check_out"] = timestamp
+        record["duration"] = duration
+        return record
+
+    def for_date(self, date):
+        """Attendance records for a single day"""
+        self._ensure_indexes()
+        return [self.records.row(position) for position in self._date_index.get(date, [])]
+
+    def hourly_counts(self, date):
+        """Check-ins per hour for a single day"""
+        self._ensure_indexes()
+        return dict(self._hourly_index.get(date, {}))
+
+    def for_month(self, month):
+        """Attendance records whose date starts with the given prefix"""
+        self._ensure_indexes()
+        return [self.records.row(position)
+                for date in sorted(self._date_index)
+                if date.startswith(month)
+                for position in self._date_index[date]]
+
+    def month_stats(self, month):
+        """Per-member visits and duration, merged across matching months"""
+        self._ensure_indexes()
+        member_stats = {}
+        for month_key in sorted(self._month_index):
+            if not month_key.startswith(month):
+                continue
+            for member_id, stats in self._month_index[month_key].items():
+                if member_id not in member_stats:
+                    member_stats[member_id] = {
+                        "name": stats["name"],
+                        "visits": 0,
+                        "total_duration": 0
+                    }
+                member_stats[member_id]["visits"] += stats["visits"]
+                member_stats[member_id]["total_duration"] += stats["total_duration"]
+        return member_stats
+
+    def member_visits(self, member_id, month):
+        """Number of visits a member made in one month"""
+        if self.records.paged and not self._indexed:
+            # Count back through the month rather than page in the whole history
+            start = to_micros(month + "-01")
+            visits = 0
+            for record in self._newest_since(start):
+                if record["member_id"] == member_id and record["check_in"][:7] == month:
+                    visits += 1
+            return visits
+        self._ensure_indexes()
+        return self._month_index.get(month, {}).get(member_id, {}).get("visits", 0)
+
+    def iter_between(self, start_date=None, end_date=None, member_ids=None):
+        """Yield records in date order, optionally limited to a date range and members"""
+        members = set(member_ids) if member_ids else None
+        if start_date is None and end_date is None:
+            positions = range(len(self.records))
+        else:
+            self._ensure_indexes()
+            dates = sorted(date for date in self._date_index
+                           if (start_date is None or date >= start_date[:10])
+                           and (end_date is None or date <= end_date[:10]))
+            positions = (position for date in dates for position in self._date_index[date])
+        for position in positions:
+            if members is None or self.records.get(position, "member_id") in members:
+                yield self.records.row(position)
+
+    def _newest_since(self, start):
+        """Rows checked in at or after `start` microseconds, last recorded first"""
+        lag = self.order["max_lag"]
+        for position in range(len(self.records) - 1, -1, -1):
+            check_in = self.records.time(position, "check_in")
+            if check_in >= start:
+                yield self.records.row(position)
+            elif check_in + lag < start:
+                # Every earlier row checked in before start too
+                return
+
+    def since(self, date):
+        """Records dated on or after the given day in check-in order, scanning back from the newest"""
+        records = list(self._newest_since(to_micros(date)))[::-1]
+        records.sort(key=lambda record: to_micros(record["check_in"]))
+        return records
+
 class GymAttendanceManager:
-    def __init__(self, gym_name="Default Gym"):
+    def __init__(self, gym_name="Default Gym", storage="journal"):
         self.gym_name = gym_name
         self.data_file = Path("gym_attendance_data.json")
+        # Guards the in-memory indexes for callers sharing the manager between
+        # threads; disk writes happen outside it, so readers never wait on them
+        self.lock = threading.RLock()
+        self.store = open_store(storage, self.data_file, replay=self.replay,
+                                on_events=self._apply_foreign, on_merge=self._adopt,
+                                history=("attendance",))
+        self.registry = get_registry("sqlite" if storage == "sqlite" else "journal")
+        self.members = self.registry.members
         self.load_data()
 
     def load_data(self):
         """Load existing attendance data"""
-        if self.data_file.exists():
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+        self.data = self.store.load({
+            "attendance": [],
+            "check_ins": {}
+        })
+        self._open_log()
+        self._load_occupancy()
+
+        # Older data files carried their own copy of the member table
+        legacy_members = self.data.pop("members", None)
+        if legacy_members is not None:
+            self.registry.import_members(legacy_members)
+            self.save_data()
+
+    def _open_log(self):
+        """Attach the attendance history, kept in SQL or in memory"""
+        if self.store.queryable:
+            self.log = self.store.attendance_log()
         else:
-            self.data = {
-                "members": {},
-                "attendance": [],
-                "check_ins": {}
-            }
+            self.log = AttendanceLog(self.data["attendance"], self.data.get("attendance_order"))
+            self.data["attendance"] = self.log.records
+            self.data["attendance_order"] = self.log.order
+
+    def _load_occupancy(self):
+        """Rebuild live occupancy and the heatmap window from loaded data"""
+        self.occupancy = OccupancyTracker()
+        window_start = datetime.datetime.now() - datetime.timedelta(hours=self.occupancy.window_hours)
+        self.occupancy.load(self.data["check_ins"],
+                            self.log.since(window_start.strftime("%Y-%m-%d")))
+
+    def _adopt(self, data):
+        """Take over data merged with another process's save"""
+        with self.lock:
+            self.data = data
+            # Our rows now follow theirs, so how far out of order they are is measured again
+            data.pop("attendance_order", None)
+            self._open_log()
+            self._load_occupancy()
+
+    def _apply_foreign(self, data, events):
+        """Apply check-ins and check-outs journaled by another process
+
+        Member stats are left alone; the registry picks up the other
+        process's updates to them itself.
+        """
+        with self.lock:
+            members, self.members = self.members, {}
+            try:
+                for event in events:
+                    self._apply_event(event)
+            finally:
+                self.members = members
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Lock the attendance and member files, both caught up on other processes' writes"""
+        with self.store.transaction(self.data), self.registry.transaction():
+            yield
+
+    def occupancy_snapshot(self):
+        """Current head count, per-membership counts and the 7x24 heatmap"""
+        with self.lock:
+            return self.occupancy.snapshot()
 
     def save_data(self):
         """Save attendance data to file"""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        self.store.save(self.data)
+
+    def close(self):
+        """Flush pending writes and release the data store"""
+        self.store.close()
+
+    @classmethod
+    def replay(cls, data, events):
+        """Apply journaled events on top of a loaded snapshot"""
+        manager = cls.__new__(cls)
+        manager.data = data
+        manager.members = data.get("members", {})
+        manager.log = AttendanceLog(data["attendance"], data.get("attendance_order"))
+        data["attendance"] = manager.log.records
+        data["attendance_order"] = manager.log.order
+        manager.occupancy = None
+        for event in events:
+            manager._apply_event(event)
+        return manager.data
+
+    def _apply_event(self, event):
+        """Apply a single recorded change to the in-memory data"""
+        op = event["op"]
+        if op == "register":
+            return self._apply_register(event["member_id"], event["member"])
+        if op == "check_in":
+            member = self.members.get(event["member_id"], {})
+            return self._apply_check_in(event["member_id"], event["time"],
+                                        event.get("name", member.get("name")),
+                                        event.get("membership_type", member.get("membership_type")))
+        if op == "check_out":
+            return self._apply_check_out(event["member_id"], event["time"])
+        raise ValueError(f"Unknown attendance event: {op}")
+
+    def _apply_register(self, member_id, member):
+        self.members[member_id] = member
+        return member
+
+    def _apply_check_in(self, member_id, timestamp, name, membership_type):
+        current_time = datetime.datetime.fromisoformat(timestamp)
+
+        # Record attendance first, so a failure leaves the member checked out
+        attendance_record = self.log.append({
+            "member_id": member_id,
+            "name": name,
+            "check_in": timestamp,
+            "check_out": None,
+            "duration": 0,
+            "date": current_time.strftime("%Y-%m-%d")
+        })
 
-    def register_member(self, member_id, name, membership_type, phone, email):
-        """Register a new member"""
-        self.data["members"][member_id] = {
+        # Record check-in
+        self.data["check_ins"][member_id] = {
+            "name": name,
+            "check_in_time": timestamp,
+            "membership_type": membership_type
+        }
+
+        # Update member stats
+        member = self.members.get(member_id)
+        if member is not None:
+            member["total_visits"] += 1
+            member["last_visit"] = timestamp
+
+        if self.occupancy is not None:
+            self.occupancy.check_in(member_id, current_time, membership_type)
+        return attendance_record
+
+    def _apply_check_out(self, member_id, timestamp):
+        record = self.log.close_session(member_id, timestamp)
+        if self.occupancy is not None:
+            self.occupancy.check_out(member_id)
+
+        # Remove from check-ins
+        del self.data["check_ins"][member_id]
+        return record
+
+    def _record(self, event):
+        """Apply an event and persist it through the store"""
+        with self.lock:
+            result = self._apply_event(event)
+        self.store.record(self.data, event)
+        return result
+
+    def register_member(self, member_id, name, membership_type, phone, email, quiet=False):
+        """Register a new member; quiet skips the confirmation message"""
+        self.registry.register(member_id, {
             "name": name,
             "membership_type": membership_type,
             "phone": phone,
@@ -42,118 +412,171 @@ class GymAttendanceManager:
             "join_date": datetime.datetime.now().isoformat(),
             "total_visits": 0,
             "last_visit": None
-        }
-        self.save_data()
-        print(f"Member {name} (ID: {member_id}) registered successfully!")
+        })
+        if not quiet:
+            print(f"Member {name} (ID: {member_id}) registered successfully!")
 
-    def check_in(self, member_id):
-        """Check member into gym"""
-        if member_id not in self.data["members"]:
-            print(f"Error: Member ID {member_id} not found!")
-            return False
+    def _check_in_error(self, member_id):
+        if member_id not in self.members:
+            return f"Member ID {member_id} not found!"
+        if member_id in self.data["check_ins"]:
+            return f"{self.members[member_id]['name']} is already checked in!"
+        return None
 
-        current_time = datetime.datetime.now()
-        member = self.data["members"][member_id]
+    def _check_out_error(self, member_id, timestamp=None):
+        if member_id not in self.data["check_ins"]:
+            return f"Member ID {member_id} is not checked in!"
+        if timestamp is not None and timestamp < self.data["check_ins"][member_id]["check_in_time"]:
+            return f"Check-out for {member_id} is earlier than their check-in!"
+        return None
 
-        # Check if already checked in
-        if member_id in self.data["check_ins"]:
-            print(f"Error: {member['name']} is already checked in!")
-            return False
+    def _check_in_event(self, member_id, timestamp):
+        member = self.members[member_id]
+        return {"op": "check_in", "member_id": member_id, "time": timestamp,
+                "name": member["name"], "membership_type": member["membership_type"]}
 
-        # Record check-in
-        self.data["check_ins"][member_id] = {
-            "name": member["name"],
-            "check_in_time": current_time.isoformat(),
-            "membership_type": member["membership_type"]
-        }
+    def check_in(self, member_id):
+        """Check member into gym"""
+        with self.transaction():
+            error = self._check_in_error(member_id)
+            if error:
+                print(f"Error: {error}")
+                return False
 
-        # Record attendance
-        attendance_record = {
-            "member_id": member_id,
-            "name": member["name"],
-            "check_in": current_time.isoformat(),
-            "check_out": None,
-            "duration": 0,
-            "date": current_time.strftime("%Y-%m-%d")
-        }
-        self.data["attendance"].append(attendance_record)
+            current_time = datetime.datetime.now()
+            member = self.members[member_id]
 
-        # Update member stats
-        member["total_visits"] += 1
-        member["last_visit"] = current_time.isoformat()
-        self.save_data()
+            self._record(self._check_in_event(member_id, current_time.isoformat()))
+            self.registry.count_visits({member_id: (1, member["last_visit"])})
 
-        print(f"Welcome {member['name']}! Checked in at {current_time.strftime('%H:%M')}")
-        return True
+            print(f"Welcome {member['name']}! Checked in at {current_time.strftime('%H:%M')}")
+            return True
 
     def check_out(self, member_id):
         """Check member out of gym"""
-        if member_id not in self.data["check_ins"]:
-            print(f"Error: Member ID {member_id} is not checked in!")
-            return False
-
-        current_time = datetime.datetime.now()
-        check_in_record = self.data["check_ins"][member_id]
-        member = self.data["members"][member_id]
-
-        # Find attendance record
-        for record in self.data["attendance"]:
-            if record["member_id"] == member_id and record["check_out"] is None:
-                check_in_time = datetime.datetime.fromisoformat(record["check_in"])
-                duration = (current_time - check_in_time).total_seconds() / 3600
-                record["check_out"] = current_time.isoformat()
-                record["duration"] = round(duration, 2)
-                break
-
-        # Remove from check-ins
-        del self.data["check_ins"][member_id]
-        self.save_data()
-
-        print(f"Goodbye {member['name']}! Session duration: {record['duration']} hours")
-        return True
+        with self.transaction():
+            error = self._check_out_error(member_id)
+            if error:
+                print(f"Error: {error}")
+                return False
+
+            current_time = datetime.datetime.now()
+            member = self.members[member_id]
+
+            record = self._record({"op": "check_out", "member_id": member_id,
+                                   "time": current_time.isoformat()})
+
+            duration = record["duration"] if record else 0
+            print(f"Goodbye {member['name']}! Session duration: {duration} hours")
+            return True
+
+    def apply_events(self, events, quiet=False):
+        """Apply a batch of timestamped check-in/check-out events
+
+        Events are dicts with "op" ("check_in" or "check_out"), "member_id"
+        and an ISO "time"; times with a UTC offset are converted to local
+        time. They are applied in time order, invalid events are reported
+        without aborting the batch, and everything is persisted once. quiet
+        skips the printed summary.
+        """
+        events = list(events)
+        errors = []
+        valid = []
+        for index, event in enumerate(events):
+            op = event.get("op")
+            if op not in ("check_in", "check_out"):
+                errors.append({"index": index, "member_id": event.get("member_id"),
+                               "error": f"Unknown event type: {op}"})
+                continue
+            try:
+                when = parse_time(event["time"])
+            except (KeyError, AttributeError, TypeError, ValueError):
+                errors.append({"index": index, "member_id": event.get("member_id"),
+                               "error": f"Invalid timestamp: {event.get('time')}"})
+                continue
+            valid.append((when, index, op, event.get("member_id")))
+
+        with self.transaction():
+            applied = []
+            visits = {}
+            with self.lock:
+                for when, index, op, member_id in sorted(valid, key=lambda item: item[:2]):
+                    timestamp = when.isoformat()
+                    if op == "check_in":
+                        error = self._check_in_error(member_id)
+                    else:
+                        error = self._check_out_error(member_id, timestamp)
+                    if error:
+                        errors.append({"index": index, "member_id": member_id, "error": error})
+                        continue
+
+                    if op == "check_in":
+                        journal_event = self._check_in_event(member_id, timestamp)
+                        visits[member_id] = visits.get(member_id, 0) + 1
+                    else:
+                        journal_event = {"op": op, "member_id": member_id, "time": timestamp}
+                    self._apply_event(journal_event)
+                    applied.append(journal_event)
+
+            self.store.record_many(self.data, applied)
+            self.registry.count_visits({
+                member_id: (count, self.members[member_id]["last_visit"])
+                for member_id, count in visits.items()
+            })
+
+        errors.sort(key=lambda error: error["index"])
+        if not quiet:
+            print(f"Processed {len(events)} events: {len(applied)} applied, {len(errors)} rejected")
+        return {"applied": len(applied), "errors": errors}
+
+    def check_in_many(self, swipes):
+        """Check in (member_id, timestamp) pairs as one batch"""
+        return self.apply_events([{"op": "check_in", "member_id": member_id, "time": timestamp}
+                                  for member_id, timestamp in swipes])
+
+    def check_out_many(self, swipes):
+        """Check out (member_id, timestamp) pairs as one batch"""
+        return self.apply_events([{"op": "check_out", "member_id": member_id, "time": timestamp}
+                                  for member_id, timestamp in swipes])
 
     def get_member_status(self, member_id):
         """Get member's current status and statistics"""
-        if member_id not in self.data["members"]:
-            return None
-
-        member = self.data["members"][member_id]
-        is_checked_in = member_id in self.data["check_ins"]
-
-        # Calculate monthly visits
-        current_month = datetime.datetime.now().strftime("%Y-%m")
-        monthly_visits = sum(1 for record in self.data["attendance"]
-                           if record["member_id"] == member_id and
-                           record["date"].startswith(current_month))
-
-        return {
-            "name": member["name"],
-            "membership_type": member["membership_type"],
-            "total_visits": member["total_visits"],
-            "monthly_visits": monthly_visits,
-            "last_visit": member.get("last_visit"),
-            "is_checked_in": is_checked_in,
-            "phone": member["phone"],
-            "email": member["email"]
-        }
+        with self.lock:
+            if member_id not in self.members:
+                return None
+
+            member = self.members[member_id]
+            is_checked_in = member_id in self.data["check_ins"]
+
+            # Calculate monthly visits
+            current_month = datetime.datetime.now().strftime("%Y-%m")
+            monthly_visits = self.log.member_visits(member_id, current_month)
+
+            return {
+                "name": member["name"],
+                "membership_type": member["membership_type"],
+                "total_visits": member["total_visits"],
+                "monthly_visits": monthly_visits,
+                "last_visit": member.get("last_visit"),
+                "is_checked_in": is_checked_in,
+                "phone": member["phone"],
+                "email": member["email"]
+            }
 
-    def generate_daily_report(self, date=None):
-        """Generate daily attendance report"""
+    def generate_daily_report(self, date=None, log=None):
+        """Generate daily attendance report, optionally from a columnar export"""
         if date is None:
             date = datetime.datetime.now().strftime("%Y-%m-%d")
+        if log is None:
+            log = self.log
 
-        daily_attendance = [record for record in self.data["attendance"]
-                          if record["date"] == date]
+        daily_attendance = log.for_date(date)
 
         print(f"\n=== DAILY ATTENDANCE REPORT - {date} ===")
         print(f"Total Visitors: {len(daily_attendance)}")
 
         # Group by hour
-        hourly_stats = {}
-        for record in daily_attendance:
-            check_in = datetime.datetime.fromisoformat(record["check_in"])
-            hour = check_in.hour
-            hourly_stats[hour] = hourly_stats.get(hour, 0) + 1
+        hourly_stats = log.hourly_counts(date)
 
         print("\nPeak Hours:")
         for hour in sorted(hourly_stats.keys()):
@@ -161,28 +584,19 @@ class GymAttendanceManager:
 
         return daily_attendance
 
-    def generate_monthly_report(self, month=None):
-        """Generate monthly attendance report"""
+    def generate_monthly_report(self, month=None, log=None):
+        """Generate monthly attendance report, optionally from a columnar export"""
         if month is None:
             month = datetime.datetime.now().strftime("%Y-%m")
+        if log is None:
+            log = self.log
 
-        monthly_attendance = [record for record in self.data["attendance"]
-                            if record["date"].startswith(month)]
+        monthly_attendance = log.for_month(month)
 
         print(f"\n=== MONTHLY ATTENDANCE REPORT - {month} ===")
 
         # Member statistics
-        member_stats = {}
-        for record in monthly_attendance:
-            member_id = record["member_id"]
-            if member_id not in member_stats:
-                member_stats[member_id] = {
-                    "name": record["name"],
-                    "visits": 0,
-                    "total_duration": 0
-                }
-            member_stats[member_id]["visits"] += 1
-            member_stats[member_id]["total_duration"] += record["duration"]
+        member_stats = log.month_stats(month)
 
         print(f"Total Visits: {len(monthly_attendance)}")
         print(f"Unique Members: {len(member_stats)}")
@@ -197,17 +611,20 @@ class GymAttendanceManager:
 
         return monthly_attendance
 
-    def export_to_csv(self, filename="gym_attendance_export.csv"):
-        """Export attendance data to CSV"""
-        with open(filename, 'w', newline='') as csvfile:
-            fieldnames = ["member_id", "name", "check_in", "check_out", "duration", "date"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for record in self.data["attendance"]:
-                writer.writerow(record)
-
-        print(f"Data exported to {filename}")
+    def export_to_csv(self, filename="gym_attendance_export.csv", start_date=None,
+                      end_date=None, member_ids=None):
+        """Export attendance data to CSV, optionally by date range and members"""
+        records = self.log.iter_between(start_date, end_date, member_ids)
+        count = stream_csv(records, ATTENDANCE_FIELDS, filename)
+        report(f"Data exported to {filename} ({count} records)", filename)
+        return count
+
+    def export_columnar(self, path="gym_columns/attendance", format=None):
+        """Export attendance as column files for vectorized reporting"""
+        columns = AttendanceColumns.from_records(self.log)
+        columns.save(path, format)
+        print(f"Attendance exported to {path} ({len(columns)} records)")
+        return columns
 
     def get_current_checkins(self):
         """Get list of currently checked-in members"""
@@ -219,7 +636,7 @@ class GymAttendanceManager:
             return []
 
         for member_id, check_in_info in self.data["check_ins"].items():
-            check_in_time = datetime.datetime.fromisoformat(check_in_info["check_in_time"])
+            check_in_time = self.occupancy.sessions[member_id][0]
             duration = (current_time - check_in_time).total_seconds() / 3600
             print(f"  {check_in_info['name']} ({check_in_info['membership_type']})")
             print(f"    Check-in: {check_in_info['check_in_time']}")
@@ -299,6 +716,7 @@ def main():
 
         elif choice == '9':
             print("Thanks for using Gym Attendance Manager!")
+            manager.close()
             break
 
         else:
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Attendance Benchmark
+Measures check-in/check-out latency as the attendance history grows.
+"""
+
+import contextlib
+import datetime
+import io
+import os
+import sys
+import tempfile
+import time
+
+from attendance_manager import GymAttendanceManager
+
+
+def build_history(manager, records, members=1000):
+    """Fill the manager with synthetic closed attendance records"""
+    start = datetime.datetime(2020, 1, 1, 6, 0)
+    for i in range(members):
+        manager.members[f"M{i:05d}"] = {
+            "name": f"Member {i}",
+            "membership_type": "basic",
+            "phone": "",
+            "email": "",
+            "join_date": start.isoformat(),
+            "total_visits": 0,
+            "last_visit": None
+        }
+
+    attendance = manager.data["attendance"]
+    for i in range(records):
+        check_in = start + datetime.timedelta(minutes=7 * i)
+        attendance.append({
+            "member_id": f"M{i % members:05d}",
+            "name": f"Member {i % members}",
+            "check_in": check_in.isoformat(),
+            "check_out": (check_in + datetime.timedelta(hours=1)).isoformat(),
+            "duration": 1.0,
+            "date": check_in.strftime("%Y-%m-%d")
+        })
+    manager._open_log()
+    manager.save_data()
+
+
+def time_swipes(manager, swipes=500):
+    """Return average and p99 check-out latency in microseconds"""
+    member_ids = list(manager.members)[:swipes]
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for member_id in member_ids:
+            manager.check_in(member_id)
+        for member_id in member_ids:
+            started = time.perf_counter()
+            manager.check_out(member_id)
+            latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+    return sum(latencies) / len(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000, 1000000]
+
+    print("ATTENDANCE CHECK-OUT BENCHMARK")
+    print("=" * 30)
+    print(f"{'records':>10}  {'avg (us)':>10}  {'p99 (us)':>10}")
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                manager = GymAttendanceManager()
+                manager.store.fsync = False
+                build_history(manager, size)
+                avg, p99 = time_swipes(manager)
+                manager.close()
+            finally:
+                os.chdir(cwd)
+        print(f"{size:>10}  {avg:>10.1f}  {p99:>10.1f}")
+
+if __name__ == "__main__":
+    main()
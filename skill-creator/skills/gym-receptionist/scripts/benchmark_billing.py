@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Billing Benchmark
+Times a full batch of next-due-date computations, vectorized and one plan at a time.
+"""
+
+import datetime
+import sys
+import time
+
+import billing
+
+CYCLES = ["monthly", "quarterly", "annually", "weekly", "every 2 weeks", "every 2 months"]
+
+
+def synthetic_plans(members):
+    """Due dates and cycles for a synthetic membership"""
+    start = datetime.datetime(2024, 1, 1)
+    due_dates = [(start + datetime.timedelta(days=i % 366)).isoformat() for i in range(members)]
+    cycles = [CYCLES[i % len(CYCLES)] for i in range(members)]
+    return due_dates, cycles
+
+
+def time_batch(due_dates, cycles):
+    started = time.perf_counter()
+    billing.advance_many(due_dates, cycles)
+    return time.perf_counter() - started
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+
+    print("BILLING CYCLE BENCHMARK")
+    print("=" * 30)
+    print(f"{'members':>10}  {'batch (ms)':>12}  {'one by one (ms)':>16}")
+
+    for size in sizes:
+        due_dates, cycles = synthetic_plans(size)
+        batch = time_batch(due_dates, cycles)
+
+        numpy = billing.np
+        billing.np = None
+        try:
+            scalar = time_batch(due_dates, cycles)
+        finally:
+            billing.np = numpy
+        print(f"{size:>10}  {batch * 1000:>12.1f}  {scalar * 1000:>16.1f}")
+
+if __name__ == "__main__":
+    main()
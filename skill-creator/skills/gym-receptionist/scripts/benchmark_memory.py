@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Memory Benchmark
+Compares bytes per attendance and payment record stored as dicts and as compact tables.
+"""
+
+import datetime
+import gc
+import json
+import sys
+import tracemalloc
+
+from records import AttendanceTable, PaymentTable
+
+
+def attendance_json(records, members=1000):
+    """Synthetic attendance history as it sits in the data file"""
+    start = datetime.datetime(2020, 1, 1, 6, 0)
+    rows = []
+    for i in range(records):
+        check_in = start + datetime.timedelta(minutes=7 * i, microseconds=i % 1000)
+        rows.append({
+            "member_id": f"M{i % members:05d}",
+            "name": f"Member {i % members}",
+            "check_in": check_in.isoformat(),
+            "check_out": (check_in + datetime.timedelta(hours=1)).isoformat(),
+            "duration": 1.0,
+            "date": check_in.strftime("%Y-%m-%d")
+        })
+    return json.dumps(rows)
+
+
+def payment_json(records, members=1000):
+    """Synthetic payment history as it sits in the data file"""
+    start = datetime.datetime(2020, 1, 1, 9, 0)
+    rows = []
+    for i in range(records):
+        rows.append({
+            "member_id": f"M{i % members:05d}",
+            "member_name": f"Member {i % members}",
+            "amount": 50 + i % 3 * 15,
+            "payment_date": (start + datetime.timedelta(hours=3 * i)).isoformat(),
+            "payment_method": ["Cash", "Card", "Bank Transfer"][i % 3],
+            "status": "completed"
+        })
+    return json.dumps(rows)
+
+
+def bytes_per_record(build, text, records):
+    """Traced allocation of what `build` keeps alive, divided by the record count"""
+    gc.collect()
+    tracemalloc.start()
+    kept = build(text)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size / records
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+
+    print("HISTORY MEMORY BENCHMARK (bytes per record)")
+    print("=" * 44)
+    print(f"{'records':>10}  {'attendance':>21}  {'payments':>21}")
+    print(f"{'':>10}  {'dicts':>10} {'compact':>10}  {'dicts':>10} {'compact':>10}")
+
+    for size in sizes:
+        results = []
+        for source, table in ((attendance_json, AttendanceTable), (payment_json, PaymentTable)):
+            text = source(size)
+            results.append(bytes_per_record(json.loads, text, size))
+            results.append(bytes_per_record(lambda text: table(json.loads(text)), text, size))
+        print(f"{size:>10}  {results[0]:>10.0f} {results[1]:>10.0f}  "
+              f"{results[2]:>10.0f} {results[3]:>10.0f}")
+
+if __name__ == "__main__":
+    main()
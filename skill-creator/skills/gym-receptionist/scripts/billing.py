@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Billing Schedule Engine
+Due-date arithmetic for fee plan billing cycles, one member or a whole batch at once.
+"""
+
+import calendar
+import datetime
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Named cycles as (count, unit); anything else must be "every N days|weeks|months|years"
+CYCLES = {
+    "weekly": (7, "days"),
+    "biweekly": (14, "days"),
+    "monthly": (1, "months"),
+    "quarterly": (3, "months"),
+    "annually": (1, "years"),
+    "annual": (1, "years"),
+    "yearly": (1, "years"),
+}
+CUSTOM_CYCLE = re.compile(r"^every (\d+) (day|week|month|year)s?$")
+
+
+def parse_cycle(cycle):
+    """Billing cycle name to (count, unit) with unit "days", "months" or "years"
+
+    Raises ValueError for cycles the engine doesn't know.
+    """
+    if cycle in CYCLES:
+        return CYCLES[cycle]
+    match = CUSTOM_CYCLE.match(str(cycle).strip().lower())
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"Unknown billing cycle: {cycle}")
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == "week":
+        return count * 7, "days"
+    return count, unit + "s"
+
+
+def add_months(moment, months, anchor_day=None):
+    """Same day and time `months` later, clamped to the end of shorter months
+
+    `anchor_day` is the day of the month a schedule falls due on, for when
+    `moment` was itself clamped: a plan due on the 31st that fell due on
+    February 29th is due on March 31st next, not March 29th.
+    """
+    month_index = moment.year * 12 + moment.month - 1 + months
+    year, month = divmod(month_index, 12)
+    day = min(anchor_day or moment.day, calendar.monthrange(year, month + 1)[1])
+    return moment.replace(year=year, month=month + 1, day=day)
+
+
+def due_day(fee_plan):
+    """Day of the month a fee plan falls due on
+
+    Plans saved before the day was kept are anchored to their next due date.
+    """
+    return fee_plan.get("due_day") or datetime.datetime.fromisoformat(fee_plan["next_due_date"]).day
+
+
+def first_due(start, cycle):
+    """First due date of a plan starting at `start`
+
+    Month cycles fall due on the first of the month one cycle after the
+    start month, yearly cycles on January 1st, and day cycles one cycle
+    after the start.
+    """
+    count, unit = parse_cycle(cycle)
+    if unit == "days":
+        return start + datetime.timedelta(days=count)
+    if unit == "years":
+        return start.replace(year=start.year + count, month=1, day=1)
+    return add_months(start.replace(day=1), count)
+
+
+def advance(due, cycle, periods=1, anchor_day=None):
+    """Due date `periods` cycles after `due`, on `anchor_day` for month and year cycles"""
+    count, unit = parse_cycle(cycle)
+    if unit == "days":
+        return due + datetime.timedelta(days=count * periods)
+    return add_months(due, count * periods * (12 if unit == "years" else 1), anchor_day)
+
+
+def advance_many(due_dates, cycles, periods=1, anchor_days=None):
+    """Vectorized advance() over ISO due dates; returns ISO strings
+
+    `anchor_days` optionally gives each plan's anchor day (None for the
+    due date's own day). Uses NumPy datetime64 month arithmetic when NumPy
+    is installed and falls back to advance() per date otherwise.
+    """
+    if anchor_days is None:
+        anchor_days = [None] * len(due_dates)
+    # (months, days) per distinct cycle; also rejects unknown cycles up front
+    steps = {}
+    for cycle in set(cycles):
+        count, unit = parse_cycle(cycle)
+        steps[cycle] = (count * 12 if unit == "years" else count if unit == "months" else 0,
+                        count if unit == "days" else 0)
+    if np is None or not due_dates:
+        return [advance(datetime.datetime.fromisoformat(due), cycle, periods, anchor).isoformat()
+                for due, cycle, anchor in zip(due_dates, cycles, anchor_days)]
+
+    dues = np.array(due_dates, dtype="datetime64[us]")
+    months = np.array([steps[cycle][0] for cycle in cycles], dtype=np.int64) * periods
+    days = np.array([steps[cycle][1] for cycle in cycles], dtype=np.int64) * periods
+
+    one_day = np.timedelta64(1, "D")
+    month_start = dues.astype("datetime64[M]")
+    day_of_month = (dues.astype("datetime64[D]") - month_start.astype("datetime64[D]")) // one_day
+    anchors = np.array([anchor or 0 for anchor in anchor_days], dtype=np.int64)
+    day_of_month = np.where(anchors > 0, anchors - 1, day_of_month)
+    time_of_day = dues - dues.astype("datetime64[D]").astype("datetime64[us]")
+
+    target_month = month_start + months.astype("timedelta64[M]")
+    month_length = ((target_month + 1).astype("datetime64[D]")
+                    - target_month.astype("datetime64[D]")) // one_day
+    by_month = (target_month.astype("datetime64[D]")
+                + np.minimum(day_of_month, month_length - 1).astype("timedelta64[D]")
+                ).astype("datetime64[us]") + time_of_day
+    by_day = dues + days.astype("timedelta64[D]").astype("timedelta64[us]")
+    result = np.where(months > 0, by_month, by_day)
+
+    # isoformat() drops zero microseconds, so whole-second batches format in one call
+    seconds = result.astype("datetime64[s]")
+    if (seconds == result).all():
+        return np.datetime_as_string(seconds).tolist()
+    return [moment.isoformat() for moment in result.astype(datetime.datetime).tolist()]
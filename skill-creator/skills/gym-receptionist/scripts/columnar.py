@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Columnar Attendance Analytics
+Column-file export of attendance and payment history with vectorized report queries.
+"""
+
+import array
+import datetime
+import json
+import sys
+from pathlib import Path
+
+from records import DAY_MICROS, HOUR_MICROS, from_micros, to_micros
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# Logical column types mapped to array-module typecodes and NumPy dtypes
+TYPECODES = {"int32": "i", "int64": "q", "float32": "f", "float64": "d"}
+# Manifest time unit; exports from before timestamps moved to microseconds have none
+TIME_UNIT = "us"
+
+
+def prefix_bounds(prefix):
+    """Epoch microsecond range [start, end) covered by a YYYY, YYYY-MM or YYYY-MM-DD prefix"""
+    parts = [int(part) for part in prefix.split("-")]
+    start = datetime.datetime(parts[0], parts[1] if len(parts) > 1 else 1,
+                              parts[2] if len(parts) > 2 else 1)
+    if len(parts) == 1:
+        end = start.replace(year=start.year + 1)
+    elif len(parts) == 2:
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+    else:
+        end = start + datetime.timedelta(days=1)
+    return to_micros(start.isoformat()), to_micros(end.isoformat())
+
+
+def default_format():
+    if pa is not None and np is not None:
+        return "arrow"
+    if np is not None:
+        return "npy"
+    return "bin"
+
+
+class ColumnTable:
+    """Typed columns plus dictionaries for the dictionary-encoded ones"""
+
+    schema = {}
+    encoded = {}
+
+    def __init__(self, columns, dictionaries):
+        self.columns = columns
+        self.dictionaries = dictionaries
+
+    def __len__(self):
+        first = next(iter(self.columns.values()), [])
+        return len(first)
+
+    @classmethod
+    def _empty_columns(cls):
+        return {name: array.array(TYPECODES[kind]) for name, kind in cls.schema.items()}
+
+    @classmethod
+    def _finish(cls, columns, dictionaries):
+        if np is not None:
+            columns = {name: np.frombuffer(values, dtype=TYPECODES[cls.schema[name]]).copy()
+                       if len(values) else np.zeros(0, dtype=TYPECODES[cls.schema[name]])
+                       for name, values in columns.items()}
+        return cls(columns, dictionaries)
+
+    def save(self, path, format=None):
+        """Write the table as Arrow IPC, .npy column files or raw column files"""
+        format = format or default_format()
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        manifest = {"format": format, "rows": len(self), "schema": self.schema,
+                    "time_unit": TIME_UNIT, "dictionaries": self.dictionaries}
+
+        if format == "arrow":
+            arrays = []
+            for name in self.schema:
+                values = pa.array(np.asarray(self.columns[name]))
+                if name in self.encoded:
+                    values = pa.DictionaryArray.from_arrays(
+                        values, pa.array(self.dictionaries[self.encoded[name]]))
+                arrays.append(values)
+            table = pa.Table.from_arrays(arrays, names=list(self.schema))
+            with pa.OSFile(str(path / "table.arrow"), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        elif format == "npy":
+            for name in self.schema:
+                np.save(path / f"{name}.npy", np.asarray(self.columns[name]))
+        else:
+            for name, kind in self.schema.items():
+                values = self.columns[name]
+                if not isinstance(values, array.array):
+                    values = array.array(TYPECODES[kind], values)
+                with open(path / f"{name}.bin", 'wb') as f:
+                    values.tofile(f)
+
+        with open(path / "manifest.json", 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Read a table written by save(); .npy columns are memory-mapped"""
+        path = Path(path)
+        with open(path / "manifest.json", 'r') as f:
+            manifest = json.load(f)
+        if manifest.get("time_unit") != TIME_UNIT:
+            raise ValueError(f"{path} uses time unit {manifest.get('time_unit')!r}, "
+                             f"expected {TIME_UNIT!r}; export it again")
+
+        columns = {}
+        if manifest["format"] == "arrow":
+            with pa.memory_map(str(path / "table.arrow"), 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+            for name in cls.schema:
+                column = table.column(name).combine_chunks()
+                if name in cls.encoded:
+                    column = column.indices
+                columns[name] = column.to_numpy(zero_copy_only=False)
+        elif manifest["format"] == "npy":
+            for name in cls.schema:
+                columns[name] = np.load(path / f"{name}.npy", mmap_mode='r')
+        else:
+            for name, kind in cls.schema.items():
+                values = array.array(TYPECODES[kind])
+                with open(path / f"{name}.bin", 'rb') as f:
+                    values.frombytes(f.read())
+                columns[name] = values
+            return cls._finish(columns, manifest["dictionaries"])
+        return cls(columns, manifest["dictionaries"])
+
+    def _rows_between(self, column, start, end):
+        """Row numbers whose column value lies in [start, end)"""
+        values = self.columns[column]
+        if np is not None:
+            values = np.asarray(values)
+            return np.nonzero((values >= start) & (values < end))[0]
+        return [row for row, value in enumerate(values) if start <= value < end]
+
+
+class AttendanceColumns(ColumnTable):
+    """Attendance history as columns, answering the report queries vectorized
+
+    Implements the read side of the attendance log interface, so it can be
+    passed as `log=` to the daily and monthly report methods.
+    """
+
+    schema = {"member": "int32", "check_in": "int64", "check_out": "int64",
+              "duration": "float32"}
+    encoded = {"member": "member_ids"}
+
+    @classmethod
+    def from_records(cls, records):
+        columns = cls._empty_columns()
+        codes = {}
+        member_ids = []
+        names = []
+        for record in records:
+            code = codes.get(record["member_id"])
+            if code is None:
+                code = codes[record["member_id"]] = len(member_ids)
+                member_ids.append(record["member_id"])
+                names.append(record["name"])
+            columns["member"].append(code)
+            columns["check_in"].append(to_micros(record["check_in"]))
+            columns["check_out"].append(to_micros(record["check_out"]))
+            columns["duration"].append(record["duration"])
+        return cls._finish(columns, {"member_ids": member_ids, "names": names})
+
+    def _records(self, rows):
+        member_ids = self.dictionaries["member_ids"]
+        names = self.dictionaries["names"]
+        records = []
+        for row in rows:
+            code = int(self.columns["member"][row])
+            check_in = from_micros(int(self.columns["check_in"][row]))
+            records.append({
+                "member_id": member_ids[code],
+                "name": names[code],
+                "check_in": check_in,
+                "check_out": from_micros(int(self.columns["check_out"][row])),
+                "duration": round(float(self.columns["duration"][row]), 2),
+                "date": check_in[:10]
+            })
+        return records
+
+    def for_date(self, date):
+        return self._records(self._rows_between("check_in", *prefix_bounds(date)))
+
+    def for_month(self, month):
+        return self._records(self._rows_between("check_in", *prefix_bounds(month)))
+
+    def hourly_counts(self, date):
+        rows = self._rows_between("check_in", *prefix_bounds(date))
+        if np is not None:
+            hours = (np.asarray(self.columns["check_in"])[rows] % DAY_MICROS) // HOUR_MICROS
+            counts = np.bincount(hours, minlength=24)
+            return {int(hour): int(counts[hour]) for hour in np.nonzero(counts)[0]}
+        counts = {}
+        for row in rows:
+            hour = self.columns["check_in"][row] % DAY_MICROS // HOUR_MICROS
+            counts[hour] = counts.get(hour, 0) + 1
+        return counts
+
+    def month_stats(self, month):
+        """Per-member visits and total duration via a group-by over member codes"""
+        rows = self._rows_between("check_in", *prefix_bounds(month))
+        member_ids = self.dictionaries["member_ids"]
+        names = self.dictionaries["names"]
+
+        if np is not None:
+            codes = np.asarray(self.columns["member"])[rows]
+            durations = np.asarray(self.columns["duration"], dtype=np.float64)[rows]
+            visits = np.bincount(codes, minlength=len(member_ids))
+            totals = np.bincount(codes, weights=durations, minlength=len(member_ids))
+            # Keep members in order of their first visit, like the row-wise report
+            present, first_seen = np.unique(codes, return_index=True)
+            order = present[np.argsort(first_seen)]
+            return {
+                member_ids[code]: {"name": names[code], "visits": int(visits[code]),
+                                   "total_duration": float(totals[code])}
+                for code in order
+            }
+
+        stats = {}
+        for row in rows:
+            code = self.columns["member"][row]
+            if member_ids[code] not in stats:
+                stats[member_ids[code]] = {"name": names[code], "visits": 0,
+                                           "total_duration": 0}
+            stats[member_ids[code]]["visits"] += 1
+            stats[member_ids[code]]["total_duration"] += self.columns["duration"][row]
+        return stats
+
+    def member_visits(self, member_id, month):
+        return self.month_stats(month).get(member_id, {}).get("visits", 0)
+
+
+class PaymentColumns(ColumnTable):
+    """Payment history as columns, for analysis outside the fee manager"""
+
+    schema = {"member": "int32", "payment_date": "int64", "amount": "float64",
+              "method": "int32"}
+    encoded = {"member": "member_ids", "method": "methods"}
+
+    @classmethod
+    def from_records(cls, records):
+        columns = cls._empty_columns()
+        members = {}
+        methods = {}
+        for record in records:
+            columns["member"].append(members.setdefault(record["member_id"], len(members)))
+            columns["payment_date"].append(to_micros(record["payment_date"]))
+            columns["amount"].append(record["amount"])
+            columns["method"].append(methods.setdefault(record["payment_method"], len(methods)))
+        return cls._finish(columns, {"member_ids": list(members), "methods": list(methods)})
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("export", "monthly", "daily"):
+        print("Usage:")
+        print("  columnar.py export [directory]")
+        print("  columnar.py monthly YYYY-MM [directory]")
+        print("  columnar.py daily YYYY-MM-DD [directory]")
+        sys.exit(1)
+
+    from attendance_manager import GymAttendanceManager
+
+    manager = GymAttendanceManager()
+    if sys.argv[1] == "export":
+        from fee_manager import GymFeeManager
+
+        directory = Path(sys.argv[2] if len(sys.argv) > 2 else "gym_columns")
+        fees = GymFeeManager()
+        manager.export_columnar(directory / "attendance")
+        fees.export_columnar(directory / "payments")
+        fees.close()
+    else:
+        directory = Path(sys.argv[3] if len(sys.argv) > 3 else "gym_columns")
+        try:
+            columns = AttendanceColumns.load(directory / "attendance")
+        except ValueError as error:
+            print(f"Error: {error}")
+            manager.close()
+            return
+        if sys.argv[1] == "monthly":
+            manager.generate_monthly_report(sys.argv[2], log=columns)
+        else:
+            manager.generate_daily_report(sys.argv[2], log=columns)
+    manager.close()
+
+if __name__ == "__main__":
+    main()
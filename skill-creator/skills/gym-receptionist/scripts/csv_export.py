@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Streaming CSV Export
+Writes attendance and payment history to CSV one record at a time.
+"""
+
+import contextlib
+import csv
+import gzip
+import sys
+
+ATTENDANCE_FIELDS = ["member_id", "name", "check_in", "check_out", "duration", "date"]
+PAYMENT_FIELDS = ["member_id", "name", "payment_date", "amount", "payment_method", "status"]
+
+
+@contextlib.contextmanager
+def open_output(filename):
+    """Open a CSV destination: "-" for stdout, *.gz for gzip, else a plain file"""
+    if filename == "-":
+        yield sys.stdout
+    elif str(filename).endswith(".gz"):
+        with gzip.open(filename, 'wt', newline='') as f:
+            yield f
+    else:
+        with open(filename, 'w', newline='') as f:
+            yield f
+
+
+def stream_csv(records, fieldnames, filename, rename=None):
+    """Write records lazily to CSV and return how many were written"""
+    rename = rename or {}
+    count = 0
+    with open_output(filename) as output:
+        writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        for record in records:
+            if rename:
+                record = dict(record)
+                for source, target in rename.items():
+                    if source in record:
+                        record.setdefault(target, record[source])
+            writer.writerow(record)
+            count += 1
+    return count
+
+
+def report(message, filename):
+    """Print a status line without corrupting CSV streamed to stdout"""
+    print(message, file=sys.stderr if filename == "-" else sys.stdout)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("attendance", "payments"):
+        print("Usage: csv_export.py attendance|payments [output|-] [start-date] [end-date] [member-id ...]")
+        sys.exit(1)
+
+    kind = sys.argv[1]
+    filename = sys.argv[2] if len(sys.argv) > 2 else "-"
+    start_date = sys.argv[3] if len(sys.argv) > 3 else None
+    end_date = sys.argv[4] if len(sys.argv) > 4 else None
+    member_ids = sys.argv[5:] or None
+
+    # Keep manager start-up messages off a CSV stream
+    with contextlib.redirect_stdout(sys.stderr):
+        if kind == "attendance":
+            from attendance_manager import GymAttendanceManager
+            manager = GymAttendanceManager()
+        else:
+            from fee_manager import GymFeeManager
+            manager = GymFeeManager()
+
+    if kind == "attendance":
+        manager.export_to_csv(filename, start_date, end_date, member_ids)
+    else:
+        manager.export_financial_report(filename, start_date, end_date, member_ids)
+    manager.close()
+
+if __name__ == "__main__":
+    main()
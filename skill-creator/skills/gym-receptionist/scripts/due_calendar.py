@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Due Date Calendar
+Active fee plans ordered by next due date for overdue and reminder lookups.
+"""
+
+import bisect
+import datetime
+
+
+class DueCalendar:
+    """Sorted (next_due_date, member_id) index over active fee plans
+
+    "Due in the next N days" and "more than N days late" become bisect range
+    lookups instead of a scan parsing every member's due date. The index
+    follows fee plan changes through the member registry's subscriptions, so
+    anything written through `registry.update` keeps it current.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._due = {}
+        for member_id, member in registry.members.items():
+            due = self._due_date(member)
+            if due is not None:
+                self._due[member_id] = due
+        self._entries = sorted((due, member_id) for member_id, due in self._due.items())
+        registry.subscribe(self._on_change)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        self.registry.unsubscribe(self._on_change)
+
+    @staticmethod
+    def _due_date(member):
+        """Normalized ISO due date of an active plan, or None"""
+        fee_plan = member.get("fee_plan")
+        if not fee_plan or fee_plan.get("status") != "active":
+            return None
+        return datetime.datetime.fromisoformat(fee_plan["next_due_date"]).isoformat()
+
+    def _on_change(self, member_id, member, fields):
+        if "fee_plan" in fields or (member_id in self._due and "fee_plan" not in member):
+            self.track(member_id, member)
+
+    def track(self, member_id, member):
+        """Re-index one member after its fee plan changed"""
+        due = self._due_date(member)
+        old = self._due.get(member_id)
+        if due == old:
+            return
+        if old is not None:
+            del self._entries[bisect.bisect_left(self._entries, (old, member_id))]
+            del self._due[member_id]
+        if due is not None:
+            bisect.insort(self._entries, (due, member_id))
+            self._due[member_id] = due
+
+    def due_within(self, now, days):
+        """Member ids with 0 <= (due - now).days <= days, soonest first"""
+        start = bisect.bisect_left(self._entries, (now.isoformat(),))
+        end = bisect.bisect_left(self._entries,
+                                 ((now + datetime.timedelta(days=days + 1)).isoformat(),))
+        return [member_id for _, member_id in self._entries[start:end]]
+
+    def late_by_more_than(self, now, days):
+        """Member ids with (now - due).days > days, most overdue first"""
+        cutoff = (now - datetime.timedelta(days=days + 1)).isoformat()
+        end = bisect.bisect_right(self._entries, (cutoff, "\uffff"))
+        return [member_id for _, member_id in self._entries[:end]]
@@ -4,179 +4,420 @@ Gym Fee Manager
 Manages membership fees, payment tracking, reminders, and financial reports.
 """
 
-import json
+import array
+import bisect
+import contextlib
 import datetime
-import csv
 from pathlib import Path
 
+from billing import advance, advance_many, due_day, first_due, parse_cycle
+from columnar import PaymentColumns
+from csv_export import PAYMENT_FIELDS, report, stream_csv
+from due_calendar import DueCalendar
+from late_fees import LateFeeLedger, LateFeeLog
+from member_registry import get_registry
+from records import DAY_MICROS, MISSING_TIME, PaymentTable, to_micros
+from reminder_outbox import ReminderLog, ReminderOutbox
+from revenue import REFUND_STATUSES, RevenueRollup
+from storage import open_store
+
+class MemberLedger:
+    """One member's payment positions in date order, with a running total"""
+
+    __slots__ = ("dates", "positions", "total")
+
+    def __init__(self):
+        self.dates = array.array("q")
+        self.positions = array.array("q")
+        self.total = 0
+
+    def add(self, date, position, amount):
+        # Same-day payments go first, so newest-first pages keep them in recorded order
+        index = bisect.bisect_left(self.dates, date)
+        self.dates.insert(index, date)
+        self.positions.insert(index, position)
+        self.total += amount
+
+    def newest_first(self, limit=None, offset=0):
+        """Positions of one page of payments, newest first"""
+        end = len(self.positions) - offset
+        if end <= 0:
+            return []
+        start = 0 if limit is None else max(0, end - limit)
+        return reversed(self.positions[start:end])
+
+class PaymentLog:
+    """Compact in-memory payment history with per-member ledgers and revenue rollups"""
+
+    def __init__(self, records):
+        self.records = records if isinstance(records, PaymentTable) else PaymentTable(records)
+        self._ledgers = None
+        self._by_date = None
+        self._revenue = None
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def append(self, record):
+        position = self.records.append(record)
+        if self._ledgers is not None:
+            self._add_to_ledger(position)
+        if self._by_date is not None:
+            self._by_date.add(self.records.columns["payment_date"][position], position, 0)
+        if self._revenue is not None:
+            self._revenue.add(record["payment_date"], record["amount"], record["payment_method"])
+        return record
+
+    def _ensure_ledgers(self):
+        """Build the per-member ledgers on first use after a load"""
+        if self._ledgers is None:
+            self._ledgers = {}
+            for position in range(len(self.records)):
+                self._add_to_ledger(position)
+
+    def _add_to_ledger(self, position):
+        code = self.records.columns["member_id"][position]
+        ledger = self._ledgers.get(code)
+        if ledger is None:
+            ledger = self._ledgers[code] = MemberLedger()
+        ledger.add(self.records.columns["payment_date"][position], position,
+                   self.records.get(position, "amount"))
+
+    def _positions_between(self, start, end):
+        """Positions dated start..end in recorded order, from an all-payments date index"""
+        if self._by_date is None:
+            self._by_date = MemberLedger()
+            dates = self.records.columns["payment_date"]
+            for position in sorted(range(len(dates)), key=dates.__getitem__):
+                self._by_date.dates.append(dates[position])
+                self._by_date.positions.append(position)
+        first = bisect.bisect_left(self._by_date.dates, start)
+        last = bisect.bisect_right(self._by_date.dates, end)
+        return sorted(self._by_date.positions[first:last])
+
+    def between(self, start_date, end_date):
+        """Payments whose timestamp falls inside the range"""
+        return [self.records.row(position)
+                for position in self._positions_between(to_micros(start_date), to_micros(end_date))]
+
+    def iter_between(self, start_date=None, end_date=None, member_ids=None):
+        """Yield payments made between two days, optionally for some members"""
+        members = {self.records.lookup(member_id) for member_id in member_ids} if member_ids else None
+        start = to_micros(start_date[:10]) if start_date is not None else MISSING_TIME
+        end = to_micros(end_date[:10]) + DAY_MICROS - 1 if end_date is not None else 2 ** 63 - 1
+        codes = self.records.columns["member_id"]
+        dates = self.records.columns["payment_date"]
+        for position in range(len(self.records)):
+            if start <= dates[position] <= end and (members is None or codes[position] in members):
+                yield self.records.row(position)
+
+    def for_member(self, member_id, limit=None, offset=0):
+        """A member's payments, newest first, optionally one page at a time"""
+        self._ensure_ledgers()
+        ledger = self._ledgers.get(self.records.lookup(member_id))
+        if ledger is None:
+            return []
+        return [self.records.row(position) for position in ledger.newest_first(limit, offset)]
+
+    def member_totals(self, member_id):
+        """(number of payments, total paid) for one member"""
+        self._ensure_ledgers()
+        ledger = self._ledgers.get(self.records.lookup(member_id))
+        if ledger is None:
+            return 0, 0
+        return len(ledger.positions), ledger.total
+
+    def revenue(self):
+        """Revenue rollup over the whole history, built on first use after a load"""
+        if self._revenue is None:
+            self._revenue = RevenueRollup()
+            dates = self.records.columns["payment_date"]
+            for position in range(len(dates)):
+                self._revenue.add_day(dates[position] // DAY_MICROS,
+                                      self.records.get(position, "amount"),
+                                      self.records.get(position, "payment_method"))
+        return self._revenue
+
 class GymFeeManager:
-    def __init__(self, gym_name="Default Gym"):
+    def __init__(self, gym_name="Default Gym", storage="json"):
         self.gym_name = gym_name
         self.data_file = Path("gym_fee_data.json")
+        self.store = open_store(storage, self.data_file, on_merge=self._adopt,
+                                history=("payments", "settlement_ids"))
+        self.registry = get_registry("sqlite" if storage == "sqlite" else "journal")
+        self.members = self.registry.members
         self.load_data()
+        self.calendar = DueCalendar(self.registry)
+        late_fee_log = self.store.late_fee_log() if self.store.queryable else LateFeeLog(self.data)
+        self.late_fees = LateFeeLedger(self.registry, self.calendar, self.data, late_fee_log)
+        self.outbox = ReminderOutbox(self.data_file.with_name("gym_reminder_outbox.db"))
 
     def load_data(self):
         """Load existing fee data"""
-        if self.data_file.exists():
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+        self.data = self.store.load({
+            "payments": [],
+            "fees": {}
+        })
+        self._open_logs()
+
+        # Older data files carried their own copy of the member table
+        legacy_members = self.data.pop("members", None)
+        if legacy_members is not None:
+            self.registry.import_members(legacy_members)
+            self.save_data()
+
+        # ... and kept the reminder log inline
+        legacy_reminders = self.data.pop("reminders", None)
+        if legacy_reminders:
+            for reminder_log in legacy_reminders:
+                self.reminders.append(reminder_log)
+            self.save_data()
+
+    def _open_logs(self):
+        """Attach the payment history and reminder log, kept in SQL or in memory"""
+        if self.store.queryable:
+            self.payments = self.store.payment_log()
+            self.reminders = self.store.reminder_log()
         else:
-            self.data = {
-                "members": {},
-                "payments": [],
-                "fees": {},
-                "reminders": []
-            }
+            self.payments = PaymentLog(self.data["payments"])
+            self.data["payments"] = self.payments.records
+            self.reminders = ReminderLog(self.data_file.with_name("gym_reminders.jsonl"))
+
+    def _adopt(self, data):
+        """Take over data merged with another process's save"""
+        self.data = data
+        self._open_logs()
+        self.late_fees.data = data
+        if not self.store.queryable:
+            self.late_fees.log = LateFeeLog(data)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Lock the fee and member files, both caught up on other processes' writes"""
+        with self.store.transaction(self.data), self.registry.transaction():
+            yield
 
     def save_data(self):
         """Save fee data to file"""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        self.store.save(self.data)
+
+    def close(self):
+        """Release the data store"""
+        self.late_fees.close()
+        self.calendar.close()
+        self.outbox.close()
+        self.store.close()
 
     def setup_fee_structure(self, fee_types):
         """Setup gym fee structure"""
-        self.data["fees"] = fee_types
-        self.save_data()
-        print("Fee structure updated successfully!")
+        with self.transaction():
+            self.data["fees"] = fee_types
+            self.late_fees.invalidate()
+            self.store.record(self.data, {"op": "setup_fees", "fees": fee_types})
+            print("Fee structure updated successfully!")
 
     def register_member_fee(self, member_id, fee_type, amount, start_date, billing_cycle="monthly"):
         """Register a member's fee plan"""
-        if member_id not in self.data["members"]:
-            print(f"Error: Member ID {member_id} not found!")
-            return False
-
-        # Calculate next due date
-        start = datetime.datetime.fromisoformat(start_date)
-        if billing_cycle == "monthly":
-            next_due = start.replace(day=1)
-            if start.month == 12:
-                next_due = next_due.replace(year=start.year + 1, month=1)
-            else:
-                next_due = next_due.replace(month=start.month + 1)
-        elif billing_cycle == "quarterly":
-            next_due = start.replace(day=1)
-            next_due = next_due.replace(month=start.month + 3)
-        elif billing_cycle == "annually":
-            next_due = start.replace(year=start.year + 1, month=1, day=1)
-        else:
-            next_due = start
-
-        self.data["members"][member_id]["fee_plan"] = {
-            "fee_type": fee_type,
-            "amount": amount,
-            "billing_cycle": billing_cycle,
-            "start_date": start_date,
-            "next_due_date": next_due.isoformat(),
-            "status": "active"
-        }
+        with self.transaction():
+            if member_id not in self.members:
+                print(f"Error: Member ID {member_id} not found!")
+                return False
 
-        self.save_data()
-        print(f"Fee plan registered for {member_id}")
-        return True
+            # Calculate next due date
+            try:
+                next_due = first_due(datetime.datetime.fromisoformat(start_date), billing_cycle)
+            except ValueError as error:
+                print(f"Error: {error}")
+                return False
+
+            self.registry.update(member_id, fee_plan={
+                "fee_type": fee_type,
+                "amount": amount,
+                "billing_cycle": billing_cycle,
+                "start_date": start_date,
+                "next_due_date": next_due.isoformat(),
+                "due_day": next_due.day,
+                "status": "active"
+            })
+            print(f"Fee plan registered for {member_id}")
+            return True
 
     def record_payment(self, member_id, amount, payment_date=None, payment_method="Cash"):
         """Record a payment from a member"""
-        if member_id not in self.data["members"]:
-            print(f"Error: Member ID {member_id} not found!")
-            return False
+        with self.transaction():
+            if member_id not in self.members:
+                print(f"Error: Member ID {member_id} not found!")
+                return False
 
-        if payment_date is None:
-            payment_date = datetime.datetime.now().isoformat()
-        else:
-            payment_date = datetime.datetime.fromisoformat(payment_date).isoformat()
-
-        payment_record = {
-            "member_id": member_id,
-            "member_name": self.data["members"][member_id]["name"],
-            "amount": amount,
-            "payment_date": payment_date,
-            "payment_method": payment_method,
-            "status": "completed"
-        }
+            if payment_date is None:
+                payment_date = datetime.datetime.now().isoformat()
+            else:
+                payment_date = datetime.datetime.fromisoformat(payment_date).isoformat()
+
+            payment_record = {
+                "member_id": member_id,
+                "member_name": self.members[member_id]["name"],
+                "amount": amount,
+                "payment_date": payment_date,
+                "payment_method": payment_method,
+                "status": "completed"
+            }
 
-        self.data["payments"].append(payment_record)
+            self.payments.append(payment_record)
 
-        # Update member's next due date
-        if "fee_plan" in self.data["members"][member_id]:
-            fee_plan = self.data["members"][member_id]["fee_plan"]
-            current_due = datetime.datetime.fromisoformat(fee_plan["next_due_date"])
+            # Update member's next due date
+            if "fee_plan" in self.members[member_id]:
+                fee_plan = self.members[member_id]["fee_plan"]
+                current_due = datetime.datetime.fromisoformat(fee_plan["next_due_date"])
 
-            # Calculate next due date
-            if fee_plan["billing_cycle"] == "monthly":
-                if current_due.month == 12:
-                    next_due = current_due.replace(year=current_due.year + 1, month=1)
+                # Calculate next due date
+                try:
+                    next_due = advance(current_due, fee_plan["billing_cycle"],
+                                       anchor_day=due_day(fee_plan))
+                except ValueError as error:
+                    print(f"Warning: {error}, next due date for {member_id} left unchanged")
                 else:
-                    next_due = current_due.replace(month=current_due.month + 1)
-            elif fee_plan["billing_cycle"] == "quarterly":
-                next_due = current_due.replace(month=current_due.month + 3)
-            elif fee_plan["billing_cycle"] == "annually":
-                next_due = current_due.replace(year=current_due.year + 1)
-
-            fee_plan["next_due_date"] = next_due.isoformat()
-
-        self.save_data()
-        print(f"Payment of ${amount} recorded for {member_id}")
-        return True
+                    fee_plan["due_day"] = due_day(fee_plan)
+                    fee_plan["next_due_date"] = next_due.isoformat()
+                    self.registry.update(member_id, fee_plan=fee_plan)
+
+            self.store.record(self.data, {"op": "payment", "member_id": member_id})
+            print(f"Payment of ${amount} recorded for {member_id}")
+            return True
+
+    def record_refund(self, member_id, amount, payment_date=None, payment_method="Cash",
+                      status="refunded"):
+        """Record money paid back to a member, or a reversed payment
+
+        Stored as a negative payment so balances and revenue reports net it
+        out; the member's next due date is left alone.
+        """
+        with self.transaction():
+            if member_id not in self.members:
+                print(f"Error: Member ID {member_id} not found!")
+                return False
+            if status not in REFUND_STATUSES:
+                print(f"Error: Refund status must be one of {', '.join(REFUND_STATUSES)}")
+                return False
+
+            if payment_date is None:
+                payment_date = datetime.datetime.now().isoformat()
+            else:
+                payment_date = datetime.datetime.fromisoformat(payment_date).isoformat()
+
+            self.payments.append({
+                "member_id": member_id,
+                "member_name": self.members[member_id]["name"],
+                "amount": -abs(amount),
+                "payment_date": payment_date,
+                "payment_method": payment_method,
+                "status": status
+            })
+            self.store.record(self.data, {"op": "refund", "member_id": member_id})
+            print(f"Refund of ${abs(amount)} recorded for {member_id}")
+            return True
+
+    def upcoming_due_dates(self, periods=1, member_ids=None):
+        """Due dates `periods` cycles after each active plan's next due date
+
+        Computed for all members in one batch, for nightly billing runs.
+        """
+        plans = []
+        for member_id in (self.members if member_ids is None else member_ids):
+            fee_plan = self.members.get(member_id, {}).get("fee_plan")
+            if not fee_plan or fee_plan["status"] != "active":
+                continue
+            try:
+                parse_cycle(fee_plan["billing_cycle"])
+            except ValueError as error:
+                print(f"Warning: {error}, skipping {member_id}")
+                continue
+            plans.append((member_id, fee_plan))
+
+        due_dates = advance_many([plan["next_due_date"] for _, plan in plans],
+                                 [plan["billing_cycle"] for _, plan in plans], periods,
+                                 [due_day(plan) for _, plan in plans])
+        return {member_id: due for (member_id, _), due in zip(plans, due_dates)}
 
     def check_overdue_payments(self, days_overdue=0):
-        """Check for overdue payments"""
-        current_date = datetime.datetime.now()
+        """Check for overdue payments
+
+        Days late and late fees are read from today's accruals, which are
+        computed once a day as of midnight.
+        """
+        self.accrue_late_fees()
         overdue_members = []
 
-        for member_id, member in self.data["members"].items():
-            if "fee_plan" in member and member["fee_plan"]["status"] == "active":
-                due_date = datetime.datetime.fromisoformat(member["fee_plan"]["next_due_date"])
-                days_late = (current_date - due_date).days
-
-                if days_late > days_overdue:
-                    overdue_members.append({
-                        "member_id": member_id,
-                        "name": member["name"],
-                        "fee_type": member["fee_plan"]["fee_type"],
-                        "amount": member["fee_plan"]["amount"],
-                        "due_date": member["fee_plan"]["next_due_date"],
-                        "days_late": days_late,
-                        "late_fee": max(0, days_late * 1)  # $1 per day late fee
-                    })
+        for member_id, accrual in self.late_fees.overdue(days_overdue):
+            member = self.members[member_id]
+            overdue_members.append({
+                "member_id": member_id,
+                "name": member["name"],
+                "fee_type": member["fee_plan"]["fee_type"],
+                "amount": member["fee_plan"]["amount"],
+                "due_date": accrual["due_date"],
+                "days_late": accrual["days_late"],
+                "late_fee": accrual["late_fee"]
+            })
 
         return overdue_members
 
+    def accrue_late_fees(self, now=None):
+        """Materialize late fees for every overdue plan, at most once a day"""
+        if self.late_fees.accrue(now):
+            self.store.record(self.data, {"op": "late_fees"})
+
     def send_payment_reminders(self, days_before=3):
-        """Send payment reminders to members"""
+        """Queue payment reminders for members due within `days_before` days
+
+        Each (member, due date) is queued in the reminder outbox once; run
+        `reminder_outbox.py send` to deliver the queue. Returns every
+        reminder due, with "queued" False for ones already sent this cycle.
+        """
         current_date = datetime.datetime.now()
-        reminder_date = current_date + datetime.timedelta(days=days_before)
 
         reminders = []
-        for member_id, member in self.data["members"].items():
-            if "fee_plan" in member and member["fee_plan"]["status"] == "active":
-                due_date = datetime.datetime.fromisoformat(member["fee_plan"]["next_due_date"])
-                days_until_due = (due_date - current_date).days
-
-                if 0 <= days_until_due <= days_before:
-                    reminder = {
-                        "member_id": member_id,
-                        "name": member["name"],
-                        "email": member["email"],
-                        "due_date": member["fee_plan"]["next_due_date"],
-                        "amount_due": member["fee_plan"]["amount"],
-                        "days_until_due": days_until_due
-                    }
-                    reminders.append(reminder)
-
-                    # Log reminder
-                    reminder_log = {
-                        "member_id": member_id,
-                        "reminder_date": datetime.datetime.now().isoformat(),
-                        "days_before_due": days_until_due,
-                        "method": "email"
-                    }
-                    self.data["reminders"].append(reminder_log)
-
-        self.save_data()
+        for member_id in self.calendar.due_within(current_date, days_before):
+            member = self.members[member_id]
+            due_date = datetime.datetime.fromisoformat(member["fee_plan"]["next_due_date"])
+            days_until_due = (due_date - current_date).days
+
+            reminder = {
+                "member_id": member_id,
+                "name": member["name"],
+                "email": member["email"],
+                "due_date": member["fee_plan"]["next_due_date"],
+                "amount_due": member["fee_plan"]["amount"],
+                "days_until_due": days_until_due
+            }
+            reminder["queued"] = self.outbox.enqueue(
+                member_id, reminder["due_date"], member["email"],
+                f"{self.gym_name}: payment of ${reminder['amount_due']} due {reminder['due_date'][:10]}",
+                f"Hi {member['name']},\n\n"
+                f"Your {member['fee_plan']['fee_type']} payment of ${reminder['amount_due']} "
+                f"is due on {reminder['due_date'][:10]}.\n\n{self.gym_name}\n",
+                current_date)
+            reminders.append(reminder)
+
+            # Log reminder
+            if reminder["queued"]:
+                reminder_log = {
+                    "member_id": member_id,
+                    "reminder_date": datetime.datetime.now().isoformat(),
+                    "days_before_due": days_until_due,
+                    "method": "email"
+                }
+                self.reminders.append(reminder_log)
+
+        if self.store.queryable:
+            self.store.record(self.data, {"op": "reminders"})
         return reminders
 
-    def generate_payment_report(self, start_date=None, end_date=None):
-        """Generate payment report for a date range"""
+    def _report_range(self, start_date, end_date):
+        """ISO bounds of a report range, the last 30 days by default"""
         if start_date is None:
             start_date = (datetime.datetime.now() - datetime.timedelta(days=30)).isoformat()
         else:
@@ -186,38 +427,55 @@ class GymFeeManager:
             end_date = datetime.datetime.now().isoformat()
         else:
             end_date = datetime.datetime.fromisoformat(end_date).isoformat()
+        return start_date, end_date
 
-        payments_in_range = [
-            p for p in self.data["payments"]
-            if start_date <= p["payment_date"] <= end_date
-        ]
+    def payment_totals(self, start_date=None, end_date=None):
+        """Payment count, revenue, refunds and revenue per method for a date range
 
-        total_revenue = sum(p["amount"] for p in payments_in_range)
-        payment_methods = {}
+        Answered from the revenue rollup, so multi-year ranges cost one
+        lookup per edge day rather than a pass over every payment.
+        """
+        start_date, end_date = self._report_range(start_date, end_date)
+        totals = self.payments.revenue().between(start_date, end_date, self.payments.between)
+        return dict(totals, start_date=start_date, end_date=end_date)
+
+    def generate_payment_report(self, start_date=None, end_date=None):
+        """Print the payment report for a date range and return the payments in it
 
-        for payment in payments_in_range:
-            method = payment["payment_method"]
-            payment_methods[method] = payment_methods.get(method, 0) + payment["amount"]
+        The printed totals come from payment_totals(); use that directly when
+        only the totals are needed.
+        """
+        totals = self.payment_totals(start_date, end_date)
+        start_date, end_date = totals["start_date"], totals["end_date"]
+        total_revenue = totals["revenue"]
 
         print(f"\n=== PAYMENT REPORT ===")
         print(f"Date Range: {start_date[:10]} to {end_date[:10]}")
-        print(f"Total Payments: {len(payments_in_range)}")
+        print(f"Total Payments: {totals['payments']}")
+        if totals["refund_count"]:
+            print(f"Refunds: {totals['refund_count']} (${totals['refunds']:.2f})")
         print(f"Total Revenue: ${total_revenue:.2f}")
         print(f"\nPayment Methods:")
-        for method, amount in payment_methods.items():
+        for method, amount in totals["payment_methods"].items():
             percentage = (amount / total_revenue) * 100 if total_revenue > 0 else 0
             print(f"  {method}: ${amount:.2f} ({percentage:.1f}%)")
 
-        return payments_in_range
+        return self.payments.between(start_date, end_date)
 
-    def get_member_balance(self, member_id):
-        """Get member's payment history and balance"""
-        if member_id not in self.data["members"]:
+    def monthly_revenue(self):
+        """Revenue summary per month over the whole payment history"""
+        return self.payments.revenue().monthly()
+
+    def get_member_balance(self, member_id, limit=None, offset=0):
+        """Get member's payment history (newest first, optionally paged) and balance"""
+        if member_id not in self.members:
             return None
 
-        member = self.data["members"][member_id]
-        payments = [p for p in self.data["payments"] if p["member_id"] == member_id]
-        payments.sort(key=lambda x: x["payment_date"], reverse=True)
+        member = self.members[member_id]
+        payments = self.payments.for_member(member_id, limit, offset)
+        payment_count, total_paid = self.payments.member_totals(member_id)
+        self.accrue_late_fees()
+        accrual = self.late_fees.get(member_id) or {}
 
         balance_info = {
             "member_id": member_id,
@@ -225,22 +483,28 @@ class GymFeeManager:
             "email": member["email"],
             "fee_plan": member.get("fee_plan", {}),
             "payment_history": payments,
-            "total_paid": sum(p["amount"] for p in payments)
+            "payment_count": payment_count,
+            "total_paid": total_paid,
+            "days_late": accrual.get("days_late", 0),
+            "late_fee": accrual.get("late_fee", 0)
         }
 
         return balance_info
 
-    def export_financial_report(self, filename="gym_financial_report.csv"):
-        """Export financial data to CSV"""
-        with open(filename, 'w', newline='') as csvfile:
-            fieldnames = ["member_id", "name", "payment_date", "amount", "payment_method", "status"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for payment in self.data["payments"]:
-                writer.writerow(payment)
-
-        print(f"Financial report exported to {filename}")
+    def export_financial_report(self, filename="gym_financial_report.csv", start_date=None,
+                                end_date=None, member_ids=None):
+        """Export financial data to CSV, optionally by date range and members"""
+        payments = self.payments.iter_between(start_date, end_date, member_ids)
+        count = stream_csv(payments, PAYMENT_FIELDS, filename, rename={"member_name": "name"})
+        report(f"Financial report exported to {filename} ({count} payments)", filename)
+        return count
+
+    def export_columnar(self, path="gym_columns/payments", format=None):
+        """Export payments as column files for vectorized reporting"""
+        columns = PaymentColumns.from_records(self.payments)
+        columns.save(path, format)
+        print(f"Payments exported to {path} ({len(columns)} payments)")
+        return columns
 
 def main():
     """Interactive fee management system"""
@@ -282,7 +546,7 @@ def main():
                 manager.register_member_fee(member_id, fee_type, amount, start_date, billing_cycle)
             else:
                 amount = float(input("Amount: "))
-                billing_cycle = input("Billing Cycle (monthly/quarterly/annually): ")
+                billing_cycle = input("Billing Cycle (weekly/monthly/quarterly/annually or 'every N weeks'): ")
                 manager.register_member_fee(member_id, fee_type, amount, start_date, billing_cycle)
 
         elif choice == '2':
@@ -296,12 +560,14 @@ def main():
             overdue = manager.check_overdue_payments(days_overdue)
             print(f"\nFound {len(overdue)} overdue payments:")
             for payment in overdue:
-                print(f"  {payment['name']}: ${payment['amount']} ({payment['days_late']} days late)")
+                print(f"  {payment['name']}: ${payment['amount']} ({payment['days_late']} days late, "
+                      f"${payment['late_fee']} late fee)")
 
         elif choice == '4':
             days_before = int(input("Send reminders how many days before due date? (default: 3): ") or "3")
             reminders = manager.send_payment_reminders(days_before)
-            print(f"\nGenerated {len(reminders)} payment reminders")
+            queued = sum(1 for reminder in reminders if reminder["queued"])
+            print(f"\nGenerated {len(reminders)} payment reminders ({queued} newly queued)")
 
         elif choice == '5':
             start = input("Start Date (YYYY-MM-DD) or press Enter for last 30 days: ")
@@ -310,12 +576,16 @@ def main():
 
         elif choice == '6':
             member_id = input("Member ID: ")
-            balance = manager.get_member_balance(member_id)
+            balance = manager.get_member_balance(member_id, limit=5)
             if balance:
                 print(f"\nMember Balance for {balance['name']}:")
-                print(f"  Total Paid: ${balance['total_paid']:.2f}")
+                print(f"  Total Paid: ${balance['total_paid']:.2f} ({balance['payment_count']} payments)")
                 print(f"  Fee Plan: {balance['fee_plan'].get('fee_type', 'None')}")
                 print(f"  Next Due: {balance['fee_plan'].get('next_due_date', 'N/A')}")
+                if balance["late_fee"]:
+                    print(f"  Late Fee: ${balance['late_fee']:.2f} ({balance['days_late']} days late)")
+                for payment in balance["payment_history"]:
+                    print(f"    {payment['payment_date'][:10]}  ${payment['amount']:.2f}  {payment['payment_method']}")
             else:
                 print("Member not found!")
 
@@ -330,6 +600,7 @@ def main():
 
         elif choice == '9':
             print("Thanks for using Gym Fee Manager!")
+            manager.close()
             break
 
         else:
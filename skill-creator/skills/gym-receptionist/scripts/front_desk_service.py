@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Front Desk Service
+Local asyncio HTTP service sharing one GymAttendanceManager between desks and kiosks.
+"""
+
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from attendance_manager import GymAttendanceManager
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 409: "Conflict"}
+
+
+class FrontDeskService:
+    """Serves check-ins from memory and persists writes in coalesced batches
+
+    Check-in and check-out requests are queued and applied together through
+    `apply_events`, so writes arriving within `coalesce_window` seconds (or
+    while the previous batch is still being persisted) cost one disk write.
+    Status and occupancy reads are answered from memory on a worker thread.
+    They take the manager's lock, which a batch holds only while it changes
+    the attendance indexes and the occupancy heatmap, not while it is written
+    to disk (an occupancy read expires stale sessions itself, so it locks too).
+    """
+
+    def __init__(self, manager, coalesce_window=0.002):
+        self.manager = manager
+        self.coalesce_window = coalesce_window
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._readers = ThreadPoolExecutor(max_workers=4)
+        self._queue = None
+        self._batcher = None
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        """Start listening on a TCP port or a Unix socket"""
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.ensure_future(self._run_batches())
+        if unix_path:
+            return await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def stop(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._batcher
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+    async def submit(self, op, member_id):
+        """Queue a check-in/check-out and wait for its batch to be persisted"""
+        future = asyncio.get_running_loop().create_future()
+        event = {"op": op, "member_id": member_id,
+                 "time": datetime.datetime.now().isoformat()}
+        await self._queue.put((event, future))
+        return await future
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.coalesce_window)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            events = [event for event, _ in batch]
+            try:
+                result = await loop.run_in_executor(self._writer, self._apply, events)
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+
+            errors = {error["index"]: error["error"] for error in result["errors"]}
+            for index, (event, future) in enumerate(batch):
+                if index in errors:
+                    future.set_result({"ok": False, "error": errors[index]})
+                else:
+                    future.set_result({"ok": True, "member_id": event["member_id"],
+                                       "time": event["time"]})
+
+    def _apply(self, events):
+        return self.manager.apply_events(events, quiet=True)
+
+    def _register(self, fields):
+        self.manager.register_member(fields["member_id"], fields["name"],
+                                     fields.get("membership_type", "basic"),
+                                     fields.get("phone", ""), fields.get("email", ""),
+                                     quiet=True)
+
+    def status(self, member_id):
+        return self.manager.get_member_status(member_id)
+
+    def occupancy(self):
+        with self.manager.lock:
+            snapshot = self.manager.occupancy_snapshot()
+            snapshot["members"] = sorted(self.manager.occupancy.sessions)
+        return snapshot
+
+    async def _read(self, method, *args):
+        """Run a read off the event loop, so one waiting on a batch doesn't stall it"""
+        return await asyncio.get_running_loop().run_in_executor(self._readers, method, *args)
+
+    async def route(self, method, path, query, body):
+        """Dispatch one request and return (status, payload)"""
+        if method == "POST" and path in ("/check_in", "/check_out"):
+            if not body.get("member_id"):
+                return 400, {"ok": False, "error": "member_id is required"}
+            result = await self.submit(path[1:], body["member_id"])
+            return (200 if result["ok"] else 409), result
+
+        if method == "POST" and path == "/members":
+            if not body.get("member_id") or not body.get("name"):
+                return 400, {"ok": False, "error": "member_id and name are required"}
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._writer, self._register, body)
+            return 200, {"ok": True, "member_id": body["member_id"]}
+
+        if method == "GET" and path == "/status":
+            member_id = query.get("member_id", [""])[0]
+            status = await self._read(self.status, member_id)
+            if status is None:
+                return 404, {"ok": False, "error": f"Member ID {member_id} not found!"}
+            return 200, dict(status, ok=True)
+
+        if method == "GET" and path == "/occupancy":
+            return 200, dict(await self._read(self.occupancy), ok=True)
+
+        return 404, {"ok": False, "error": f"No route for {method} {path}"}
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                raw_body = await reader.readexactly(length) if length else b""
+                url = urlsplit(target)
+                try:
+                    body = json.loads(raw_body) if raw_body else {}
+                    if not isinstance(body, dict):
+                        raise ValueError("Request body must be a JSON object")
+                    status, payload = await self.route(method, url.path, parse_qs(url.query), body)
+                except ValueError as error:
+                    status, payload = 400, {"ok": False, "error": str(error)}
+
+                response = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(response)}\r\n\r\n".encode() + response)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+class DeskClient:
+    """Minimal keep-alive HTTP client used by the load generator"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, unix_path=None):
+        if unix_path:
+            return cls(*await asyncio.open_unix_connection(unix_path))
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        self.writer.close()
+
+
+async def generate_load(requests=2000, concurrency=20, host="127.0.0.1", port=8765,
+                        unix_path=None):
+    """Drive check-in/check-out cycles and report check-in latency"""
+    clients = [await DeskClient.connect(host, port, unix_path) for _ in range(concurrency)]
+    for worker in range(concurrency):
+        await clients[worker].request("POST", "/members", {
+            "member_id": f"LOAD{worker:04d}", "name": f"Load Member {worker}"})
+
+    latencies = []
+    cycles = max(1, requests // concurrency)
+
+    async def desk(worker):
+        client = clients[worker]
+        member_id = f"LOAD{worker:04d}"
+        for _ in range(cycles):
+            started = time.perf_counter()
+            await client.request("POST", "/check_in", {"member_id": member_id})
+            latencies.append((time.perf_counter() - started) * 1000)
+            await client.request("POST", "/check_out", {"member_id": member_id})
+
+    started = time.perf_counter()
+    await asyncio.gather(*(desk(worker) for worker in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    for client in clients:
+        client.close()
+
+    latencies.sort()
+    return {
+        "check_ins": len(latencies),
+        "throughput": len(latencies) * 2 / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    }
+
+
+async def serve(port=8765, unix_path=None):
+    service = FrontDeskService(GymAttendanceManager())
+    server = await service.start(port=port, unix_path=unix_path)
+    print(f"Front desk service listening on {unix_path or f'127.0.0.1:{port}'}")
+    async with server:
+        await server.serve_forever()
+
+
+async def self_test(requests=2000, concurrency=20):
+    """Run the service in a scratch directory and load it in-process"""
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            manager = GymAttendanceManager()
+            service = FrontDeskService(manager)
+            server = await service.start(port=0)
+            port = server.sockets[0].getsockname()[1]
+            stats = await generate_load(requests, concurrency, port=port)
+            server.close()
+            await server.wait_closed()
+            await service.stop()
+            manager.close()
+        finally:
+            os.chdir(cwd)
+
+    print("FRONT DESK LOAD TEST")
+    print("=" * 30)
+    print(f"Check-ins: {stats['check_ins']} from {concurrency} desks")
+    print(f"Throughput: {stats['throughput']:.0f} requests/s")
+    print(f"Check-in latency p50: {stats['p50_ms']:.2f} ms, p99: {stats['p99_ms']:.2f} ms")
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("serve", "load"):
+        print("Usage:")
+        print("  front_desk_service.py serve [port | unix-socket-path]")
+        print("  front_desk_service.py load [requests] [concurrency]")
+        sys.exit(1)
+
+    if sys.argv[1] == "serve":
+        target = sys.argv[2] if len(sys.argv) > 2 else "8765"
+        if target.isdigit():
+            asyncio.run(serve(port=int(target)))
+        else:
+            asyncio.run(serve(unix_path=target))
+    else:
+        requests = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+        asyncio.run(self_test(requests, concurrency))
+
+if __name__ == "__main__":
+    main()
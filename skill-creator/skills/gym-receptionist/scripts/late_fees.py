@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Late Fee Accrual
+Per-plan late fee terms and a daily materialized ledger of accrued late fees.
+"""
+
+import datetime
+
+# Used for any term a fee type doesn't set: $1 per day late, no grace, no cap
+DEFAULT_TERMS = {"daily_rate": 1, "grace_days": 0, "cap": None}
+
+
+def late_fee_terms(fees, fee_type):
+    """Late fee terms of a fee type, from its optional "late_fee" entry in the fee structure"""
+    terms = dict(DEFAULT_TERMS)
+    terms.update(fees.get(fee_type, {}).get("late_fee", {}))
+    return terms
+
+
+def late_fee(days_late, terms):
+    """Fee owed for being `days_late` days late: days past the grace period, capped"""
+    fee = max(0, days_late - terms["grace_days"]) * terms["daily_rate"]
+    if terms["cap"] is not None:
+        fee = min(fee, terms["cap"])
+    return fee
+
+
+class LateFeeLog:
+    """Accrued late fees kept in the fee data file"""
+
+    def __init__(self, data):
+        self.data = data.setdefault("late_fees", {"accrued_on": None, "accruals": {}})
+
+    @property
+    def accrued_on(self):
+        return self.data["accrued_on"]
+
+    def get(self, member_id):
+        return self.data["accruals"].get(member_id)
+
+    def replace(self, accrued_on, accruals):
+        """Swap in a full day's accruals"""
+        self.data["accrued_on"] = accrued_on
+        self.data["accruals"] = accruals
+
+    def set(self, member_id, accrual):
+        """Store or (with None) clear one member's accrual"""
+        if accrual is None:
+            self.data["accruals"].pop(member_id, None)
+        else:
+            self.data["accruals"][member_id] = accrual
+
+
+class LateFeeLedger:
+    """Late fees of overdue plans, computed once a day and read back from the log
+
+    `accrue` walks the overdue members once per calendar day, as of the
+    start of that day, and stores each one's days late and fee. Overdue
+    lists and balance lookups then read the stored values. Fee plan changes
+    made through the registry (a payment moving the due date, say) update
+    that member's accrual straight away.
+    """
+
+    def __init__(self, registry, calendar, data, log):
+        self.registry = registry
+        self.calendar = calendar
+        self.data = data
+        self.log = log
+        registry.subscribe(self._on_change)
+
+    def close(self):
+        self.registry.unsubscribe(self._on_change)
+
+    @staticmethod
+    def _start_of(day):
+        return datetime.datetime.combine(datetime.date.fromisoformat(day), datetime.time())
+
+    def _accrual(self, member, as_of):
+        """Stored accrual of one member as of a moment, or None when not late"""
+        fee_plan = member.get("fee_plan")
+        if not fee_plan or fee_plan.get("status") != "active":
+            return None
+        due_date = datetime.datetime.fromisoformat(fee_plan["next_due_date"])
+        days_late = (as_of - due_date).days
+        if days_late <= 0:
+            return None
+        terms = late_fee_terms(self.data["fees"], fee_plan["fee_type"])
+        return {"due_date": fee_plan["next_due_date"], "days_late": days_late,
+                "late_fee": late_fee(days_late, terms)}
+
+    def accrue(self, now=None):
+        """Materialize today's accruals; True if they were recomputed"""
+        today = (now or datetime.datetime.now()).date().isoformat()
+        if self.log.accrued_on == today:
+            return False
+
+        as_of = self._start_of(today)
+        accruals = {}
+        for member_id in self.calendar.late_by_more_than(as_of, 0):
+            accrual = self._accrual(self.registry.members[member_id], as_of)
+            if accrual is not None:
+                accruals[member_id] = accrual
+        self.log.replace(today, accruals)
+        return True
+
+    def invalidate(self):
+        """Recompute on the next accrue(), e.g. after the fee structure changed"""
+        self.log.replace(None, {})
+
+    def overdue(self, days_overdue=0):
+        """(member_id, accrual) more than `days_overdue` days late, most overdue first"""
+        as_of = self._start_of(self.log.accrued_on)
+        overdue = []
+        for member_id in self.calendar.late_by_more_than(as_of, days_overdue):
+            accrual = self.log.get(member_id)
+            if accrual is not None:
+                overdue.append((member_id, accrual))
+        return overdue
+
+    def get(self, member_id):
+        return self.log.get(member_id)
+
+    def _on_change(self, member_id, member, fields):
+        if "fee_plan" in fields and self.log.accrued_on is not None:
+            self.log.set(member_id, self._accrual(member, self._start_of(self.log.accrued_on)))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Gym Member Registry
+Single cached member table shared by the attendance and fee managers.
+"""
+
+from pathlib import Path
+
+from storage import open_store
+
+_registries = {}
+
+
+class MemberRegistry:
+    """Member records loaded once and persisted in one place
+
+    The attendance and fee managers read `members` directly and write
+    through `register` and `update`, which persist only the changed fields
+    and notify subscribers. Changes other processes made to the same file
+    are picked up on the next write or `transaction()`, and subscribers are
+    notified of them too.
+    """
+
+    def __init__(self, storage="journal", data_file="gym_members.json"):
+        self.data_file = Path(data_file)
+        self.store = open_store(storage, self.data_file, replay=self.replay,
+                                on_events=self._apply_foreign, on_merge=self._adopt)
+        self.data = self.store.load({"members": {}})
+        self.members = self.data["members"]
+        self._subscribers = []
+
+    @staticmethod
+    def replay(data, events):
+        """Apply journaled member changes on top of a loaded snapshot"""
+        for event in events:
+            if event["op"] == "register":
+                data["members"][event["member_id"]] = dict(event["fields"])
+            elif event["op"] == "visit":
+                member = data["members"].setdefault(event["member_id"], {})
+                member["total_visits"] = member.get("total_visits", 0) + event["visits"]
+                member.update(event["fields"])
+            else:
+                data["members"].setdefault(event["member_id"], {}).update(event["fields"])
+        return data
+
+    def transaction(self):
+        """Lock the member file with `members` up to date, for read-modify-write updates"""
+        return self.store.transaction(self.data)
+
+    def _apply_foreign(self, data, events):
+        """Apply member changes journaled by another process"""
+        self.replay(data, events)
+        for event in events:
+            self._notify(event["member_id"], event["fields"])
+
+    def _adopt(self, data):
+        """Take over the member table after merging another process's save"""
+        members = data["members"]
+        changed = [member_id for member_id, member in members.items()
+                   if self.members.get(member_id) != member]
+        removed = [member_id for member_id in self.members if member_id not in members]
+        if members is not self.members:
+            self.members.clear()
+            self.members.update(members)
+            data["members"] = self.members
+        self.data = data
+        for member_id in changed:
+            self._notify(member_id, self.members[member_id])
+        for member_id in removed:
+            for callback in list(self._subscribers):
+                callback(member_id, {}, {})
+
+    def _notify(self, member_id, fields):
+        member = self.members[member_id]
+        for callback in list(self._subscribers):
+            callback(member_id, member, fields)
+
+    def subscribe(self, callback):
+        """Call callback(member_id, member, changed_fields) after every change
+
+        A member that another process's data no longer has is reported with
+        an empty member and no changed fields.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def get(self, member_id):
+        return self.members.get(member_id)
+
+    def __contains__(self, member_id):
+        return member_id in self.members
+
+    def register(self, member_id, member):
+        """Add or replace a member record"""
+        with self.transaction():
+            self.members[member_id] = dict(member)
+            return self._changed("register", member_id, member)
+
+    def update(self, member_id, **fields):
+        """Change some fields of a member and persist just those fields"""
+        with self.transaction():
+            self.members.setdefault(member_id, {}).update(fields)
+            return self._changed("upsert", member_id, fields)
+
+    def update_many(self, changes):
+        """Apply {member_id: fields} updates and persist them together"""
+        events = []
+        with self.transaction():
+            for member_id, fields in changes.items():
+                self.members.setdefault(member_id, {}).update(fields)
+                events.append({"op": "upsert", "member_id": member_id, "fields": fields})
+            self.store.record_many(self.data, events)
+        for member_id, fields in changes.items():
+            self._notify(member_id, fields)
+
+    def count_visits(self, visits):
+        """Persist visits already added to `members`, given as {member_id: (visits, last_visit)}
+
+        They are stored as increments, so processes checking members in at
+        the same time add to each other's totals instead of overwriting them.
+        """
+        events = [{"op": "visit", "member_id": member_id, "visits": count,
+                   "fields": {"last_visit": last_visit}}
+                  for member_id, (count, last_visit) in visits.items()]
+        with self.transaction():
+            self.store.record_many(self.data, events)
+        for member_id, (count, last_visit) in visits.items():
+            self._notify(member_id, {"total_visits": self.members[member_id]["total_visits"],
+                                     "last_visit": last_visit})
+
+    def _changed(self, op, member_id, fields):
+        self.store.record(self.data, {"op": op, "member_id": member_id,
+                                      "fields": fields})
+        self._notify(member_id, fields)
+        return self.members[member_id]
+
+    def import_members(self, members):
+        """Merge members from a legacy data file, keeping fields already known"""
+        imported = 0
+        for member_id, member in members.items():
+            known = self.members.get(member_id, {})
+            missing = {key: value for key, value in member.items() if key not in known}
+            if missing:
+                self.update(member_id, **missing)
+                imported += 1
+        return imported
+
+    def close(self):
+        self.store.close()
+        for key, registry in list(_registries.items()):
+            if registry is self:
+                del _registries[key]
+
+
+def get_registry(storage="journal", data_file="gym_members.json"):
+    """Return the process-wide registry for a storage backend"""
+    key = (storage, str(Path(data_file).resolve()))
+    if key not in _registries:
+        _registries[key] = MemberRegistry(storage, data_file)
+    return _registries[key]
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+SQLite Migration Tool
+Imports the JSON attendance and fee files from the current directory into gym_data.db.
+"""
+
+import sys
+
+from attendance_manager import GymAttendanceManager
+from fee_manager import GymFeeManager
+from member_registry import get_registry
+from storage import SqliteStore
+
+
+def migrate(db_file="gym_data.db"):
+    """Copy all JSON-backed attendance and fee data into a new SQLite database"""
+    store = SqliteStore(db_file)
+    if not store.is_empty():
+        print(f"Error: {db_file} already contains data, refusing to import twice!")
+        store.close()
+        return False
+
+    attendance = GymAttendanceManager(storage="journal")
+    fees = GymFeeManager(storage="json")
+    members = get_registry("journal").members
+    # The JSON fee manager keeps its reminder log in a file of its own
+    store.import_data(members, attendance.data, dict(fees.data, reminders=list(fees.reminders)))
+    attendance.close()
+    fees.close()
+    store.close()
+
+    print(f"Imported {len(members)} members, "
+          f"{len(attendance.data['attendance'])} visits, "
+          f"{len(fees.data['payments'])} payments, the settlement import history and accrued late fees into {db_file}")
+    return True
+
+if __name__ == "__main__":
+    migrate(*sys.argv[1:2])
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Gym Occupancy Tracker
+Live occupancy counts and a rolling hour-of-week check-in heatmap.
+"""
+
+import collections
+import datetime
+
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+class OccupancyTracker:
+    """Occupancy state updated in O(1) per check-in and check-out
+
+    Keeps who is in the gym (with parsed check-in times), counts per
+    membership type, and a 7x24 heatmap of check-ins over the last
+    `window_weeks` weeks. Old hours drop out of the heatmap as time moves on.
+    """
+
+    def __init__(self, window_weeks=4):
+        self.window_hours = window_weeks * 7 * 24
+        self.sessions = {}
+        self.by_membership_type = collections.Counter()
+        self.heatmap = [[0] * 24 for _ in DAYS]
+        self._buckets = collections.deque()
+        self._latest_hour = None
+
+    @staticmethod
+    def _absolute_hour(when):
+        return when.toordinal() * 24 + when.hour
+
+    def load(self, check_ins, recent_records):
+        """Rebuild from current check-ins and attendance inside the window"""
+        for member_id, info in check_ins.items():
+            self.sessions[member_id] = (
+                datetime.datetime.fromisoformat(info["check_in_time"]),
+                info["membership_type"]
+            )
+            self.by_membership_type[info["membership_type"]] += 1
+        for record in recent_records:
+            self._count_check_in(datetime.datetime.fromisoformat(record["check_in"]))
+        self._expire(datetime.datetime.now())
+
+    def check_in(self, member_id, when, membership_type):
+        self.sessions[member_id] = (when, membership_type)
+        self.by_membership_type[membership_type] += 1
+        self._count_check_in(when)
+
+    def check_out(self, member_id):
+        session = self.sessions.pop(member_id, None)
+        if session is not None:
+            self.by_membership_type[session[1]] -= 1
+            if not self.by_membership_type[session[1]]:
+                del self.by_membership_type[session[1]]
+
+    def _count_check_in(self, when):
+        hour = self._absolute_hour(when)
+        if self._latest_hour is not None and hour <= self._latest_hour - self.window_hours:
+            return
+
+        self.heatmap[when.weekday()][when.hour] += 1
+        if self._buckets and self._buckets[-1][0] == hour:
+            self._buckets[-1][1] += 1
+        elif not self._buckets or self._buckets[-1][0] < hour:
+            self._buckets.append([hour, 1])
+        else:
+            # Late uploads land in an older bucket; the deque stays time ordered
+            for bucket in reversed(self._buckets):
+                if bucket[0] == hour:
+                    bucket[1] += 1
+                    break
+                if bucket[0] < hour:
+                    self._buckets.insert(self._buckets.index(bucket) + 1, [hour, 1])
+                    break
+            else:
+                self._buckets.appendleft([hour, 1])
+        self._expire(when)
+
+    def _expire(self, now):
+        """Drop heatmap hours that fell out of the rolling window"""
+        hour = self._absolute_hour(now)
+        if self._latest_hour is not None and hour < self._latest_hour:
+            return
+        self._latest_hour = hour
+        while self._buckets and self._buckets[0][0] <= hour - self.window_hours:
+            expired, count = self._buckets.popleft()
+            self.heatmap[(expired // 24 - 1) % 7][expired % 24] -= count
+
+    def snapshot(self, now=None):
+        """Current occupancy and heatmap, cheap enough to poll every second"""
+        now = now or datetime.datetime.now()
+        self._expire(now)
+        return {
+            "as_of": now.isoformat(),
+            "count": len(self.sessions),
+            "by_membership_type": dict(self.by_membership_type),
+            "heatmap": [list(row) for row in self.heatmap]
+        }
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Compact Record Storage
+Struct-of-arrays storage for attendance and payment history rows.
+"""
+
+import array
+import datetime
+import functools
+import json
+import math
+import mmap
+import os
+import struct
+from pathlib import Path
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MISSING_TIME = -(2 ** 63)
+MISSING_TEXT = -1
+HOUR_MICROS = 3600 * 1000000
+DAY_MICROS = 24 * HOUR_MICROS
+TYPECODES = {"text": "i", "time": "q", "number": "d"}
+# Footer of single-file pages written before offsets moved to their own file: the row count
+FOOTER = struct.Struct("<q")
+OFFSET = struct.Struct("q")
+
+
+def parse_time(timestamp):
+    """ISO timestamp as a local datetime without timezone, like datetime.now() gives
+
+    Times with a UTC offset (or a trailing "Z") are converted to local time.
+    """
+    if timestamp.endswith(("Z", "z")):
+        timestamp = timestamp[:-1] + "+00:00"
+    when = datetime.datetime.fromisoformat(timestamp)
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    return when
+
+
+def to_micros(timestamp):
+    """ISO timestamp to integer microseconds since the epoch"""
+    if timestamp is None:
+        return MISSING_TIME
+    delta = parse_time(timestamp) - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+@functools.lru_cache(maxsize=4096)
+def day_text(day):
+    """ISO date of a day number counted from the epoch"""
+    return (EPOCH + datetime.timedelta(days=day)).date().isoformat()
+
+
+def from_micros(micros):
+    """Microseconds since the epoch back to datetime.isoformat() text"""
+    if micros == MISSING_TIME:
+        return None
+    seconds, micros = divmod(micros, 1000000)
+    return (EPOCH + datetime.timedelta(0, seconds, micros)).isoformat()
+
+
+def hours_between(start, end):
+    """Visit length in hours between two microsecond timestamps, like session_hours"""
+    return round(datetime.timedelta(microseconds=end - start).total_seconds() / 3600, 2)
+
+
+def encode_row(record):
+    """One row as a line of compact JSON, as stored in pages files"""
+    return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+
+def offsets_file(path):
+    """The row offsets that go with a pages file"""
+    return Path(path).with_suffix(".offsets")
+
+
+def _write_synced(f, data):
+    f.write(data)
+    f.truncate()
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def write_pages(path, lines):
+    """Write encoded rows and their offset index, renamed into place; returns the row count
+
+    Layout: the pages file holds the rows as JSON lines, its .offsets file
+    n + 1 native int64 offsets (where each row starts, and the end of the
+    last one). Both only ever grow (see append_pages), so the row count is
+    kept by whoever refers to the files.
+    """
+    path = Path(path)
+    tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_offsets = path.with_name(f"{offsets_file(path).name}.{os.getpid()}.tmp")
+    offsets = array.array("q", [0])
+    with open(tmp_file, 'wb') as f:
+        for line in lines:
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+        _write_synced(f, b"")
+    with open(tmp_offsets, 'wb') as f:
+        _write_synced(f, offsets.tobytes())
+    os.replace(tmp_offsets, offsets_file(path))
+    os.replace(tmp_file, path)
+    return len(offsets) - 1
+
+
+def append_pages(path, count, lines):
+    """Append rows after the first `count` rows of a pages file; returns the new row count
+
+    Whatever lies past those rows was left by a write that was never
+    committed and is overwritten. Readers holding `count` rows or fewer
+    are unaffected.
+    """
+    with open(offsets_file(path), 'r+b') as index, open(path, 'r+b') as f:
+        index.seek(OFFSET.size * count)
+        end = OFFSET.unpack(index.read(OFFSET.size))[0]
+        offsets = array.array("q")
+        f.seek(end)
+        for line in lines:
+            f.write(line)
+            end += len(line)
+            offsets.append(end)
+        _write_synced(f, b"")
+        index.seek(OFFSET.size * (count + 1))
+        _write_synced(index, offsets.tobytes())
+    return count + len(offsets)
+
+
+def _map(path):
+    """Read-only memory map of a file; empty files map to empty bytes"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class PagedRows:
+    """Read-only rows of a pages file, parsed one at a time from a memory map
+
+    Opening costs the same whatever the file holds: the offset index is
+    read in place from the map and no row is parsed until asked for. Only
+    the first `count` rows are read; without a count the file is taken to
+    be in the older single-file layout, with the offsets in a footer.
+    """
+
+    def __init__(self, path, count=None):
+        self.path = Path(path)
+        self._map = _map(self.path)
+        self.appendable = count is not None
+        if count is None:
+            end = len(self._map) - FOOTER.size
+            count = FOOTER.unpack_from(self._map, end)[0]
+            start = end - OFFSET.size * (count + 1)
+            self._offsets = memoryview(self._map)[start:end].cast("q")
+        else:
+            self._index = _map(offsets_file(self.path))
+            self._offsets = memoryview(self._index)[:OFFSET.size * (count + 1)].cast("q")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def line(self, position):
+        """A row's encoded bytes"""
+        return self._map[self._offsets[position]:self._offsets[position + 1]]
+
+    def __getitem__(self, position):
+        return json.loads(self.line(position))
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def pages_tail(self):
+        return self, []
+
+    def lines(self):
+        for position in range(len(self)):
+            yield self.line(position)
+
+
+class RecordTable:
+    """History rows kept column-wise in typed arrays and read back as dicts
+
+    Text columns hold int32 codes into one string table, so member ids,
+    names and payment methods repeated across rows are stored once.
+    Timestamps are int64 microseconds since the epoch and numbers are
+    doubles, with a one-byte flag so integers read back as integers. Keys
+    outside the schema are kept per row in a side dict.
+
+    A table built from PagedRows leaves its rows on disk: single rows are
+    read, changed and appended as dicts, and the columns are only built the
+    first time something needs them. Either way the table remembers which
+    pages file holds its leading rows unchanged, so saving it only has to
+    append the rows added since (see pages_tail).
+    """
+
+    fields = {}
+    derived = ()
+    _column_state = ("strings", "_codes", "columns", "_integral", "extras")
+
+    def __init__(self, records=()):
+        self._paged = None
+        self._saved = None
+        if isinstance(records, PagedRows):
+            self._paged = records
+            self._tail = []
+            self._patched = {}
+            return
+        self._init_columns()
+        for record in records:
+            self.append(record)
+
+    def _init_columns(self):
+        self.strings = []
+        self._codes = {}
+        self.columns = {name: array.array(TYPECODES[kind]) for name, kind in self.fields.items()}
+        self._integral = {name: array.array("b") for name, kind in self.fields.items()
+                          if kind == "number"}
+        self.extras = {}
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set yet: the columns of a paged table
+        if name not in self._column_state or self.__dict__.get("_paged") is None:
+            raise AttributeError(name)
+        self._load_columns()
+        return getattr(self, name)
+
+    def _load_columns(self):
+        """Parse every paged row into the columns"""
+        paged, tail, patched = self._paged, self._tail, self._patched
+        self._paged = None
+        del self._tail, self._patched
+        self._init_columns()
+        for position in range(len(paged)):
+            self.append(patched.get(position) or paged[position])
+        for record in tail:
+            self.append(record)
+        self._saved = None if patched else paged
+
+    @property
+    def paged(self):
+        """True while the rows are still read from a pages file"""
+        return self._paged is not None
+
+    def pages_tail(self):
+        """(PagedRows holding this table's leading rows unchanged, the later rows encoded), or None"""
+        if self._paged is not None:
+            if self._patched:
+                return None
+            return self._paged, [encode_row(record) for record in self._tail]
+        if self._saved is None:
+            return None
+        return self._saved, [encode_row(self.row(position))
+                             for position in range(len(self._saved), len(self))]
+
+    def repage(self, rows):
+        """Take note of a pages file just written with all of this table's rows"""
+        if self._paged is not None:
+            self._paged = rows
+            self._tail = []
+            self._patched = {}
+        else:
+            self._saved = rows
+
+    def lines(self):
+        """Rows encoded for write_pages, copying unchanged paged rows as they are"""
+        if self._paged is None:
+            for record in self:
+                yield encode_row(record)
+            return
+        for position in range(len(self._paged)):
+            record = self._patched.get(position)
+            yield self._paged.line(position) if record is None else encode_row(record)
+        for record in self._tail:
+            yield encode_row(record)
+
+    def _paged_row(self, position):
+        count = len(self._paged)
+        if position >= count:
+            return self._tail[position - count]
+        record = self._patched.get(position)
+        return self._paged[position] if record is None else record
+
+    def __len__(self):
+        if self._paged is not None:
+            return len(self._paged) + len(self._tail)
+        return len(self.columns[next(iter(self.fields))])
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.row(position)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        return self.row(position)
+
+    def to_json(self):
+        return list(self)
+
+    def code(self, text):
+        """Code of an interned string, adding it to the string table if new"""
+        code = self._codes.get(text)
+        if code is None:
+            code = self._codes[text] = len(self.strings)
+            self.strings.append(text)
+        return code
+
+    def lookup(self, text):
+        """Code of a string already in the table, or MISSING_TEXT"""
+        return self._codes.get(text, MISSING_TEXT)
+
+    def _encode(self, kind, value):
+        if kind == "text":
+            return MISSING_TEXT if value is None else self.code(value)
+        if kind == "time":
+            return to_micros(value)
+        return math.nan if value is None else value
+
+    def _decode(self, name, kind, position):
+        value = self.columns[name][position]
+        if kind == "text":
+            return None if value == MISSING_TEXT else self.strings[value]
+        if kind == "time":
+            return from_micros(value)
+        if math.isnan(value):
+            return None
+        return int(value) if self._integral[name][position] else value
+
+    def append(self, record):
+        """Store a record dict and return its position"""
+        position = len(self)
+        if self._paged is not None:
+            stored = {name: record.get(name) for name in self.fields}
+            stored.update((key, value) for key, value in record.items()
+                          if key not in self.fields and key not in self.derived)
+            self._tail.append(stored)
+            return position
+        for name, kind in self.fields.items():
+            value = record.get(name)
+            self.columns[name].append(self._encode(kind, value))
+            if kind == "number":
+                self._integral[name].append(isinstance(value, int))
+        extra = {key: value for key, value in record.items()
+                 if key not in self.fields and key not in self.derived}
+        if extra:
+            self.extras[position] = extra
+        return position
+
+    def get(self, position, name):
+        if self._paged is not None:
+            return self._paged_row(position).get(name)
+        return self._decode(name, self.fields[name], position)
+
+    def time(self, position, name):
+        """A time column's value in microseconds, without building a paged table's columns"""
+        if self._paged is not None:
+            return to_micros(self._paged_row(position).get(name))
+        return self.columns[name][position]
+
+    def set(self, position, name, value):
+        if self._saved is not None and position < len(self._saved):
+            self._saved = None
+        if self._paged is not None:
+            record = dict(self._paged_row(position), **{name: value})
+            count = len(self._paged)
+            if position >= count:
+                self._tail[position - count] = record
+            else:
+                self._patched[position] = record
+            return
+        self.columns[name][position] = self._encode(self.fields[name], value)
+        if name in self._integral:
+            self._integral[name][position] = isinstance(value, int)
+
+    def row(self, position):
+        """Materialize one row as the record dict it was built from"""
+        if self._paged is not None:
+            return dict(self._paged_row(position))
+        decode = self._decode
+        record = {name: decode(name, kind, position) for name, kind in self.fields.items()}
+        if self.extras:
+            record.update(self.extras.get(position, ()))
+        return record
+
+
+class AttendanceTable(RecordTable):
+    """Attendance rows; the "date" key is derived from check_in"""
+
+    fields = {"member_id": "text", "name": "text", "check_in": "time",
+              "check_out": "time", "duration": "number"}
+    derived = ("date",)
+
+    def row(self, position):
+        record = super().row(position)
+        record["date"] = record["check_in"][:10]
+        return record
+
+
+class PaymentTable(RecordTable):
+    """Payment rows"""
+
+    fields = {"member_id": "text", "member_name": "text", "amount": "number",
+              "payment_date": "time", "payment_method": "text", "status": "text"}
+
+
+class TransactionIdTable(RecordTable):
+    """Imported settlement transaction ids, one per row"""
+
+    fields = {"transaction_id": "text"}
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Reminder Outbox
+Persistent queue of payment reminder emails, delivered over SMTP by a rate-limited worker pool.
+"""
+
+import asyncio
+import datetime
+import email
+import json
+import os
+import smtplib
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.message import EmailMessage
+from pathlib import Path
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    dedup_key TEXT NOT NULL UNIQUE,
+    member_id TEXT NOT NULL,
+    recipient TEXT,
+    subject TEXT,
+    body TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt TEXT NOT NULL,
+    last_error TEXT,
+    created TEXT NOT NULL,
+    sent_at TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_ready ON outbox (status, next_attempt);
+"""
+MESSAGE_COLUMNS = ["id", "member_id", "recipient", "subject", "body", "attempts"]
+
+
+class ReminderLog:
+    """Append-only JSON-lines log of queued reminders, rotated by size
+
+    Kept apart from the fee data file so reminders stop growing every fee
+    save. When the live file passes `max_bytes` it is renamed to `.1`,
+    older files shift up and anything past `backups` is dropped.
+    """
+
+    def __init__(self, path="gym_reminders.jsonl", max_bytes=1024 * 1024, backups=5):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def _rotated(self, number):
+        return self.path.with_name(f"{self.path.name}.{number}")
+
+    def append(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        if self.path.exists() and self.path.stat().st_size + len(line) > self.max_bytes:
+            self._rotate()
+        with open(self.path, 'a') as f:
+            f.write(line)
+        return record
+
+    def _rotate(self):
+        for number in range(self.backups - 1, 0, -1):
+            if self._rotated(number).exists():
+                os.replace(self._rotated(number), self._rotated(number + 1))
+        if self.backups:
+            os.replace(self.path, self._rotated(1))
+        else:
+            self.path.unlink()
+
+    def __iter__(self):
+        """Logged reminders still on disk, oldest first"""
+        for path in [self._rotated(number) for number in range(self.backups, 0, -1)] + [self.path]:
+            if path.exists():
+                with open(path, 'r') as f:
+                    for line in f:
+                        yield json.loads(line)
+
+
+class ReminderOutbox:
+    """SQLite-backed queue of reminder emails, one per member and due date
+
+    Enqueueing the same (member, due date) twice is a no-op, so reminder
+    runs can repeat without mailing anyone twice in a billing cycle. A
+    message being sent is leased until `lease` seconds pass; if the
+    dispatcher dies mid-send it becomes due again after that. Delivered
+    messages are kept `retention_days` days, and until their due date has
+    passed, then pruned.
+    """
+
+    def __init__(self, db_file="gym_reminder_outbox.db", lease=300, retention_days=90):
+        self.db_file = Path(db_file)
+        self.lease = lease
+        self.retention_days = retention_days
+        self.conn = sqlite3.connect(str(self.db_file))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(OUTBOX_SCHEMA)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def enqueue(self, member_id, due_date, recipient, subject, body, now=None):
+        """Queue one reminder; False if this due date was already queued for the member"""
+        now = (now or datetime.datetime.now()).isoformat()
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO outbox (dedup_key, member_id, recipient, subject, body, "
+                "next_attempt, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (f"{member_id}|{due_date}", member_id, recipient, subject, body, now, now))
+        return cursor.rowcount == 1
+
+    def claim(self, limit=100, now=None):
+        """Lease up to `limit` messages that are due for a delivery attempt"""
+        now = now or datetime.datetime.now()
+        with self.conn:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM outbox "
+                "WHERE status IN ('pending', 'sending') AND next_attempt <= ? "
+                "ORDER BY next_attempt, id LIMIT ?", (now.isoformat(), limit)).fetchall()
+            leased_until = (now + datetime.timedelta(seconds=self.lease)).isoformat()
+            self.conn.executemany(
+                "UPDATE outbox SET status = 'sending', next_attempt = ? WHERE id = ?",
+                ((leased_until, row["id"]) for row in rows))
+        return [dict(row) for row in rows]
+
+    def mark_sent(self, message_id, now=None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = ?, "
+                "last_error = NULL WHERE id = ?",
+                ((now or datetime.datetime.now()).isoformat(), message_id))
+
+    def mark_failed(self, message_id, error, retry_at=None):
+        """Record a failed attempt; retried at `retry_at`, or given up on when None"""
+        with self.conn:
+            if retry_at is None:
+                self.conn.execute(
+                    "UPDATE outbox SET status = 'failed', attempts = attempts + 1, "
+                    "last_error = ? WHERE id = ?", (error, message_id))
+            else:
+                self.conn.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = attempts + 1, "
+                    "last_error = ?, next_attempt = ? WHERE id = ?",
+                    (error, retry_at.isoformat(), message_id))
+
+    def prune(self, now=None):
+        """Delete messages delivered over `retention_days` ago; returns how many
+
+        A message is kept while its due date is still ahead, so dropping its
+        dedup key can't let the reminder run queue it again.
+        """
+        now = now or datetime.datetime.now()
+        cutoff = (now - datetime.timedelta(days=self.retention_days)).isoformat()
+        with self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ? "
+                "AND substr(dedup_key, length(member_id) + 2) < ?", (cutoff, now.isoformat()))
+        return cursor.rowcount
+
+    def counts(self):
+        """Number of messages per status"""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"))
+
+
+class SmtpSender:
+    """Sends one message per SMTP connection; defaults to a local debug server"""
+
+    def __init__(self, host="localhost", port=1025, from_address="front-desk@gym.local",
+                 username=None, password=None, starttls=False, timeout=10):
+        self.host = host
+        self.port = port
+        self.from_address = from_address
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def send(self, message):
+        mail = EmailMessage()
+        mail["From"] = self.from_address
+        mail["To"] = message["recipient"]
+        mail["Subject"] = message["subject"]
+        mail.set_content(message["body"])
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(mail)
+
+
+class ReminderDispatcher:
+    """Drains the outbox through a thread pool, at most `per_second` sends a second
+
+    Failed sends are retried with exponential backoff (`backoff`, doubled
+    per attempt) until `max_attempts`; refused recipients and messages with
+    no address fail straight away. Only the dispatching thread touches the
+    outbox database; workers just talk SMTP.
+    """
+
+    def __init__(self, outbox, sender, workers=4, per_second=5, max_attempts=5, backoff=60):
+        self.outbox = outbox
+        self.sender = sender
+        self.workers = workers
+        self.per_second = per_second
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+    def dispatch(self, limit=1000):
+        """Attempt every message currently due; returns counts per outcome"""
+        self.outbox.prune()
+        messages = self.outbox.claim(limit)
+        results = {"sent": 0, "retrying": 0, "failed": 0}
+        if not messages:
+            return results
+
+        interval = 1.0 / self.per_second if self.per_second else 0
+        next_slot = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {}
+            for message in messages:
+                if not message["recipient"]:
+                    self.outbox.mark_failed(message["id"], "No email address")
+                    results["failed"] += 1
+                    continue
+                delay = next_slot - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_slot = max(next_slot, time.monotonic()) + interval
+                futures[pool.submit(self.sender.send, message)] = message
+
+            for future in as_completed(futures):
+                message = futures[future]
+                error = future.exception()
+                results[self._settle(message, error)] += 1
+        return results
+
+    def _settle(self, message, error):
+        now = datetime.datetime.now()
+        if error is None:
+            self.outbox.mark_sent(message["id"], now)
+            return "sent"
+
+        attempts = message["attempts"] + 1
+        permanent = isinstance(error, smtplib.SMTPRecipientsRefused)
+        if permanent or attempts >= self.max_attempts:
+            self.outbox.mark_failed(message["id"], str(error))
+            return "failed"
+        retry_at = now + datetime.timedelta(seconds=self.backoff * 2 ** (attempts - 1))
+        self.outbox.mark_failed(message["id"], str(error), retry_at)
+        return "retrying"
+
+
+class DebugSmtpServer:
+    """Local SMTP sink that accepts every message and keeps it in `messages`
+
+    Enough of the protocol for smtplib, for trying the outbox without a
+    real mail server.
+    """
+
+    def __init__(self, echo=False):
+        self.echo = echo
+        self.messages = []
+
+    async def start(self, host="127.0.0.1", port=1025):
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def _handle_connection(self, reader, writer):
+        def reply(line):
+            writer.write(line.encode() + b"\r\n")
+
+        reply("220 gym-debug-smtp ready")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("latin-1").strip().split(" ", 1)[0].upper()
+                if command in ("EHLO", "HELO"):
+                    reply("250 gym-debug-smtp")
+                elif command == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    lines = []
+                    while True:
+                        data = await reader.readline()
+                        if data in (b".\r\n", b".\n", b""):
+                            break
+                        lines.append(data[1:] if data.startswith(b"..") else data)
+                    self._received(email.message_from_bytes(b"".join(lines)))
+                    reply("250 OK: queued")
+                elif command == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    reply("250 OK")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _received(self, message):
+        self.messages.append(message)
+        if self.echo:
+            print(f"To: {message['To']}  Subject: {message['Subject']}")
+            print(message.get_payload())
+
+
+async def serve_debug(port=1025):
+    server = await DebugSmtpServer(echo=True).start(port=port)
+    print(f"Debug SMTP server listening on 127.0.0.1:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("send", "status", "debug-server"):
+        print("Usage: reminder_outbox.py send [host] [port] | status | debug-server [port]")
+        sys.exit(1)
+
+    if sys.argv[1] == "debug-server":
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 1025
+        try:
+            asyncio.run(serve_debug(port))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    outbox = ReminderOutbox()
+    if sys.argv[1] == "send":
+        host = sys.argv[2] if len(sys.argv) > 2 else "localhost"
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else 1025
+        dispatcher = ReminderDispatcher(outbox, SmtpSender(host, port))
+        results = dispatcher.dispatch()
+        print(f"Sent {results['sent']} reminders, {results['retrying']} to retry, "
+              f"{results['failed']} failed")
+    for status, count in sorted(outbox.counts().items()):
+        print(f"  {status}: {count}")
+    outbox.close()
+
+if __name__ == "__main__":
+    main()
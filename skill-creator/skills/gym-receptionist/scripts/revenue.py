@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Revenue Rollups
+Daily, monthly and per-method revenue kept up to date as payments are recorded.
+"""
+
+import bisect
+
+from records import DAY_MICROS, day_text, from_micros, to_micros
+
+# Leading slots of a bucket vector; one slot per payment method follows
+PAYMENTS, REFUND_COUNT, GROSS, REFUNDS = range(4)
+REFUND_STATUSES = ("refunded", "reversed")
+
+
+def cents(amount):
+    return int(round(amount * 100))
+
+
+class RevenueRollup:
+    """Revenue buckets per day and month, with prefix sums over the days
+
+    Every bucket is a vector of [payments, refunds, gross cents, refunded
+    cents, net cents per method]. Amounts are summed as integer cents so
+    prefix differences stay exact. Refunds and reversals are recorded as
+    negative amounts and counted apart from payments.
+
+    Prefix sums are repaired lazily from the earliest day that changed, so
+    recording today's payment costs O(1) and a backdated one O(days after it).
+    """
+
+    def __init__(self):
+        self.methods = []
+        self._method_slot = {}
+        self.days = []
+        self._buckets = []
+        self._prefix = []
+        self._stale = 0
+        self.months = {}
+
+    def __len__(self):
+        return len(self.days)
+
+    def _slot(self, method):
+        slot = self._method_slot.get(method)
+        if slot is None:
+            slot = self._method_slot[method] = 4 + len(self.methods)
+            self.methods.append(method)
+        return slot
+
+    def _vector(self):
+        return [0] * (4 + len(self.methods))
+
+    def _add_to(self, vector, method, count, amount_cents):
+        slot = self._slot(method)
+        if len(vector) <= slot:
+            vector.extend([0] * (slot + 1 - len(vector)))
+        if amount_cents < 0:
+            vector[REFUND_COUNT] += count
+            vector[REFUNDS] += amount_cents
+        else:
+            vector[PAYMENTS] += count
+            vector[GROSS] += amount_cents
+        vector[slot] += amount_cents
+
+    def add(self, payment_date, amount, method, count=1):
+        """Count `count` payments totalling `amount` on the day of `payment_date`"""
+        self.add_day(to_micros(payment_date[:10]) // DAY_MICROS, amount, method, count)
+
+    def add_day(self, day, amount, method, count=1):
+        """add() keyed by day number since the epoch"""
+        index = bisect.bisect_left(self.days, day)
+        if index == len(self.days) or self.days[index] != day:
+            self.days.insert(index, day)
+            self._buckets.insert(index, self._vector())
+            self._prefix.insert(index, None)
+        self._stale = min(self._stale, index)
+
+        amount_cents = cents(amount)
+        self._add_to(self._buckets[index], method, count, amount_cents)
+        month = day_text(day)[:7]
+        self._add_to(self.months.setdefault(month, self._vector()), method, count, amount_cents)
+
+    def _refresh(self):
+        """Recompute prefix sums from the earliest changed day onwards"""
+        width = 4 + len(self.methods)
+        running = list(self._prefix[self._stale - 1]) if self._stale else [0] * width
+        running.extend([0] * (width - len(running)))
+        for index in range(self._stale, len(self.days)):
+            bucket = self._buckets[index]
+            for slot in range(len(bucket)):
+                running[slot] += bucket[slot]
+            self._prefix[index] = list(running)
+        self._stale = len(self.days)
+
+    def days_total(self, first_day, last_day):
+        """Bucket vector summed over day numbers first_day..last_day, inclusive"""
+        if self._stale < len(self.days):
+            self._refresh()
+        total = self._vector()
+        start = bisect.bisect_left(self.days, first_day)
+        end = bisect.bisect_right(self.days, last_day)
+        if start >= end:
+            return total
+        upper = self._prefix[end - 1]
+        lower = self._prefix[start - 1] if start else ()
+        for slot in range(len(upper)):
+            total[slot] = upper[slot] - (lower[slot] if slot < len(lower) else 0)
+        return total
+
+    def between(self, start_date, end_date, payments_between):
+        """Summary of payments from start_date to end_date, inclusive
+
+        Whole days come from the prefix sums; the partial days at either
+        end of the range are read back through `payments_between`.
+        """
+        start, end = to_micros(start_date), to_micros(end_date)
+        total = self._vector()
+        if end < start:
+            return self.summary(total)
+
+        first_day, last_day = start // DAY_MICROS, end // DAY_MICROS
+        edges = []
+        if start % DAY_MICROS:
+            edges.append((start_date, from_micros(min(end, (first_day + 1) * DAY_MICROS - 1))))
+            first_day += 1
+        if first_day <= last_day and end % DAY_MICROS != DAY_MICROS - 1:
+            edges.append((from_micros(last_day * DAY_MICROS), end_date))
+            last_day -= 1
+
+        for edge_start, edge_end in edges:
+            for payment in payments_between(edge_start, edge_end):
+                self._add_to(total, payment["payment_method"], 1, cents(payment["amount"]))
+        if first_day <= last_day:
+            for slot, value in enumerate(self.days_total(first_day, last_day)):
+                total[slot] += value
+        return self.summary(total)
+
+    def monthly(self):
+        """Summary per "YYYY-MM" month, oldest first"""
+        return {month: self.summary(self.months[month]) for month in sorted(self.months)}
+
+    def summary(self, vector):
+        """Readable totals of one bucket vector, amounts in currency units"""
+        vector = vector + [0] * (4 + len(self.methods) - len(vector))
+        return {
+            "payments": vector[PAYMENTS],
+            "refund_count": vector[REFUND_COUNT],
+            "gross": vector[GROSS] / 100,
+            "refunds": -vector[REFUNDS] / 100,
+            "revenue": (vector[GROSS] + vector[REFUNDS]) / 100,
+            "payment_methods": {method: vector[4 + position] / 100
+                                for position, method in enumerate(self.methods)
+                                if vector[4 + position]}
+        }
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Settlement Import
+Streams card-processor settlement files into the payment history in committed chunks.
+"""
+
+import csv
+import datetime
+import json
+import sys
+from pathlib import Path
+
+from billing import advance_many, due_day, parse_cycle
+from records import TransactionIdTable
+
+SETTLEMENT_FIELDS = ["transaction_id", "member_id", "amount", "payment_date",
+                     "payment_method", "type"]
+# Settlement row type to the payment status it is recorded with
+TRANSACTION_TYPES = {"payment": "completed", "refund": "refunded",
+                     "reversal": "reversed", "chargeback": "reversed"}
+
+
+def read_chunks(path, chunk_size, offset=0):
+    """Yield (rows, line offsets, offset after the chunk) from a CSV or JSONL file
+
+    Rows are dicts, or None for lines that can't be parsed. Reading starts
+    at byte `offset`, so an import can resume where its checkpoint left off;
+    CSV files always take their column names from the header line.
+    """
+    jsonl = Path(path).suffix.lower() in (".jsonl", ".ndjson")
+    with open(path, 'rb') as f:
+        header = None
+        if not jsonl:
+            header = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+            offset = max(offset, f.tell())
+        f.seek(offset)
+
+        lines = []
+        starts = []
+        for line in f:
+            if line.strip():
+                lines.append(line.decode("utf-8"))
+                starts.append(offset)
+            offset += len(line)
+            if len(lines) == chunk_size:
+                yield _parse(lines, header), starts, offset
+                lines = []
+                starts = []
+        if lines:
+            yield _parse(lines, header), starts, offset
+
+
+def _parse(lines, header):
+    if header is None:
+        rows = []
+        for line in lines:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            rows.append(row if isinstance(row, dict) else None)
+        return rows
+    return [dict(zip(header, values)) if len(values) == len(header) else None
+            for values in csv.reader(lines)]
+
+
+class SettlementLog:
+    """Imported transaction ids and import checkpoints kept with the fee data
+
+    The ids are a history table ("settlement_ids"), so the JSON store keeps
+    them in an append-only pages file beside the data file rather than
+    rewriting them all with every chunk; the checkpoints stay in the file.
+    """
+
+    def __init__(self, data):
+        self.root = data
+        self.data = data.setdefault("settlements", {"checkpoints": {}})
+        ids = data.get("settlement_ids", ())
+        self.ids = ids if isinstance(ids, TransactionIdTable) else TransactionIdTable(ids)
+        # Older data files kept the ids as a list inside "settlements"
+        for transaction_id in self.data.pop("transactions", ()):
+            self.ids.append({"transaction_id": transaction_id})
+        data["settlement_ids"] = self.ids
+        self._ids = {self.ids.get(position, "transaction_id") for position in range(len(self.ids))}
+
+    def known(self, transaction_ids):
+        """The subset of transaction ids already imported"""
+        return {transaction_id for transaction_id in transaction_ids
+                if transaction_id in self._ids}
+
+    def checkpoint(self, source):
+        """(offset, due-date advances) of the last chunk committed from a source"""
+        checkpoint = self.data["checkpoints"].get(source)
+        if checkpoint is None:
+            return 0, {}
+        return checkpoint["offset"], checkpoint["advances"]
+
+    def record_chunk(self, source, transaction_ids, offset, advances):
+        """Stage a chunk's ids and checkpoint; saved with the next recorded change"""
+        for transaction_id in transaction_ids:
+            self.ids.append({"transaction_id": transaction_id})
+        self._ids.update(transaction_ids)
+        self.data["checkpoints"][source] = {"offset": offset, "advances": advances}
+
+
+class SettlementImporter:
+    """Idempotent, resumable import of settlement files through a GymFeeManager
+
+    Each chunk of rows is deduplicated by transaction id, appended to the
+    payment history and committed in one store write together with its ids
+    and the byte offset reached. Due dates of the members who paid are then
+    advanced in one registry batch. The checkpoint keeps each member's
+    (old, new) due date, so a crash between the two writes is repaired on
+    resume without advancing anyone twice. Each chunk runs inside the
+    manager's transaction (the data file's lock, or `BEGIN IMMEDIATE` with
+    SQLite, where a chunk that fails is rolled back whole), so concurrent
+    imports of one file never commit the same rows twice.
+    """
+
+    def __init__(self, manager, chunk_size=1000):
+        self.manager = manager
+        self.chunk_size = chunk_size
+        if manager.store.queryable:
+            self.settlements = manager.store.settlement_log()
+        else:
+            self.settlements = SettlementLog(manager.data)
+
+    def _sync_log(self):
+        """Follow the manager onto data merged with another process's save"""
+        if not self.manager.store.queryable and self.settlements.root is not self.manager.data:
+            self.settlements = SettlementLog(self.manager.data)
+
+    def import_file(self, path):
+        """Import a settlement file, resuming after its last committed chunk"""
+        source = str(Path(path).resolve())
+        with self.manager.transaction():
+            self._sync_log()
+            offset, advances = self.settlements.checkpoint(source)
+            self._reapply(advances)
+
+        summary = {"imported": 0, "duplicates": 0, "errors": [], "offset": offset}
+        for rows, starts, end in read_chunks(path, self.chunk_size, offset):
+            self._import_chunk(source, rows, starts, end, summary)
+            summary["offset"] = end
+
+        print(f"Imported {summary['imported']} transactions from {path}: "
+              f"{summary['duplicates']} duplicates skipped, {len(summary['errors'])} rejected")
+        return summary
+
+    def _import_chunk(self, source, rows, starts, end, summary):
+        with self.manager.transaction():
+            self._sync_log()
+            transaction_ids = [str(row.get("transaction_id") or "").strip() for row in rows if row]
+            seen = self.settlements.known(transaction_ids)
+
+            records = []
+            imported_ids = []
+            payers = {}
+            for row, start in zip(rows, starts):
+                transaction_id = str(row.get("transaction_id") or "").strip() if row else None
+                if transaction_id and transaction_id in seen:
+                    summary["duplicates"] += 1
+                    continue
+                record, error = self._payment(row, transaction_id)
+                if error:
+                    summary["errors"].append({"offset": start, "transaction_id": transaction_id,
+                                              "error": error})
+                    continue
+                seen.add(transaction_id)
+                imported_ids.append(transaction_id)
+                records.append(record)
+                if record["status"] == "completed":
+                    payers[record["member_id"]] = payers.get(record["member_id"], 0) + 1
+
+            advances = self._advances(payers)
+            for record in records:
+                self.manager.payments.append(record)
+            self.settlements.record_chunk(source, imported_ids, end, advances)
+            self.manager.store.record_many(self.manager.data, [
+                {"op": "settlement", "source": source, "offset": end}])
+            self._reapply(advances)
+            summary["imported"] += len(records)
+
+    def _payment(self, row, transaction_id):
+        """(payment record, None) for a valid settlement row, else (None, error)"""
+        if row is None:
+            return None, "Malformed line"
+        if not transaction_id:
+            return None, "Missing transaction id"
+        member_id = row.get("member_id")
+        if member_id not in self.manager.members:
+            return None, f"Member ID {member_id} not found"
+        try:
+            amount = float(row["amount"])
+        except (KeyError, TypeError, ValueError):
+            return None, f"Invalid amount: {row.get('amount')}"
+        try:
+            payment_date = datetime.datetime.fromisoformat(row["payment_date"]).isoformat()
+        except (KeyError, TypeError, ValueError):
+            return None, f"Invalid payment date: {row.get('payment_date')}"
+        kind = (row.get("type") or "payment").strip().lower()
+        if kind not in TRANSACTION_TYPES:
+            return None, f"Unknown transaction type: {kind}"
+
+        status = TRANSACTION_TYPES[kind]
+        if status == "completed" and amount < 0:
+            status = "refunded"
+        return {
+            "member_id": member_id,
+            "member_name": self.manager.members[member_id]["name"],
+            "amount": amount if status == "completed" else -abs(amount),
+            "payment_date": payment_date,
+            "payment_method": row.get("payment_method") or "Card",
+            "status": status
+        }, None
+
+    def _advances(self, payers):
+        """{member_id: [old due, new due]} moving each plan one cycle per payment"""
+        plans = {}
+        for member_id in payers:
+            fee_plan = self.manager.members[member_id].get("fee_plan")
+            if not fee_plan:
+                continue
+            try:
+                parse_cycle(fee_plan["billing_cycle"])
+            except ValueError as error:
+                print(f"Warning: {error}, next due date for {member_id} left unchanged")
+                continue
+            plans[member_id] = fee_plan
+
+        # One batch per round so two payments advance like two record_payment calls
+        due = {member_id: plan["next_due_date"] for member_id, plan in plans.items()}
+        for round_number in range(1, max(payers.values(), default=0) + 1):
+            members = [member_id for member_id in plans if payers[member_id] >= round_number]
+            if not members:
+                break
+            advanced = advance_many([due[member_id] for member_id in members],
+                                    [plans[member_id]["billing_cycle"] for member_id in members],
+                                    anchor_days=[due_day(plans[member_id]) for member_id in members])
+            due.update(zip(members, advanced))
+        return {member_id: [plan["next_due_date"], due[member_id]]
+                for member_id, plan in plans.items()}
+
+    def _reapply(self, advances):
+        """Apply checkpointed due-date advances that haven't reached the registry yet"""
+        changes = {}
+        for member_id, (old, new) in advances.items():
+            fee_plan = self.manager.members.get(member_id, {}).get("fee_plan")
+            if fee_plan and fee_plan["next_due_date"] == old:
+                changes[member_id] = {"fee_plan": dict(fee_plan, next_due_date=new,
+                                                       due_day=due_day(fee_plan))}
+        if changes:
+            self.manager.registry.update_many(changes)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: settlement_import.py settlement.csv|settlement.jsonl [chunk-size] [json|sqlite]")
+        sys.exit(1)
+
+    from fee_manager import GymFeeManager
+
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    manager = GymFeeManager(storage=sys.argv[3] if len(sys.argv) > 3 else "json")
+    result = SettlementImporter(manager, chunk_size).import_file(sys.argv[1])
+    for error in result["errors"][:20]:
+        print(f"  byte {error['offset']} ({error['transaction_id']}): {error['error']}")
+    manager.close()
+
+if __name__ == "__main__":
+    main()
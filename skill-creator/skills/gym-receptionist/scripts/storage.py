@@ -0,0 +1,1207 @@
+#!/usr/bin/env python3
+"""
+Gym Data Storage
+Persistence backends shared by the gym receptionist managers.
+"""
+
+import contextlib
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from records import PagedRows, append_pages, encode_row, offsets_file, write_pages
+from revenue import RevenueRollup
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # no advisory locks (Windows); writes are still atomic renames
+
+
+def session_hours(check_in, check_out):
+    """Length of a visit in hours, rounded for reports"""
+    started = datetime.datetime.fromisoformat(check_in)
+    ended = datetime.datetime.fromisoformat(check_out)
+    return round((ended - started).total_seconds() / 3600, 2)
+
+
+def _to_json(value):
+    """json `default` hook for compact history tables, which know their JSON form"""
+    to_json = getattr(value, "to_json", None)
+    if to_json is None:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return to_json()
+
+
+def atomic_write_json(path, data, **options):
+    """Write JSON to a temporary file renamed over `path`, so readers never see a torn file"""
+    path = Path(path)
+    tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, default=_to_json, **options)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+def _new_pages_file(data_file, key, stamp):
+    """A pages file name not in use yet, so nobody still reading an older one is disturbed"""
+    path = data_file.with_name(f"{data_file.stem}.{key}.{stamp}.pages")
+    attempt = 0
+    while path.exists() or offsets_file(path).exists():
+        attempt += 1
+        path = data_file.with_name(f"{data_file.stem}.{key}.{stamp}-{attempt}.pages")
+    return path
+
+
+def page_out(data_file, data, history, stamp):
+    """Copy of data with each history table in a pages file, referenced by name and row count
+
+    A table whose leading rows are still those of an existing pages file
+    has only the rows added since appended to it, so saving costs what was
+    added, not the whole history. Other tables (changed rows, older
+    single-file pages) are written to a new file named after `stamp`.
+    """
+    snapshot = dict(data)
+    for key in history:
+        rows = data.get(key)
+        if rows is None:
+            continue
+        tail = rows.pages_tail() if hasattr(rows, "pages_tail") else None
+        if tail is not None and tail[0].appendable and tail[0].path.exists():
+            pages, lines = tail
+            path = pages.path
+            count = append_pages(path, len(pages), lines) if lines else len(pages)
+            changed = bool(lines)
+        else:
+            path = _new_pages_file(data_file, key, stamp)
+            count = write_pages(path, rows.lines() if hasattr(rows, "lines") else map(encode_row, rows))
+            changed = True
+        if changed and hasattr(rows, "repage"):
+            rows.repage(PagedRows(path, count))
+        snapshot[key] = {"pages": path.name, "rows": count}
+    return snapshot
+
+
+def page_in(data_file, data, history):
+    """Swap pages file references in loaded data for their memory-mapped rows"""
+    for key in history:
+        reference = data.get(key)
+        if isinstance(reference, dict) and "pages" in reference:
+            data[key] = PagedRows(data_file.with_name(reference["pages"]), reference.get("rows"))
+    return data
+
+
+def drop_pages(data_file, snapshot, history):
+    """Delete pages and offsets files the snapshot just written no longer refers to"""
+    for key in history:
+        keep = snapshot.get(key, {}).get("pages")
+        for path in data_file.parent.glob(f"{data_file.stem}.{key}.*.pages"):
+            if path.name == keep:
+                continue
+            for stale in (path, offsets_file(path)):
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass  # gone already, or still mapped on Windows; left for the next snapshot
+
+
+class FileLock:
+    """Advisory fcntl lock on a sidecar file, shared by every process using the store
+
+    Re-entrant within a process: nested holders (a manager's transaction
+    and the writes inside it) share one lock, and threads wait their turn.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _Appended:
+    """Merge-base stand-in for a compact history table, which only ever grows"""
+
+    __slots__ = ("length",)
+
+    def __init__(self, length):
+        self.length = length
+
+
+_MISSING = object()
+
+
+def merge_base(value):
+    """Structural copy of data as last synced with the file, for merge_json()"""
+    if isinstance(value, dict):
+        return {key: merge_base(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [merge_base(item) for item in value]
+    if hasattr(value, "to_json") or isinstance(value, PagedRows):
+        return _Appended(len(value))
+    return value
+
+
+def merge_json(base, ours, theirs):
+    """Three-way merge of our data with the file's newer data
+
+    Whatever only one side changed since `base` is kept; dicts merge key by
+    key, and lists neither side shortened merge entry by entry, then keep
+    the entries they appended followed by ours. Where both changed the same
+    value ours wins.
+    """
+    if isinstance(base, _Appended):
+        appended = [ours[position] for position in range(base.length, len(ours))]
+        if not isinstance(theirs, (list, PagedRows)):
+            return ours
+        if hasattr(ours, "to_json"):
+            # Stay a table, and paged if theirs is
+            merged = type(ours)(theirs)
+            for record in appended:
+                merged.append(record)
+            return merged
+        return list(theirs) + appended
+    if hasattr(ours, "to_json"):
+        ours = ours.to_json()
+    if ours == base:
+        return theirs
+    if theirs == base:
+        return ours
+
+    if isinstance(ours, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = {}
+        for key in list(theirs) + [key for key in ours if key not in theirs]:
+            old = base.get(key, _MISSING)
+            mine = ours.get(key, _MISSING)
+            other = theirs.get(key, _MISSING)
+            if mine is _MISSING:
+                if old is _MISSING or other != old:
+                    merged[key] = other
+            elif other is _MISSING:
+                if old is _MISSING or mine != old:
+                    merged[key] = mine
+            else:
+                merged[key] = merge_json(old, mine, other)
+        return merged
+
+    if isinstance(ours, list) and isinstance(theirs, list) and isinstance(base, list):
+        length = len(base)
+        if len(ours) >= length and len(theirs) >= length:
+            return ([merge_json(old, mine, other) for old, mine, other in zip(base, ours, theirs)]
+                    + theirs[length:] + ours[length:])
+    return ours
+
+
+class JsonFileStore:
+    """Rewrites the whole data file on every change
+
+    Saves are atomic renames made under an advisory lock, and the file
+    carries a version counter. If another process saved since this one
+    last loaded or saved, our data is merged with theirs (merge_json) and
+    `on_merge` is called with the merged data for the owner to adopt.
+
+    Keys listed in `history` are kept in pages files beside the data file
+    and load as memory-mapped PagedRows (see page_out).
+    """
+
+    queryable = False
+
+    def __init__(self, data_file, on_merge=None, history=()):
+        self.data_file = Path(data_file)
+        self.on_merge = on_merge
+        self.history = history
+        self.lock = FileLock(self.data_file.with_suffix(".lock"))
+        self.version = 0
+        self._base = None
+        self._synced = None
+
+    def _identity(self):
+        """(inode, mtime, size) of the data file; every rename changes it"""
+        try:
+            stat = os.stat(self.data_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        with open(self.data_file, 'r') as f:
+            data = json.load(f)
+        self._synced = self._identity()
+        version = data.pop("version", 0)
+        return page_in(self.data_file, data, self.history), version
+
+    def load(self, default):
+        """Load the data file or fall back to the default structure"""
+        with self.lock:
+            if self.data_file.exists():
+                data, self.version = self._read()
+            else:
+                data = default
+        self._base = merge_base(data)
+        return data
+
+    @contextlib.contextmanager
+    def transaction(self, data):
+        """Hold the file lock with `data` caught up on other processes' saves
+
+        Check an operation and apply it inside the transaction, so it is
+        validated against the same state it is saved over.
+        """
+        with self.lock:
+            yield self._catch_up(data)
+
+    def _catch_up(self, data):
+        """Merge in a newer save by another process; returns the data to keep using"""
+        if self._identity() in (self._synced, None):
+            return data
+        theirs, version = self._read()
+        if version == self.version:
+            return data
+        data = merge_json(self._base, data, theirs)
+        self.version = version
+        if self.on_merge is not None:
+            self.on_merge(data)
+        self._base = merge_base(data)
+        return data
+
+    def record(self, data, event):
+        """Persist a single change"""
+        self.save(data)
+
+    def record_many(self, data, events):
+        """Persist a batch of changes with one write"""
+        if events:
+            self.save(data)
+
+    def save(self, data):
+        """Write the full data set to disk, merging first if another process saved"""
+        with self.lock:
+            data = self._catch_up(data)
+            self.version += 1
+            snapshot = page_out(self.data_file, data, self.history, self.version)
+            atomic_write_json(self.data_file, dict(snapshot, version=self.version), indent=2)
+            self._synced = self._identity()
+            drop_pages(self.data_file, snapshot, self.history)
+        self._base = merge_base(data)
+
+    def close(self):
+        self.lock.close()
+
+
+class JournalStore:
+    """Snapshot file plus an append-only event journal
+
+    Every change is appended to the journal as one compact JSON line, so a
+    write costs the same no matter how much history the snapshot holds.
+    Once `compact_every` events have accumulated the journal is rotated and
+    a background thread folds it into a fresh snapshot. Loading reads the
+    snapshot and replays whatever journal tail is newer than it.
+
+    Several processes can share one journal. Appends happen under an
+    advisory file lock and event sequence numbers act as the version: before
+    writing, a store replays any events other processes appended since its
+    own last write (through `on_events`, defaulting to `replay`). If those
+    events were already folded into a snapshot it reloads everything and
+    hands the new data to `on_merge`.
+
+    Snapshots keep the keys listed in `history` in pages files, so loading
+    maps them instead of parsing them (see page_out).
+    """
+
+    queryable = False
+
+    def __init__(self, data_file, replay, compact_every=1000, fsync=True, on_events=None,
+                 on_merge=None, history=()):
+        self.data_file = Path(data_file)
+        self.journal_file = self.data_file.with_suffix(".journal")
+        self.pending_file = self.data_file.with_suffix(".journal.compacting")
+        self.replay = replay
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.on_events = on_events
+        self.on_merge = on_merge
+        self.history = history
+        self.lock = FileLock(self.data_file.with_suffix(".lock"))
+        self._default = "{}"
+        self._seq = 0
+        self._since_compaction = 0
+        self._journal = None
+        self._journal_end = 0
+        self._snapshot = None
+        self._compactor = None
+        self._lock = threading.Lock()
+
+    def load(self, default):
+        """Load the latest snapshot and replay the journal tail"""
+        self._default = json.dumps(default)
+        with self.lock:
+            data = self._load()
+            # A crash during compaction leaves the rotated journal behind
+            if self.pending_file.exists() and not self._compaction_running():
+                self._compact()
+        return data
+
+    def _load(self):
+        self._snapshot = self._snapshot_identity()
+        data, last_seq = self._read_snapshot()
+
+        events = [event for event in self._read_journal(self.pending_file)
+                  if event["seq"] > last_seq]
+        tail = [event for event in self._read_journal(self.journal_file, repair=True)
+                if event["seq"] > last_seq]
+        events.extend(tail)
+        if events:
+            data = self.replay(data, events)
+            last_seq = events[-1]["seq"]
+
+        self._seq = last_seq
+        self._since_compaction = len(tail)
+        self._open_journal()
+        return data
+
+    def _open_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_file, 'a')
+        self._journal_end = self._journal.tell()
+
+    @contextlib.contextmanager
+    def transaction(self, data):
+        """Hold the file lock with `data` caught up on other processes' writes
+
+        Check an operation and apply it inside the transaction, so it is
+        validated against the same state its events are appended to.
+        """
+        with self.lock:
+            yield self._catch_up(data)
+
+    def _catch_up(self, data):
+        """Apply other processes' new events; returns the data to keep using"""
+        journal = os.fstat(self._journal.fileno())
+        try:
+            current = os.stat(self.journal_file)
+        except FileNotFoundError:
+            current = None
+        if current is not None and current.st_ino == journal.st_ino:
+            if current.st_size == self._journal_end:
+                return data
+            if current.st_size > self._journal_end:
+                events = self._read_journal(self.journal_file, repair=True,
+                                            offset=self._journal_end)
+                self._journal_end = os.stat(self.journal_file).st_size
+                return self._apply_foreign(data, [event for event in events
+                                                  if event["seq"] > self._seq])
+            # Truncated: another process saved a full snapshot
+            return self._reload()
+
+        # Replaced: another process rotated the journal for compaction or saved
+        if current is None or self._snapshot_identity() != self._snapshot:
+            return self._reload()
+        self._open_journal()
+        events = [event for event in self._read_journal(self.pending_file)
+                  + self._read_journal(self.journal_file) if event["seq"] > self._seq]
+        if events and events[0]["seq"] != self._seq + 1:
+            return self._reload()
+        self._journal_end = self._journal.tell()
+        return self._apply_foreign(data, events)
+
+    def _apply_foreign(self, data, events):
+        if events:
+            (self.on_events or self.replay)(data, events)
+            self._seq = events[-1]["seq"]
+            self._since_compaction += len(events)
+        return data
+
+    def _reload(self):
+        """Start over from the snapshot when other processes' events can't be replayed"""
+        data = self._load()
+        if self.on_merge is not None:
+            self.on_merge(data)
+        return data
+
+    def record(self, data, event):
+        """Append one event to the journal"""
+        self.record_many(data, [event])
+
+    def record_many(self, data, events):
+        """Append a batch of events with a single flush"""
+        if not events:
+            return
+        with self._lock, self.lock:
+            self._catch_up(data)
+            lines = []
+            for event in events:
+                self._seq += 1
+                lines.append(json.dumps(dict(event, seq=self._seq), separators=(",", ":")))
+            self._journal.write("\n".join(lines) + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._journal_end = self._journal.tell()
+            self._since_compaction += len(events)
+            if self._since_compaction >= self.compact_every:
+                self._start_compaction()
+
+    def save(self, data):
+        """Write a full snapshot and start a new, empty journal"""
+        with self._lock:
+            self.wait_for_compaction()
+            with self.lock:
+                data = self._catch_up(data)
+                self._write_snapshot(data, self._seq)
+                # A new file rather than a truncation, so other processes see the inode change
+                try:
+                    self.journal_file.unlink()
+                except FileNotFoundError:
+                    pass
+                self._open_journal()
+                self._since_compaction = 0
+
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished"""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def _compaction_running(self):
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def close(self):
+        """Finish pending compaction and close the journal"""
+        self.wait_for_compaction()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self.lock.close()
+
+    def _start_compaction(self):
+        if self._compaction_running():
+            return
+        if self.pending_file.exists():
+            return
+
+        self._journal.close()
+        os.replace(self.journal_file, self.pending_file)
+        self._open_journal()
+        self._since_compaction = 0
+
+        self._compactor = threading.Thread(target=self._compact, daemon=True)
+        self._compactor.start()
+
+    def _compact(self):
+        """Fold the rotated journal into a new snapshot
+
+        The snapshot is built outside the file lock. If another process
+        wrote a snapshot meanwhile it already holds these events, having
+        caught up before writing, and ours is dropped.
+        """
+        started = self._snapshot_identity()
+        data, last_seq = self._read_snapshot()
+        events = [event for event in self._read_journal(self.pending_file)
+                  if event["seq"] > last_seq]
+        if events:
+            data = self.replay(data, events)
+            last_seq = events[-1]["seq"]
+        with self.lock:
+            if self._snapshot_identity() == started:
+                self._write_snapshot(data, last_seq)
+            try:
+                self.pending_file.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _snapshot_identity(self):
+        try:
+            stat = os.stat(self.data_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read_snapshot(self):
+        if self.data_file.exists():
+            with open(self.data_file, 'r') as f:
+                data = json.load(f)
+        else:
+            data = json.loads(self._default)
+        seq = data.pop("journal_seq", 0)
+        return page_in(self.data_file, data, self.history), seq
+
+    def _write_snapshot(self, data, seq):
+        snapshot = page_out(self.data_file, data, self.history, seq)
+        atomic_write_json(self.data_file, dict(snapshot, journal_seq=seq), separators=(",", ":"))
+        self._snapshot = self._snapshot_identity()
+        drop_pages(self.data_file, snapshot, self.history)
+
+    def _read_journal(self, path, repair=False, offset=0):
+        """Read journal events from `offset`, dropping a torn final line"""
+        events = []
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return events
+
+        good_offset = offset
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    break
+                good_offset += len(line)
+
+        if repair and good_offset != path.stat().st_size:
+            with open(path, 'r+b') as f:
+                f.truncate(good_offset)
+        return events
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    member_id TEXT PRIMARY KEY,
+    name TEXT,
+    membership_type TEXT,
+    phone TEXT,
+    email TEXT,
+    join_date TEXT,
+    total_visits INTEGER DEFAULT 0,
+    last_visit TEXT,
+    fee_plan TEXT
+);
+CREATE TABLE IF NOT EXISTS check_ins (
+    member_id TEXT PRIMARY KEY,
+    name TEXT,
+    check_in_time TEXT,
+    membership_type TEXT
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY,
+    member_id TEXT NOT NULL,
+    name TEXT,
+    check_in TEXT NOT NULL,
+    check_out TEXT,
+    duration REAL DEFAULT 0,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attendance_member_date ON attendance (member_id, date);
+CREATE INDEX IF NOT EXISTS attendance_date ON attendance (date);
+CREATE INDEX IF NOT EXISTS attendance_open ON attendance (member_id) WHERE check_out IS NULL;
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    member_id TEXT NOT NULL,
+    member_name TEXT,
+    amount REAL NOT NULL,
+    payment_date TEXT NOT NULL,
+    payment_method TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS payments_member_date ON payments (member_id, payment_date);
+CREATE INDEX IF NOT EXISTS payments_date ON payments (payment_date);
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY,
+    member_id TEXT NOT NULL,
+    reminder_date TEXT,
+    days_before_due INTEGER,
+    method TEXT
+);
+CREATE INDEX IF NOT EXISTS reminders_member ON reminders (member_id);
+CREATE INDEX IF NOT EXISTS reminders_date ON reminders (reminder_date);
+CREATE TABLE IF NOT EXISTS fees (
+    fee_type TEXT PRIMARY KEY,
+    details TEXT
+);
+CREATE TABLE IF NOT EXISTS settled_transactions (
+    transaction_id TEXT PRIMARY KEY,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS late_fees (
+    member_id TEXT PRIMARY KEY,
+    due_date TEXT,
+    days_late INTEGER,
+    late_fee NUMERIC
+);
+CREATE TABLE IF NOT EXISTS ledger_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    source TEXT PRIMARY KEY,
+    byte_offset INTEGER NOT NULL,
+    advances TEXT
+);
+"""
+
+MEMBER_COLUMNS = ["name", "membership_type", "phone", "email", "join_date",
+                  "total_visits", "last_visit"]
+ATTENDANCE_COLUMNS = ["member_id", "name", "check_in", "check_out", "duration", "date"]
+PAYMENT_COLUMNS = ["member_id", "member_name", "amount", "payment_date",
+                   "payment_method", "status"]
+REMINDER_COLUMNS = ["member_id", "reminder_date", "days_before_due", "method"]
+
+
+# Stores on the same database share one connection, so a write made through
+# one manager never waits on another manager's open transaction
+_connections = {}
+
+
+class _SharedConnection:
+    """A process's connection to one database, and the transaction open on it"""
+
+    def __init__(self, db_file):
+        self.conn = sqlite3.connect(str(db_file), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.users = 0
+        # Held by the thread with a transaction open, so other threads'
+        # writes neither join it nor commit it early
+        self.lock = threading.RLock()
+        self.depth = 0
+
+
+def _connect(db_file):
+    if db_file not in _connections:
+        _connections[db_file] = _SharedConnection(db_file)
+    _connections[db_file].users += 1
+    return _connections[db_file]
+
+
+def _disconnect(db_file):
+    shared = _connections[db_file]
+    shared.users -= 1
+    if shared.users == 0:
+        shared.conn.close()
+        del _connections[db_file]
+
+
+def _prefix_range(prefix):
+    """Bounds matching every ISO string that starts with prefix"""
+    return prefix, prefix + "\uffff"
+
+
+class SqliteStore:
+    """SQLite database shared by the attendance and fee managers
+
+    Members, current check-ins and the fee structure are loaded into memory;
+    attendance, payments and reminders stay in indexed tables and are read
+    through the log objects returned by `attendance_log`, `payment_log` and
+    `reminder_log`. Each recorded change is committed as one transaction.
+    Stores opened on the same file within a process share a connection.
+    """
+
+    queryable = True
+    CACHED = ("members", "check_ins", "fees")
+
+    def __init__(self, db_file="gym_data.db", on_merge=None):
+        self.db_file = Path(db_file).resolve()
+        self._shared = _connect(self.db_file)
+        self.conn = self._shared.conn
+        self.on_merge = on_merge
+        self._data_version = None
+
+    def load(self, default):
+        """Load members, check-ins and fees; history stays in the database"""
+        data = default
+        self._data_version = self._version()
+        if "members" in data:
+            data["members"] = {
+                row["member_id"]: self._member_from_row(row)
+                for row in self.conn.execute("SELECT * FROM members")
+            }
+        if "check_ins" in data:
+            data["check_ins"] = {
+                row["member_id"]: {
+                    "name": row["name"],
+                    "check_in_time": row["check_in_time"],
+                    "membership_type": row["membership_type"]
+                }
+                for row in self.conn.execute("SELECT * FROM check_ins")
+            }
+        if "fees" in data:
+            data["fees"] = {
+                row["fee_type"]: json.loads(row["details"])
+                for row in self.conn.execute("SELECT * FROM fees")
+            }
+        return data
+
+    def _version(self):
+        """Counter SQLite bumps whenever another connection commits"""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def record(self, data, event):
+        """Sync the in-memory rows touched by an event and commit"""
+        self.record_many(data, [event])
+
+    def record_many(self, data, events):
+        """Sync the rows touched by a batch of events in one transaction
+
+        "visit" events add to the stored visit count rather than writing
+        the cached total back.
+        """
+        with self._shared.lock:
+            member_ids = set()
+            for event in events:
+                if event.get("op") == "visit":
+                    self.conn.execute(
+                        "UPDATE members SET total_visits = total_visits + ?, last_visit = ? "
+                        "WHERE member_id = ?",
+                        (event["visits"], event["fields"]["last_visit"], event["member_id"]))
+                elif "member_id" in event:
+                    member_ids.add(event["member_id"])
+            for member_id in member_ids:
+                self._sync_member(data, member_id)
+            if any("fees" in event for event in events):
+                self._write_fees(data["fees"])
+            self._commit()
+
+    def save(self, data):
+        """Write every in-memory member, check-in and fee row"""
+        with self._shared.lock:
+            for member_id in data.get("members", {}):
+                self._sync_member(data, member_id)
+            if "fees" in data:
+                self._write_fees(data["fees"])
+            self._commit()
+
+    def _commit(self):
+        """Commit, unless a `transaction()` block will"""
+        if self._shared.depth == 0:
+            self.conn.commit()
+
+    @contextlib.contextmanager
+    def transaction(self, data):
+        """Hold the database's write lock with data caught up, committing on exit
+
+        The outermost block on the connection starts a `BEGIN IMMEDIATE`
+        transaction, so other processes wait to write until it commits, and
+        rolls everything back if the block raises. Each store then reloads
+        its cached rows if another connection committed since it last read
+        them, handing the fresh data to `on_merge`.
+        """
+        shared = self._shared
+        with shared.lock:
+            if shared.depth == 0:
+                if self.conn.in_transaction:
+                    self.conn.commit()
+                self.conn.execute("BEGIN IMMEDIATE")
+            shared.depth += 1
+            try:
+                yield self._refresh(data)
+            except BaseException:
+                # The caches may hold changes that were just rolled back
+                self._data_version = None
+                if shared.depth == 1:
+                    self.conn.rollback()
+                raise
+            else:
+                if shared.depth == 1:
+                    self.conn.commit()
+            finally:
+                shared.depth -= 1
+
+    def _refresh(self, data):
+        """Reload the cached rows if another connection changed the database"""
+        version = self._version()
+        if version == self._data_version:
+            return data
+        fresh = self.load({key: None for key in self.CACHED if key in data})
+        if self.on_merge is None:
+            data.update(fresh)
+            return data
+        data = dict(data, **fresh)
+        self.on_merge(data)
+        return data
+
+    def close(self):
+        if self.conn is not None:
+            _disconnect(self.db_file)
+            self.conn = None
+
+    def attendance_log(self):
+        return SqliteAttendanceLog(self.conn)
+
+    def payment_log(self):
+        return SqlitePaymentLog(self.conn)
+
+    def reminder_log(self):
+        return SqliteReminderLog(self.conn)
+
+    def settlement_log(self):
+        return SqliteSettlementLog(self.conn)
+
+    def late_fee_log(self):
+        return SqliteLateFeeLog(self.conn)
+
+    def import_data(self, members, attendance_data=None, fee_data=None):
+        """Bulk load data from the JSON-backed managers"""
+        with self.conn:
+            for member_id, member in members.items():
+                self._upsert_member(member_id, member)
+            if attendance_data:
+                for member_id, info in attendance_data.get("check_ins", {}).items():
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO check_ins VALUES (?, ?, ?, ?)",
+                        (member_id, info["name"], info["check_in_time"],
+                         info["membership_type"]))
+                self._insert_many("attendance", ATTENDANCE_COLUMNS,
+                                  attendance_data.get("attendance", []))
+            if fee_data:
+                self._write_fees(fee_data.get("fees", {}))
+                self._insert_many("payments", PAYMENT_COLUMNS,
+                                  fee_data.get("payments", []))
+                self._insert_many("reminders", REMINDER_COLUMNS,
+                                  fee_data.get("reminders", []))
+                self._import_settlements(fee_data)
+                late_fees = fee_data.get("late_fees") or {}
+                if late_fees.get("accrued_on"):
+                    self.late_fee_log().replace(late_fees["accrued_on"], late_fees["accruals"])
+
+    def _import_settlements(self, fee_data):
+        """Imported settlement ids and checkpoints, so imports carry on without duplicates"""
+        settlements = fee_data.get("settlements", {})
+        # Older fee files kept the ids in a list inside "settlements"
+        transaction_ids = [record["transaction_id"] for record in fee_data.get("settlement_ids", ())]
+        transaction_ids += settlements.get("transactions", [])
+        # The JSON store doesn't keep which file an id came from
+        self.conn.executemany("INSERT OR IGNORE INTO settled_transactions VALUES (?, NULL)",
+                              ((transaction_id,) for transaction_id in transaction_ids))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO import_checkpoints VALUES (?, ?, ?)",
+            ((source, checkpoint["offset"], json.dumps(checkpoint["advances"]))
+             for source, checkpoint in settlements.get("checkpoints", {}).items()))
+
+    def is_empty(self):
+        """True when no history has been stored yet"""
+        for table in ("members", "attendance", "payments"):
+            if self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                return False
+        return True
+
+    def _insert_many(self, table, columns, records):
+        placeholders = ", ".join("?" for _ in columns)
+        self.conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            ([record.get(column) for column in columns] for record in records))
+
+    def _member_from_row(self, row):
+        member = {column: row[column] for column in MEMBER_COLUMNS}
+        if row["fee_plan"] is not None:
+            member["fee_plan"] = json.loads(row["fee_plan"])
+        return member
+
+    def _upsert_member(self, member_id, member):
+        """Insert or update only the columns this member record carries"""
+        values = {column: member[column] for column in MEMBER_COLUMNS if column in member}
+        if "fee_plan" in member:
+            values["fee_plan"] = json.dumps(member["fee_plan"])
+        columns = ["member_id"] + list(values)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in values)
+        sql = (f"INSERT INTO members ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        if updates:
+            sql += f" ON CONFLICT(member_id) DO UPDATE SET {updates}"
+        else:
+            sql += " ON CONFLICT(member_id) DO NOTHING"
+        self.conn.execute(sql, [member_id] + list(values.values()))
+
+    def _sync_member(self, data, member_id):
+        if member_id in data.get("members", {}):
+            self._upsert_member(member_id, data["members"][member_id])
+        if "check_ins" in data:
+            info = data["check_ins"].get(member_id)
+            if info is None:
+                self.conn.execute("DELETE FROM check_ins WHERE member_id = ?", (member_id,))
+            else:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO check_ins VALUES (?, ?, ?, ?)",
+                    (member_id, info["name"], info["check_in_time"], info["membership_type"]))
+
+    def _write_fees(self, fees):
+        self.conn.execute("DELETE FROM fees")
+        self.conn.executemany(
+            "INSERT INTO fees VALUES (?, ?)",
+            ((fee_type, json.dumps(details)) for fee_type, details in fees.items()))
+
+
+class SqliteTable:
+    """Append-only history table read back as plain dict records"""
+
+    def __init__(self, conn, table, columns, date_column=None):
+        self.conn = conn
+        self.table = table
+        self.columns = columns
+        self.date_column = date_column
+        self._select = f"SELECT {', '.join(columns)} FROM {table}"
+
+    def __iter__(self):
+        for row in self.conn.execute(self._select + " ORDER BY id"):
+            yield dict(row)
+
+    def __len__(self):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def append(self, record):
+        """Insert a record; it is committed with the next recorded change"""
+        placeholders = ", ".join("?" for _ in self.columns)
+        self.conn.execute(
+            f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES ({placeholders})",
+            [record.get(column) for column in self.columns])
+        return record
+
+    def iter_between(self, start_date=None, end_date=None, member_ids=None):
+        """Stream rows from a cursor, filtered by whole days and members"""
+        clauses = []
+        params = []
+        if start_date is not None:
+            clauses.append(f"{self.date_column} >= ?")
+            params.append(start_date[:10])
+        if end_date is not None:
+            clauses.append(f"{self.date_column} <= ?")
+            params.append(end_date[:10] + "\uffff")
+        if member_ids:
+            clauses.append(f"member_id IN ({', '.join('?' for _ in member_ids)})")
+            params.extend(member_ids)
+        where = " AND ".join(clauses) or "1"
+        for row in self.conn.execute(
+                f"{self._select} WHERE {where} ORDER BY {self.date_column}, id", params):
+            yield dict(row)
+
+    def _query(self, where, params):
+        return [dict(row) for row in self.conn.execute(f"{self._select} WHERE {where}", params)]
+
+
+class SqliteReminderLog(SqliteTable):
+    """Reminder log table; like the rotated JSON log it only keeps recent history
+
+    Once a day, appending drops reminders logged more than `retention_days`
+    days ago.
+    """
+
+    def __init__(self, conn, retention_days=365):
+        super().__init__(conn, "reminders", REMINDER_COLUMNS, "reminder_date")
+        self.retention_days = retention_days
+        self._pruned_on = None
+
+    def append(self, record):
+        super().append(record)
+        today = datetime.date.today()
+        if self._pruned_on != today:
+            self.prune(datetime.datetime.now() - datetime.timedelta(days=self.retention_days))
+            self._pruned_on = today
+        return record
+
+    def prune(self, before):
+        """Delete reminders logged before a moment; committed with the next recorded change"""
+        return self.conn.execute("DELETE FROM reminders WHERE reminder_date < ?",
+                                 (before.isoformat(),)).rowcount
+
+
+class SqliteAttendanceLog(SqliteTable):
+    """Attendance history answered by indexed SQL queries"""
+
+    def __init__(self, conn):
+        super().__init__(conn, "attendance", ATTENDANCE_COLUMNS, "date")
+
+    def close_session(self, member_id, timestamp):
+        row = self.conn.execute(
+            "SELECT id, " + ", ".join(self.columns) + " FROM attendance "
+            "WHERE member_id = ? AND check_out IS NULL ORDER BY id DESC LIMIT 1",
+            (member_id,)).fetchone()
+        if row is None:
+            return None
+
+        record = {column: row[column] for column in self.columns}
+        record["check_out"] = timestamp
+        record["duration"] = session_hours(record["check_in"], timestamp)
+        self.conn.execute("UPDATE attendance SET check_out = ?, duration = ? WHERE id = ?",
+                          (timestamp, record["duration"], row["id"]))
+        return record
+
+    def for_date(self, date):
+        return self._query("date = ? ORDER BY id", (date,))
+
+    def hourly_counts(self, date):
+        rows = self.conn.execute(
+            "SELECT CAST(substr(check_in, 12, 2) AS INTEGER) AS hour, COUNT(*) "
+            "FROM attendance WHERE date = ? GROUP BY hour", (date,))
+        return {hour: count for hour, count in rows}
+
+    def for_month(self, month):
+        return self._query("date BETWEEN ? AND ? ORDER BY date, id", _prefix_range(month))
+
+    def month_stats(self, month):
+        rows = self.conn.execute(
+            "SELECT member_id, MIN(name), COUNT(*), SUM(duration) FROM attendance "
+            "WHERE date BETWEEN ? AND ? GROUP BY member_id", _prefix_range(month))
+        return {
+            member_id: {"name": name, "visits": visits, "total_duration": total}
+            for member_id, name, visits, total in rows
+        }
+
+    def since(self, date):
+        return self._query("date >= ? ORDER BY id", (date,))
+
+    def member_visits(self, member_id, month):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM attendance WHERE member_id = ? AND date BETWEEN ? AND ?",
+            (member_id,) + _prefix_range(month)).fetchone()[0]
+
+
+class SqlitePaymentLog(SqliteTable):
+    """Payment history answered by indexed SQL queries"""
+
+    def __init__(self, conn):
+        super().__init__(conn, "payments", PAYMENT_COLUMNS, "payment_date")
+        self._revenue = None
+
+    def append(self, record):
+        super().append(record)
+        if self._revenue is not None:
+            self._revenue.add(record["payment_date"], record["amount"], record["payment_method"])
+        return record
+
+    def between(self, start_date, end_date):
+        return self._query("payment_date BETWEEN ? AND ? ORDER BY id", (start_date, end_date))
+
+    def for_member(self, member_id, limit=None, offset=0):
+        return self._query("member_id = ? ORDER BY payment_date DESC, id LIMIT ? OFFSET ?",
+                           (member_id, -1 if limit is None else limit, offset))
+
+    def member_totals(self, member_id):
+        """(number of payments, total paid) from the member_id index"""
+        count, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM payments WHERE member_id = ?",
+            (member_id,)).fetchone()
+        return count, total
+
+    def revenue(self):
+        """Revenue rollup seeded from one GROUP BY over the history"""
+        if self._revenue is None:
+            self._revenue = RevenueRollup()
+            rows = self.conn.execute(
+                "SELECT substr(payment_date, 1, 10) AS day, payment_method, amount < 0, "
+                "COUNT(*), SUM(amount) FROM payments GROUP BY day, payment_method, amount < 0 "
+                "ORDER BY MIN(id)")
+            for day, method, _, count, total in rows:
+                self._revenue.add(day, total, method, count)
+        return self._revenue
+
+
+class SqliteSettlementLog:
+    """Imported transaction ids and import checkpoints, written in the payments' transaction"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def known(self, transaction_ids):
+        """The subset of transaction ids already imported"""
+        transaction_ids = list(transaction_ids)
+        known = set()
+        for start in range(0, len(transaction_ids), 500):
+            batch = transaction_ids[start:start + 500]
+            rows = self.conn.execute(
+                "SELECT transaction_id FROM settled_transactions "
+                f"WHERE transaction_id IN ({', '.join('?' for _ in batch)})", batch)
+            known.update(row[0] for row in rows)
+        return known
+
+    def checkpoint(self, source):
+        """(offset, due-date advances) of the last chunk committed from a source"""
+        row = self.conn.execute(
+            "SELECT byte_offset, advances FROM import_checkpoints WHERE source = ?",
+            (source,)).fetchone()
+        if row is None:
+            return 0, {}
+        return row["byte_offset"], json.loads(row["advances"] or "{}")
+
+    def record_chunk(self, source, transaction_ids, offset, advances):
+        """Stage a chunk's ids and checkpoint; committed with the next recorded change"""
+        self.conn.executemany("INSERT INTO settled_transactions VALUES (?, ?)",
+                              ((transaction_id, source) for transaction_id in transaction_ids))
+        self.conn.execute("INSERT OR REPLACE INTO import_checkpoints VALUES (?, ?, ?)",
+                          (source, offset, json.dumps(advances)))
+
+
+class SqliteLateFeeLog:
+    """Accrued late fees in the late_fees table; written with the next recorded change"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @property
+    def accrued_on(self):
+        row = self.conn.execute(
+            "SELECT value FROM ledger_state WHERE name = 'late_fees_accrued_on'").fetchone()
+        return row[0] if row else None
+
+    def get(self, member_id):
+        row = self.conn.execute(
+            "SELECT due_date, days_late, late_fee FROM late_fees WHERE member_id = ?",
+            (member_id,)).fetchone()
+        return dict(row) if row else None
+
+    def replace(self, accrued_on, accruals):
+        """Swap in a full day's accruals"""
+        self.conn.execute("DELETE FROM late_fees")
+        self.conn.executemany(
+            "INSERT INTO late_fees VALUES (?, ?, ?, ?)",
+            ((member_id, accrual["due_date"], accrual["days_late"], accrual["late_fee"])
+             for member_id, accrual in accruals.items()))
+        self.conn.execute("INSERT OR REPLACE INTO ledger_state VALUES ('late_fees_accrued_on', ?)",
+                          (accrued_on,))
+
+    def set(self, member_id, accrual):
+        """Store or (with None) clear one member's accrual"""
+        if accrual is None:
+            self.conn.execute("DELETE FROM late_fees WHERE member_id = ?", (member_id,))
+        else:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO late_fees VALUES (?, ?, ?, ?)",
+                (member_id, accrual["due_date"], accrual["days_late"], accrual["late_fee"]))
+
+
+def open_store(kind, data_file, replay=None, on_events=None, on_merge=None, history=(),
+               **options):
+    """Create a storage backend by name
+
+    `on_merge(data)` is called when a file-backed store had to replace the
+    owner's data with a merge of another process's writes; `on_events(data,
+    events)` applies other processes' journaled events in place. File-backed
+    stores page the `history` keys in from disk on demand.
+    """
+    if kind == "json":
+        return JsonFileStore(data_file, on_merge, history)
+    if kind == "journal":
+        return JournalStore(data_file, replay, on_events=on_events, on_merge=on_merge,
+                            history=history, **options)
+    if kind == "sqlite":
+        return SqliteStore(on_merge=on_merge, **options)
+    raise ValueError(f"Unknown storage backend: {kind}")
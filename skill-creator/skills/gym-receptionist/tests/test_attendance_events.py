@@ -0,0 +1,149 @@
+import datetime
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from attendance_manager import GymAttendanceManager  # noqa: E402
+from records import parse_time, to_micros  # noqa: E402
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = GymAttendanceManager("Test Gym")
+    for member_id in ("M1", "M2", "M3"):
+        manager.register_member(member_id, f"Member {member_id}", "basic", "555", "m@example.com")
+    yield manager
+    manager.registry.close()
+    manager.close()
+
+
+def local(timestamp):
+    return datetime.datetime.fromisoformat(timestamp).astimezone().replace(tzinfo=None).isoformat()
+
+
+def test_invalid_events_are_reported_without_aborting_the_batch(manager):
+    result = manager.apply_events([
+        {"op": "check_in", "member_id": "M1", "time": "2024-03-01T08:00:00"},
+        {"op": "dance", "member_id": "M1", "time": "2024-03-01T08:05:00"},
+        {"op": "check_in", "member_id": "M2", "time": "not a time"},
+        {"op": "check_in", "member_id": "M2"},
+        {"op": "check_in", "member_id": "NOPE", "time": "2024-03-01T08:10:00"},
+        {"op": "check_out", "member_id": "M3", "time": "2024-03-01T08:20:00"},
+        {"op": "check_out", "member_id": "M1", "time": "2024-03-01T07:00:00"},
+        {"op": "check_out", "member_id": "M1", "time": "2024-03-01T09:30:00"},
+    ])
+
+    assert result["applied"] == 2
+    assert [error["index"] for error in result["errors"]] == [1, 2, 3, 4, 5, 6]
+    assert manager.data["check_ins"] == {}
+    assert manager.members["M1"]["total_visits"] == 1
+    assert [record["duration"] for record in manager.log] == [1.5]
+
+
+def test_timezone_aware_times_mixed_with_local_ones(manager):
+    result = manager.apply_events([
+        {"op": "check_in", "member_id": "M1", "time": "2024-03-01T08:00:00Z"},
+        {"op": "check_in", "member_id": "M2", "time": "2024-03-01T08:30:00"},
+        {"op": "check_in", "member_id": "M3", "time": "2024-03-01T09:00:00+02:00"},
+    ])
+
+    assert result == {"applied": 3, "errors": []}
+    check_ins = manager.data["check_ins"]
+    assert check_ins["M1"]["check_in_time"] == local("2024-03-01T08:00:00+00:00")
+    assert check_ins["M2"]["check_in_time"] == "2024-03-01T08:30:00"
+    assert check_ins["M3"]["check_in_time"] == local("2024-03-01T09:00:00+02:00")
+
+
+def test_events_can_come_from_a_generator(manager, capsys):
+    result = manager.apply_events(
+        {"op": "check_in", "member_id": member_id, "time": "2024-03-01T08:00:00"}
+        for member_id in ("M1", "M2"))
+
+    assert result == {"applied": 2, "errors": []}
+    assert "Processed 2 events: 2 applied, 0 rejected" in capsys.readouterr().out
+
+
+def test_all_timezone_aware_batch_checks_in_and_out(manager):
+    result = manager.check_in_many([("M1", "2024-03-01T08:00:00+00:00"),
+                                    ("M2", "2024-03-01T08:15:00+00:00")])
+    assert result["applied"] == 2
+
+    result = manager.check_out_many([("M1", "2024-03-01T09:00:00+00:00")])
+    assert result == {"applied": 1, "errors": []}
+    assert list(manager.data["check_ins"]) == ["M2"]
+    assert [record["duration"] for record in manager.log if record["check_out"]] == [1.0]
+
+
+@pytest.mark.parametrize("storage", ["journal", "json"])
+def test_late_upload_is_found_after_reload(storage, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    now = datetime.datetime.now().replace(microsecond=0)
+    recent = now - datetime.timedelta(hours=1)
+    late = now - datetime.timedelta(days=40)
+
+    manager = GymAttendanceManager("Test Gym", storage=storage)
+    manager.register_member("M1", "Member M1", "basic", "555", "m@example.com")
+    manager.check_in_many([("M1", recent.isoformat())])
+    manager.check_out_many([("M1", (recent + datetime.timedelta(minutes=30)).isoformat())])
+    # A kiosk that was offline uploads an older visit afterwards
+    manager.apply_events([
+        {"op": "check_in", "member_id": "M1", "time": late.isoformat()},
+        {"op": "check_out", "member_id": "M1",
+         "time": (late + datetime.timedelta(hours=1)).isoformat()},
+    ])
+    heatmap = manager.occupancy_snapshot()["heatmap"]
+    manager.close()
+    manager.registry.close()
+
+    manager = GymAttendanceManager("Test Gym", storage=storage)
+    try:
+        for when in (recent, late):
+            month = when.strftime("%Y-%m")
+            expected = sum(1 for record in list(manager.log) if record["date"].startswith(month))
+            assert manager.log.member_visits("M1", month) == expected
+        assert [record["check_in"] for record in manager.log.since(late.strftime("%Y-%m-%d"))] == [
+            late.isoformat(), recent.isoformat()]
+        assert manager.occupancy_snapshot()["heatmap"] == heatmap
+        assert sum(map(sum, heatmap)) == 1
+    finally:
+        manager.close()
+        manager.registry.close()
+
+
+def test_reads_do_not_wait_for_a_batch_being_written(manager, capsys, monkeypatch):
+    writing = threading.Event()
+    written = threading.Event()
+    record_many = manager.store.record_many
+
+    def slow_record_many(data, events):
+        writing.set()
+        written.wait(5)
+        record_many(data, events)
+
+    monkeypatch.setattr(manager.store, "record_many", slow_record_many)
+    capsys.readouterr()
+    batch = [{"op": "check_in", "member_id": "M1", "time": "2024-03-01T08:00:00"}]
+    writer = threading.Thread(target=manager.apply_events, args=(batch,), kwargs={"quiet": True})
+    writer.start()
+    try:
+        assert writing.wait(5)
+        reader = threading.Thread(target=manager.get_member_status, args=("M1",))
+        reader.start()
+        reader.join(1)
+        assert not reader.is_alive()
+    finally:
+        written.set()
+        writer.join()
+    assert capsys.readouterr().out == ""
+
+
+def test_to_micros_accepts_utc_offsets():
+    naive = parse_time("2024-03-01T08:00:00+00:00")
+    assert naive.tzinfo is None
+    assert to_micros("2024-03-01T08:00:00Z") == to_micros(naive.isoformat())
+    assert to_micros("2024-03-01T10:00:00+02:00") == to_micros("2024-03-01T08:00:00Z")
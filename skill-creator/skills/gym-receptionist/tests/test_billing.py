@@ -0,0 +1,95 @@
+import datetime
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import billing  # noqa: E402
+from billing import add_months, advance, advance_many, first_due  # noqa: E402
+from fee_manager import GymFeeManager  # noqa: E402
+
+
+def day(text):
+    return datetime.datetime.fromisoformat(text)
+
+
+def test_month_end_clamps_without_losing_the_anchor_day():
+    due = day("2024-01-31T09:30:00")
+    dates = []
+    for _ in range(4):
+        due = advance(due, "monthly", anchor_day=31)
+        dates.append(due.isoformat())
+    assert dates == ["2024-02-29T09:30:00", "2024-03-31T09:30:00",
+                     "2024-04-30T09:30:00", "2024-05-31T09:30:00"]
+    # Without the anchor the clamped day is all there is to go on
+    assert advance(day("2024-02-29"), "monthly") == day("2024-03-29")
+
+
+def test_leap_years():
+    assert add_months(day("2024-02-29"), 12) == day("2025-02-28")
+    assert advance(day("2025-02-28"), "annual", anchor_day=29) == day("2026-02-28")
+    assert advance(day("2027-02-28"), "annual", anchor_day=29) == day("2028-02-29")
+    assert add_months(day("2023-01-31"), 1) == day("2023-02-28")
+    assert add_months(day("2024-01-31"), 1) == day("2024-02-29")
+
+
+def test_quarterly_and_annual_cycles_roll_over_year_ends():
+    assert advance(day("2024-11-30"), "quarterly") == day("2025-02-28")
+    assert advance(day("2025-02-28"), "quarterly", anchor_day=30) == day("2025-05-30")
+    assert advance(day("2024-08-31"), "quarterly", periods=2) == day("2025-02-28")
+    assert advance(day("2024-03-15"), "annually", periods=3) == day("2027-03-15")
+    assert advance(day("2024-12-31"), "every 2 months") == day("2025-02-28")
+    assert first_due(day("2024-11-20"), "quarterly") == day("2025-02-01")
+    assert first_due(day("2024-11-20"), "yearly") == day("2025-01-01")
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+@pytest.mark.parametrize("periods", [1, 2, 5])
+def test_advance_many_agrees_with_advance(numpy, periods, monkeypatch):
+    if not numpy:
+        monkeypatch.setattr(billing, "np", None)
+    elif billing.np is None:
+        pytest.skip("NumPy is not installed")
+    cycles = ["monthly", "quarterly", "annually", "weekly", "biweekly",
+              "every 10 days", "every 2 months", "every 3 years"]
+    start = day("2023-12-25T07:15:00")
+    due_dates, plan_cycles, anchors = [], [], []
+    for offset in range(120):
+        due_dates.append((start + datetime.timedelta(days=offset * 3)).isoformat())
+        plan_cycles.append(cycles[offset % len(cycles)])
+        anchors.append(None if offset % 3 else 28 + offset % 4)
+
+    batch = advance_many(due_dates, plan_cycles, periods, anchors)
+    one_by_one = [advance(day(due), cycle, periods, anchor).isoformat()
+                  for due, cycle, anchor in zip(due_dates, plan_cycles, anchors)]
+    assert batch == one_by_one
+
+
+def test_unknown_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        advance(day("2024-01-01"), "fortnightly-ish")
+    with pytest.raises(ValueError):
+        advance_many(["2024-01-01"], ["every 0 days"])
+
+
+def test_payments_keep_a_legacy_plan_on_its_day(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = GymFeeManager("Test Gym")
+    try:
+        manager.registry.register("M1", {"name": "Member 1", "membership_type": "basic",
+                                         "fee_plan": {"fee_type": "basic", "amount": 50,
+                                                      "billing_cycle": "monthly",
+                                                      "start_date": "2023-12-31",
+                                                      "next_due_date": "2024-01-31T00:00:00",
+                                                      "status": "active"}})
+        due_dates = []
+        for _ in range(3):
+            manager.record_payment("M1", 50, "2024-01-30T10:00:00")
+            due_dates.append(manager.members["M1"]["fee_plan"]["next_due_date"])
+    finally:
+        manager.close()
+        manager.registry.close()
+
+    assert due_dates == ["2024-02-29T00:00:00", "2024-03-31T00:00:00", "2024-04-30T00:00:00"]
@@ -0,0 +1,30 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from columnar import AttendanceColumns  # noqa: E402
+
+
+@pytest.mark.parametrize("time_unit", [None, "s"])
+def test_export_in_another_time_unit_is_refused(time_unit, tmp_path):
+    pytest.importorskip("numpy")
+    path = tmp_path / "attendance"
+    AttendanceColumns.from_records([{
+        "member_id": "M1", "name": "Member M1", "check_in": "2024-03-01T08:00:00",
+        "check_out": "2024-03-01T09:30:00", "duration": 1.5, "date": "2024-03-01"}]).save(path, "npy")
+    assert len(AttendanceColumns.load(path)) == 1
+
+    manifest = json.loads((path / "manifest.json").read_text())
+    if time_unit is None:
+        del manifest["time_unit"]
+    else:
+        manifest["time_unit"] = time_unit
+    (path / "manifest.json").write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError) as error:
+        AttendanceColumns.load(path)
+    assert str(error.value) == f"{path} uses time unit {time_unit!r}, expected 'us'; export it again"
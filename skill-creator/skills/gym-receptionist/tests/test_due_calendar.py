@@ -0,0 +1,109 @@
+import datetime
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from due_calendar import DueCalendar  # noqa: E402
+from member_registry import MemberRegistry  # noqa: E402
+
+NOW = datetime.datetime(2024, 3, 10, 9, 30)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = MemberRegistry("journal", tmp_path / "gym_members.json")
+    yield registry
+    registry.close()
+
+
+def plan(due, status="active"):
+    return {"fee_type": "basic", "amount": 50, "billing_cycle": "monthly",
+            "next_due_date": due.isoformat(), "status": status}
+
+
+def register(registry, member_id, due=None, status="active"):
+    member = {"name": f"Member {member_id}", "membership_type": "basic"}
+    if due is not None:
+        member["fee_plan"] = plan(due, status)
+    registry.register(member_id, member)
+
+
+def brute_force(registry, now, days):
+    """(due within, late by more than) worked out member by member"""
+    due_within, late = [], []
+    for member_id, member in registry.members.items():
+        fee_plan = member.get("fee_plan")
+        if not fee_plan or fee_plan["status"] != "active":
+            continue
+        due = datetime.datetime.fromisoformat(fee_plan["next_due_date"])
+        if 0 <= (due - now).days <= days:
+            due_within.append((due, member_id))
+        if (now - due).days > days:
+            late.append((due, member_id))
+    return [member_id for _, member_id in sorted(due_within)], [member_id for _, member_id in sorted(late)]
+
+
+def test_boundaries_match_day_arithmetic(registry):
+    offsets = [datetime.timedelta(days=days, microseconds=micros)
+               for days in range(-5, 6) for micros in (-1, 0, 1)]
+    for number, offset in enumerate(offsets):
+        register(registry, f"M{number:02d}", NOW + offset)
+    calendar = DueCalendar(registry)
+    try:
+        for days in range(4):
+            assert (calendar.due_within(NOW, days), calendar.late_by_more_than(NOW, days)) == \
+                brute_force(registry, NOW, days)
+        # Due exactly now counts as due today, not late
+        assert "M16" in calendar.due_within(NOW, 0)
+        assert "M16" not in calendar.late_by_more_than(NOW, 0)
+        # More than three days late takes four whole days
+        assert "M04" in calendar.late_by_more_than(NOW, 3)
+        assert "M05" not in calendar.late_by_more_than(NOW, 3)
+        # Due within three days ends a microsecond before the fourth day
+        assert "M27" in calendar.due_within(NOW, 3)
+        assert "M28" not in calendar.due_within(NOW, 3)
+    finally:
+        calendar.close()
+
+
+def test_index_follows_due_dates_that_move(registry):
+    register(registry, "M1", NOW + datetime.timedelta(days=1))
+    register(registry, "M2", NOW - datetime.timedelta(days=10))
+    register(registry, "M3", NOW + datetime.timedelta(days=2))
+    calendar = DueCalendar(registry)
+    try:
+        assert calendar.due_within(NOW, 7) == ["M1", "M3"]
+
+        # A payment advances M2, registering again moves M1 out of the week
+        registry.update("M2", fee_plan=plan(NOW + datetime.timedelta(days=3)))
+        register(registry, "M1", NOW + datetime.timedelta(days=30))
+        assert calendar.due_within(NOW, 7) == ["M3", "M2"]
+        assert calendar.late_by_more_than(NOW, 0) == []
+
+        # Registering without a plan, or with an inactive one, drops the member
+        register(registry, "M3")
+        register(registry, "M2", NOW - datetime.timedelta(days=3), status="cancelled")
+        assert calendar.due_within(NOW, 60) == ["M1"]
+        assert len(calendar) == 1
+        for days in (0, 7, 60):
+            assert (calendar.due_within(NOW, days), calendar.late_by_more_than(NOW, days)) == \
+                brute_force(registry, NOW, days)
+    finally:
+        calendar.close()
+
+
+def test_members_removed_by_another_process_leave_the_index(registry):
+    register(registry, "M1", NOW - datetime.timedelta(days=5))
+    register(registry, "M2", NOW + datetime.timedelta(days=1))
+    calendar = DueCalendar(registry)
+    try:
+        # Data merged from another process's save no longer has M1
+        registry._adopt({"members": {"M2": dict(registry.members["M2"])}})
+        assert calendar.late_by_more_than(NOW, 0) == []
+        assert calendar.due_within(NOW, 7) == ["M2"]
+        assert len(calendar) == 1
+    finally:
+        calendar.close()
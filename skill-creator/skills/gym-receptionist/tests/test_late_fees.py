@@ -0,0 +1,100 @@
+import datetime
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from fee_manager import GymFeeManager  # noqa: E402
+from late_fees import late_fee, late_fee_terms  # noqa: E402
+
+TERMS = {"daily_rate": 2, "grace_days": 3, "cap": 10}
+
+
+def day(number, hour=15):
+    """A moment in February 2024, when the test plans fall due on the 1st"""
+    return datetime.datetime(2024, 2, number, hour)
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return request.param
+
+
+def open_manager(storage):
+    manager = GymFeeManager("Test Gym", storage=storage)
+    if not manager.data["fees"]:
+        manager.setup_fee_structure({"basic": {"amount": 50, "late_fee": TERMS},
+                                     "premium": {"amount": 80}})
+    for member_id, fee_type in (("M1", "basic"), ("M2", "premium")):
+        if member_id not in manager.members:
+            manager.registry.register(member_id, {"name": f"Member {member_id}",
+                                                  "membership_type": fee_type})
+            manager.register_member_fee(member_id, fee_type, 50, "2024-01-15")
+    return manager
+
+
+def close(manager):
+    manager.close()
+    manager.registry.close()
+
+
+def test_grace_days_and_cap():
+    assert [late_fee(days, TERMS) for days in range(10)] == [0, 0, 0, 0, 2, 4, 6, 8, 10, 10]
+    assert late_fee(1000, TERMS) == 10
+    # Fee types without terms pay the default $1 a day from the first day, uncapped
+    terms = late_fee_terms({"premium": {"amount": 80}}, "premium")
+    assert [late_fee(days, terms) for days in (0, 1, 400)] == [0, 1, 400]
+
+
+def test_accrual_around_the_grace_boundary_and_cap(storage):
+    manager = open_manager(storage)
+    try:
+        fees = {}
+        for number in (1, 2, 4, 5, 9, 10, 20):
+            manager.accrue_late_fees(day(number))
+            fees[number] = (manager.late_fees.get("M1") or {}).get("late_fee")
+        accrual = manager.late_fees.get("M2")
+    finally:
+        close(manager)
+
+    # Due on Feb 1st: not late that day, inside the grace period for three days
+    assert fees == {1: None, 2: 0, 4: 0, 5: 2, 9: 10, 10: 10, 20: 10}
+    assert accrual == {"due_date": "2024-02-01T00:00:00", "days_late": 19, "late_fee": 19}
+
+
+def test_accruing_twice_a_day_computes_once(storage):
+    manager = open_manager(storage)
+    try:
+        assert manager.late_fees.accrue(day(6, hour=0))
+        first = manager.late_fees.get("M1")
+        assert not manager.late_fees.accrue(day(6, hour=23))
+        assert manager.late_fees.get("M1") == first == {
+            "due_date": "2024-02-01T00:00:00", "days_late": 5, "late_fee": 4}
+        assert manager.late_fees.accrue(day(7, hour=0))
+        assert manager.late_fees.get("M1")["late_fee"] == 6
+    finally:
+        close(manager)
+
+
+def test_payment_clears_the_accrual(storage):
+    manager = open_manager(storage)
+    try:
+        manager.accrue_late_fees(day(8))
+        assert [member_id for member_id, _ in manager.late_fees.overdue()] == ["M1", "M2"]
+        manager.record_payment("M1", 50, "2024-02-08T10:00:00")
+        assert manager.late_fees.get("M1") is None
+        assert [member_id for member_id, _ in manager.late_fees.overdue()] == ["M2"]
+    finally:
+        close(manager)
+
+    # Cleared for good, and the same day isn't accrued again
+    manager = open_manager(storage)
+    try:
+        assert not manager.late_fees.accrue(day(8, hour=20))
+        assert manager.late_fees.get("M1") is None
+        assert manager.late_fees.get("M2")["days_late"] == 7
+    finally:
+        close(manager)
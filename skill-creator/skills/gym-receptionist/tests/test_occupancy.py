@@ -0,0 +1,78 @@
+import datetime
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from attendance_manager import GymAttendanceManager  # noqa: E402
+from occupancy import OccupancyTracker  # noqa: E402
+
+
+def at(timestamp):
+    return datetime.datetime.fromisoformat(timestamp)
+
+
+def cells(heatmap):
+    """Non-zero heatmap cells as {(weekday, hour): count}"""
+    return {(day, hour): count for day, row in enumerate(heatmap)
+            for hour, count in enumerate(row) if count}
+
+
+def test_session_left_open_past_the_window():
+    tracker = OccupancyTracker(window_weeks=1)
+    tracker.check_in("M1", at("2024-03-04T10:15:00"), "basic")
+
+    snapshot = tracker.snapshot(at("2024-03-11T09:59:00"))
+    assert cells(snapshot["heatmap"]) == {(0, 10): 1}
+
+    # The check-in hour leaves the heatmap; the member is still in the gym
+    snapshot = tracker.snapshot(at("2024-03-11T10:00:00"))
+    assert cells(snapshot["heatmap"]) == {}
+    assert snapshot["count"] == 1
+    assert snapshot["by_membership_type"] == {"basic": 1}
+
+    tracker.check_out("M1")
+    tracker.check_in("M2", at("2024-03-11T10:30:00"), "premium")
+    snapshot = tracker.snapshot(at("2024-03-11T10:45:00"))
+    assert cells(snapshot["heatmap"]) == {(0, 10): 1}
+    assert snapshot["count"] == 1
+    assert snapshot["by_membership_type"] == {"premium": 1}
+
+
+def test_visit_crossing_midnight_counts_on_its_check_in_hour():
+    tracker = OccupancyTracker()
+    tracker.check_in("M1", at("2024-03-08T23:30:00"), "basic")
+    tracker.check_out("M1")
+
+    snapshot = tracker.snapshot(at("2024-03-09T00:45:00"))
+    assert cells(snapshot["heatmap"]) == {(4, 23): 1}
+    assert snapshot["count"] == 0
+    assert snapshot["by_membership_type"] == {}
+
+
+def test_week_boundary_buckets_expire_from_the_right_day():
+    tracker = OccupancyTracker(window_weeks=1)
+    # Monday's check-in arrives first; Sunday night's is a late upload
+    tracker.check_in("M1", at("2024-03-11T00:05:00"), "basic")
+    tracker.check_in("M2", at("2024-03-10T23:50:00"), "basic")
+    assert cells(tracker.snapshot(at("2024-03-11T00:10:00"))["heatmap"]) == {(0, 0): 1, (6, 23): 1}
+
+    assert cells(tracker.snapshot(at("2024-03-17T23:00:00"))["heatmap"]) == {(0, 0): 1}
+    assert cells(tracker.snapshot(at("2024-03-18T00:00:00"))["heatmap"]) == {}
+    assert min(map(min, tracker.heatmap)) == 0
+
+
+def test_check_out_after_midnight(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = GymAttendanceManager("Test Gym")
+    try:
+        manager.register_member("M1", "Member M1", "basic", "555", "m@example.com")
+        manager.check_in_many([("M1", "2024-03-10T23:30:00")])
+        assert manager.check_out_many([("M1", "2024-03-11T00:45:00")]) == {"applied": 1, "errors": []}
+
+        assert [(record["date"], record["duration"]) for record in manager.log] == [("2024-03-10", 1.25)]
+        assert manager.log.member_visits("M1", "2024-03") == 1
+        assert manager.occupancy_snapshot()["count"] == 0
+    finally:
+        manager.registry.close()
+        manager.close()
@@ -0,0 +1,123 @@
+import asyncio
+import datetime
+import smtplib
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from reminder_outbox import (DebugSmtpServer, ReminderDispatcher, ReminderOutbox,  # noqa: E402
+                             SmtpSender)
+from storage import SqliteStore  # noqa: E402
+
+
+@pytest.fixture
+def smtp_server():
+    server = DebugSmtpServer()
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(server.start(port=0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server, listener.sockets[0].getsockname()[1]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    listener.close()
+    loop.run_until_complete(listener.wait_closed())
+    loop.close()
+
+
+class FlakySender(SmtpSender):
+    """Drops the connection on the first attempt for some members"""
+
+    def __init__(self, port, fail_once):
+        super().__init__("127.0.0.1", port)
+        self.fail_once = set(fail_once)
+        self.attempts = []
+
+    def send(self, message):
+        self.attempts.append(message["member_id"])
+        if message["member_id"] in self.fail_once:
+            self.fail_once.discard(message["member_id"])
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        super().send(message)
+
+
+def test_each_member_gets_exactly_one_reminder(tmp_path, smtp_server):
+    server, port = smtp_server
+    outbox = ReminderOutbox(tmp_path / "outbox.db")
+    try:
+        members = [f"M{number}" for number in range(6)]
+        for _ in range(2):
+            queued = [outbox.enqueue(member_id, "2024-03-01T00:00:00", f"{member_id}@example.com",
+                                     f"Payment due for {member_id}", "Please pay")
+                      for member_id in members]
+        # The second run found every (member, due date) already queued
+        assert queued == [False] * len(members)
+
+        sender = FlakySender(port, fail_once=["M2"])
+        dispatcher = ReminderDispatcher(outbox, sender, workers=3, per_second=20, backoff=0.5)
+        started = time.monotonic()
+        assert dispatcher.dispatch() == {"sent": 5, "retrying": 1, "failed": 0}
+        # Six sends spaced 1/20 s apart
+        assert time.monotonic() - started >= 5 / 20
+
+        # Backing off: the failed message isn't due again straight away
+        assert dispatcher.dispatch() == {"sent": 0, "retrying": 0, "failed": 0}
+        time.sleep(0.6)
+        assert dispatcher.dispatch() == {"sent": 1, "retrying": 0, "failed": 0}
+        assert dispatcher.dispatch() == {"sent": 0, "retrying": 0, "failed": 0}
+        assert outbox.counts() == {"sent": 6}
+    finally:
+        outbox.close()
+
+    assert sorted(sender.attempts) == sorted(members + ["M2"])
+    assert sorted(message["To"] for message in server.messages) == [
+        f"{member_id}@example.com" for member_id in members]
+
+
+def test_delivered_messages_are_pruned_after_their_due_date(tmp_path):
+    outbox = ReminderOutbox(tmp_path / "outbox.db", retention_days=30)
+    try:
+        sent_at = datetime.datetime(2024, 1, 1)
+        for member_id, due_date in (("M1", "2024-01-04T00:00:00"), ("M2", "2024-06-01T00:00:00")):
+            outbox.enqueue(member_id, due_date, f"{member_id}@example.com", "Due", "Pay", sent_at)
+        outbox.enqueue("M3", "2024-01-04T00:00:00", "M3@example.com", "Due", "Pay", sent_at)
+        for message in outbox.claim(now=sent_at):
+            if message["member_id"] != "M3":
+                outbox.mark_sent(message["id"], sent_at)
+
+        assert outbox.prune(datetime.datetime(2024, 1, 20)) == 0
+        # M2's due date is still ahead and M3 was never delivered
+        assert outbox.prune(datetime.datetime(2024, 3, 1)) == 1
+        assert outbox.counts() == {"sent": 1, "sending": 1}
+        assert not outbox.enqueue("M2", "2024-06-01T00:00:00", "M2@example.com", "Due", "Pay")
+    finally:
+        outbox.close()
+
+
+def test_sqlite_reminder_log_drops_old_rows(tmp_path):
+    store = SqliteStore(tmp_path / "gym_data.db")
+    try:
+        reminders = store.reminder_log()
+        now = datetime.datetime.now()
+        for days_ago in (800, 400, 10):
+            store.conn.execute(
+                "INSERT INTO reminders (member_id, reminder_date, days_before_due, method) "
+                "VALUES (?, ?, 3, 'email')", ("M1", (now - datetime.timedelta(days=days_ago)).isoformat()))
+        reminders.append({"member_id": "M2", "reminder_date": now.isoformat(),
+                          "days_before_due": 3, "method": "email"})
+        store.conn.commit()
+    finally:
+        store.close()
+
+    conn = sqlite3.connect(str(tmp_path / "gym_data.db"))
+    try:
+        kept = conn.execute("SELECT member_id FROM reminders ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    assert kept == [("M1",), ("M2",)]
@@ -0,0 +1,106 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from fee_manager import GymFeeManager  # noqa: E402
+
+PAYMENTS = [
+    ("M1", 50.0, "2024-03-01T00:00:00", "Card"),
+    ("M2", 25.5, "2024-03-01T18:30:00", "Cash"),
+    ("M1", 50.0, "2024-03-15T12:00:00", "Card"),
+    ("M3", 19.99, "2024-03-31T23:59:59", "Transfer"),
+    ("M2", 25.5, "2024-04-01T00:00:00", "Cash"),
+    ("M3", 80.0, "2025-01-10T09:00:00", "Card"),
+]
+REFUNDS = [
+    ("M1", 20.0, "2024-03-15T13:00:00", "Card"),
+    ("M2", 25.5, "2024-04-01T08:00:00", "Cash"),
+]
+RANGES = [
+    ("2024-03-01T00:00:00", "2024-03-31T23:59:59"),
+    ("2024-03-01T00:00:01", "2024-03-31T23:59:58"),
+    ("2024-03-01T18:30:00", "2024-04-01T00:00:00"),
+    ("2024-03-15T12:00:00", "2024-03-15T12:00:00"),
+    ("2024-03-02T00:00:00", "2024-03-14T23:59:59"),
+    ("2024-05-01T00:00:00", "2024-12-31T23:59:59"),
+    ("2024-01-01T00:00:00", "2025-12-31T00:00:00"),
+    ("2024-04-01T00:00:00", "2024-03-01T00:00:00"),
+]
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def manager(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = GymFeeManager("Test Gym", storage=request.param)
+    for member_id in ("M1", "M2", "M3"):
+        manager.registry.register(member_id, {"name": f"Member {member_id}",
+                                              "membership_type": "basic"})
+    for member_id, amount, date, method in PAYMENTS:
+        manager.record_payment(member_id, amount, date, method)
+    for member_id, amount, date, method in REFUNDS:
+        manager.record_refund(member_id, amount, date, method)
+    yield manager
+    manager.close()
+    manager.registry.close()
+
+
+def brute_force(payments):
+    """Totals summed straight over the payment records"""
+    methods = {}
+    for payment in payments:
+        methods[payment["payment_method"]] = methods.get(payment["payment_method"], 0) + payment["amount"]
+    return {
+        "payments": sum(1 for payment in payments if payment["amount"] >= 0),
+        "refund_count": sum(1 for payment in payments if payment["amount"] < 0),
+        "gross": round(sum(payment["amount"] for payment in payments if payment["amount"] >= 0), 2),
+        "refunds": round(-sum(payment["amount"] for payment in payments if payment["amount"] < 0), 2),
+        "revenue": round(sum(payment["amount"] for payment in payments), 2),
+        "payment_methods": {method: round(amount, 2) for method, amount in methods.items()
+                            if round(amount, 2)}
+    }
+
+
+def rollup_totals(manager, start_date, end_date):
+    totals = manager.payment_totals(start_date, end_date)
+    assert (totals["start_date"], totals["end_date"]) == (start_date, end_date)
+    return {key: value for key, value in totals.items() if key not in ("start_date", "end_date")}
+
+
+@pytest.mark.parametrize("start_date,end_date", RANGES)
+def test_rollup_matches_brute_force(manager, start_date, end_date):
+    expected = brute_force(manager.payments.between(start_date, end_date))
+    assert rollup_totals(manager, start_date, end_date) == expected
+
+
+def test_range_without_payments(manager):
+    totals = rollup_totals(manager, "2024-06-01T00:00:00", "2024-06-30T23:59:59")
+    assert totals == {"payments": 0, "refund_count": 0, "gross": 0, "refunds": 0,
+                      "revenue": 0, "payment_methods": {}}
+
+
+def test_refunds_net_out_of_their_method(manager):
+    totals = rollup_totals(manager, "2024-03-15T00:00:00", "2024-04-01T23:59:59")
+    assert totals["refund_count"] == 2
+    assert totals["refunds"] == 45.5
+    assert totals["payment_methods"] == {"Card": 30.0, "Transfer": 19.99}
+
+
+def test_payments_added_after_the_rollup_was_built(manager):
+    whole = ("2024-01-01T00:00:00", "2025-12-31T23:59:59")
+    rollup_totals(manager, *whole)
+    manager.record_payment("M1", 12.5, "2024-03-01T00:00:00", "Cash")
+    manager.record_payment("M2", 30.0, "2025-06-01T12:00:00", "Card")
+    manager.record_refund("M3", 5.0, "2024-03-31T23:59:59", "Transfer")
+
+    for start_date, end_date in RANGES + [whole]:
+        expected = brute_force(manager.payments.between(start_date, end_date))
+        assert rollup_totals(manager, start_date, end_date) == expected
+
+
+def test_report_prints_rollup_and_returns_payments(manager, capsys):
+    payments = manager.generate_payment_report("2024-03-01T00:00:00", "2024-03-31T23:59:59")
+    assert payments == manager.payments.between("2024-03-01T00:00:00", "2024-03-31T23:59:59")
+    assert "Total Revenue: $125.49" in capsys.readouterr().out
@@ -0,0 +1,219 @@
+import json
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+
+from fee_manager import GymFeeManager  # noqa: E402
+from migrate_to_sqlite import migrate  # noqa: E402
+from settlement_import import SettlementImporter  # noqa: E402
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return request.param
+
+
+def open_manager(storage):
+    manager = GymFeeManager("Test Gym", storage=storage)
+    for number in range(5):
+        if f"M{number}" not in manager.members:
+            manager.registry.register(f"M{number}", {"name": f"Member {number}",
+                                                     "membership_type": "basic"})
+    return manager
+
+
+def write_settlement(path, first, last):
+    with open(path, "a") as f:
+        if f.tell() == 0:
+            f.write("transaction_id,member_id,amount,payment_date,payment_method,type\n")
+        for number in range(first, last):
+            f.write(f"T{number},M{number % 5},25.0,2024-03-01T10:00:00,Card,payment\n")
+
+
+def test_reimport_skips_imported_transactions(storage):
+    write_settlement("settlement.csv", 0, 25)
+    manager = open_manager(storage)
+    try:
+        first = SettlementImporter(manager, chunk_size=10).import_file("settlement.csv")
+        again = SettlementImporter(manager, chunk_size=10).import_file("settlement.csv")
+
+        # The same rows under another file name are caught by their transaction ids
+        write_settlement("copy.csv", 20, 30)
+        copy = SettlementImporter(manager, chunk_size=10).import_file("copy.csv")
+        payments = len(manager.payments)
+    finally:
+        manager.close()
+
+    assert (first["imported"], first["duplicates"]) == (25, 0)
+    assert again["imported"] == 0
+    assert (copy["imported"], copy["duplicates"]) == (5, 5)
+    assert payments == 30
+
+
+def test_interrupted_import_resumes_after_last_committed_chunk(storage, monkeypatch):
+    write_settlement("settlement.csv", 0, 35)
+    manager = open_manager(storage)
+    chunks = []
+    original = SettlementImporter._import_chunk
+
+    def crash_on_third_chunk(self, *args):
+        if len(chunks) == 2:
+            raise KeyboardInterrupt
+        chunks.append(args[-2])
+        original(self, *args)
+
+    monkeypatch.setattr(SettlementImporter, "_import_chunk", crash_on_third_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        SettlementImporter(manager, chunk_size=10).import_file("settlement.csv")
+    manager.close()
+    monkeypatch.setattr(SettlementImporter, "_import_chunk", original)
+
+    # More rows arrive before the import is run again
+    write_settlement("settlement.csv", 35, 40)
+    manager = open_manager(storage)
+    try:
+        resumed = SettlementImporter(manager, chunk_size=10).import_file("settlement.csv")
+        payments = len(manager.payments)
+    finally:
+        manager.close()
+
+    assert resumed["imported"] == 20
+    assert payments == 40
+
+
+def test_json_store_appends_chunks_to_one_pages_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_settlement("settlement.csv", 0, 25)
+    manager = open_manager("json")
+    try:
+        SettlementImporter(manager, chunk_size=10).import_file("settlement.csv")
+    finally:
+        manager.close()
+
+    data = json.loads(Path("gym_fee_data.json").read_text())
+    assert data["payments"]["rows"] == data["settlement_ids"]["rows"] == 25
+    assert "transactions" not in data["settlements"]
+    assert sorted(path.name for path in tmp_path.glob("*.pages")) == [
+        data["payments"]["pages"], data["settlement_ids"]["pages"]]
+
+    manager = open_manager("json")
+    try:
+        again = SettlementImporter(manager, chunk_size=10).import_file("settlement.csv")
+        write_settlement("copy.csv", 0, 25)
+        copy = SettlementImporter(manager, chunk_size=10).import_file("copy.csv")
+    finally:
+        manager.close()
+    assert again["imported"] == copy["imported"] == 0
+    assert copy["duplicates"] == 25
+
+
+def test_ids_from_older_data_files_still_count_as_imported(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path("gym_fee_data.json").write_text(json.dumps({
+        "fees": {}, "payments": [],
+        "settlements": {"transactions": ["T0", "T1", "T2"], "checkpoints": {}}
+    }))
+    write_settlement("settlement.csv", 0, 5)
+    manager = open_manager("json")
+    try:
+        summary = SettlementImporter(manager, chunk_size=10).import_file("settlement.csv")
+    finally:
+        manager.close()
+
+    assert (summary["imported"], summary["duplicates"]) == (2, 3)
+    data = json.loads(Path("gym_fee_data.json").read_text())
+    assert data["settlement_ids"]["rows"] == 5
+
+
+def test_migrated_database_keeps_settlement_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_settlement("settlement.csv", 0, 25)
+    manager = open_manager("json")
+    try:
+        SettlementImporter(manager, chunk_size=10).import_file("settlement.csv")
+    finally:
+        manager.close()
+    assert migrate()
+
+    write_settlement("settlement.csv", 25, 30)
+    write_settlement("copy.csv", 0, 10)
+    manager = open_manager("sqlite")
+    try:
+        resumed = SettlementImporter(manager, chunk_size=10).import_file("settlement.csv")
+        copy = SettlementImporter(manager, chunk_size=10).import_file("copy.csv")
+        payments = len(manager.payments)
+    finally:
+        manager.close()
+
+    assert resumed["imported"] == 5
+    assert (copy["imported"], copy["duplicates"]) == (0, 10)
+    assert payments == 30
+
+
+def test_failed_sqlite_chunk_is_rolled_back(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_settlement("settlement.csv", 0, 25)
+    manager = open_manager("sqlite")
+    try:
+        importer = SettlementImporter(manager, chunk_size=10)
+        record_chunk = importer.settlements.record_chunk
+        chunks = []
+
+        def fail_on_second_chunk(*args):
+            chunks.append(args)
+            if len(chunks) == 2:
+                raise sqlite3.OperationalError("disk I/O error")
+            record_chunk(*args)
+
+        monkeypatch.setattr(importer.settlements, "record_chunk", fail_on_second_chunk)
+        with pytest.raises(sqlite3.OperationalError):
+            importer.import_file("settlement.csv")
+        # Only the first chunk's payments were committed
+        assert len(manager.payments) == 10
+
+        resumed = SettlementImporter(manager, chunk_size=10).import_file("settlement.csv")
+        payments = len(manager.payments)
+    finally:
+        manager.close()
+
+    assert (resumed["imported"], resumed["duplicates"]) == (15, 0)
+    assert payments == 25
+
+
+IMPORT = f"""
+import sys
+sys.path.insert(0, {str(SCRIPTS)!r})
+from fee_manager import GymFeeManager
+from settlement_import import SettlementImporter
+
+manager = GymFeeManager("Test Gym", storage="sqlite")
+SettlementImporter(manager, chunk_size=50).import_file(sys.argv[1])
+manager.close()
+"""
+
+
+def test_concurrent_sqlite_imports_commit_each_row_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_settlement("settlement.csv", 0, 600)
+    write_settlement("copy.csv", 300, 900)
+    open_manager("sqlite").close()
+
+    workers = [subprocess.Popen([sys.executable, "-c", IMPORT, name], cwd=tmp_path,
+                                stdout=subprocess.DEVNULL)
+               for name in ("settlement.csv", "copy.csv", "settlement.csv")]
+    assert [worker.wait(timeout=120) for worker in workers] == [0, 0, 0]
+
+    conn = sqlite3.connect(str(tmp_path / "gym_data.db"))
+    try:
+        payments = conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+        settled = conn.execute("SELECT COUNT(*) FROM settled_transactions").fetchone()[0]
+    finally:
+        conn.close()
+    assert payments == settled == 900
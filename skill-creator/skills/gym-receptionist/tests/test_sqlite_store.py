@@ -0,0 +1,78 @@
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+
+from attendance_manager import GymAttendanceManager  # noqa: E402
+
+MEMBERS = [f"M{number}" for number in range(10)]
+
+WORKER = f"""
+import sys
+sys.path.insert(0, {str(SCRIPTS)!r})
+from attendance_manager import GymAttendanceManager
+
+manager = GymAttendanceManager("Test Gym", storage="sqlite")
+for _ in range(15):
+    for member_id in {MEMBERS!r}:
+        manager.check_in(member_id)
+        manager.check_out(member_id)
+manager.registry.close()
+manager.close()
+"""
+
+
+def test_two_processes_checking_in_the_same_members(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = GymAttendanceManager("Test Gym", storage="sqlite")
+    for member_id in MEMBERS:
+        manager.register_member(member_id, f"Member {member_id}", "basic", "555", "m@example.com")
+    manager.registry.close()
+    manager.close()
+
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER], cwd=tmp_path,
+                                stdout=subprocess.DEVNULL) for _ in range(2)]
+    assert [worker.wait(timeout=120) for worker in workers] == [0, 0]
+
+    conn = sqlite3.connect(str(tmp_path / "gym_data.db"))
+    try:
+        visits = dict(conn.execute("SELECT member_id, total_visits FROM members"))
+        sessions = dict(conn.execute("SELECT member_id, COUNT(*) FROM attendance GROUP BY member_id"))
+        open_sessions = conn.execute(
+            "SELECT member_id FROM attendance WHERE check_out IS NULL").fetchall()
+        check_ins = conn.execute("SELECT member_id FROM check_ins").fetchall()
+    finally:
+        conn.close()
+
+    assert visits == sessions
+    assert sum(visits.values()) >= 15 * len(MEMBERS)
+    # Every session was closed, by whichever process got to it first
+    assert open_sessions == check_ins == []
+
+
+def test_failed_check_in_is_rolled_back(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = GymAttendanceManager("Test Gym", storage="sqlite")
+    try:
+        manager.register_member("M1", "Member M1", "basic", "555", "m@example.com")
+
+        def fail(visits):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(manager.registry, "count_visits", fail)
+        with pytest.raises(OSError):
+            manager.check_in("M1")
+        monkeypatch.delattr(manager.registry, "count_visits")
+
+        assert len(manager.log) == 0
+        assert manager.check_in("M1")
+        assert manager.members["M1"]["total_visits"] == 1
+        assert len(manager.log) == 1
+    finally:
+        manager.registry.close()
+        manager.close()
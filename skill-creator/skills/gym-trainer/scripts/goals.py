@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Gym Trainer - Goal Evaluation
+Goal progress updated as workouts and measurements arrive, plus a nightly batch over every client.
+"""
+
+import datetime
+
+from lifts import estimated_1rm, exercise_id
+from timeseries import period_key
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Goal types the evaluator understands; anything else is left for the trainer to tick off
+GOAL_KINDS = {
+    "weight": "weight", "weight_loss": "weight", "weight_gain": "weight",
+    "lift": "lift", "strength": "lift", "pr": "lift",
+    "frequency": "frequency", "streak": "frequency", "consistency": "frequency"
+}
+KIND_CODES = {"weight": 0, "lift": 1, "frequency": 2}
+
+
+def goal_kind(goal):
+    return GOAL_KINDS.get(str(goal.get("type", "")).strip().lower().replace(" ", "_"))
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _ordinal(text):
+    """Day ordinal of an ISO date or timestamp, None if it isn't one"""
+    try:
+        return datetime.date.fromisoformat(str(text)[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+def week_of(day):
+    """Ordinal of the Monday starting the week of a day ordinal"""
+    return day - datetime.date.fromordinal(day).weekday()
+
+
+def best_lift(record, goal):
+    """Best weight or estimated 1RM a workout shows for a lift goal's exercise, or None"""
+    exercise = exercise_id(goal.get("exercise", ""))
+    values = [entry["weight"] if goal.get("metric", "weight") == "weight"
+              else estimated_1rm(entry["weight"], entry["reps"])
+              for entry in record.get("sets", ()) if entry["exercise"] == exercise]
+    return max(values) if values else None
+
+
+def observe(history, goal, day):
+    """What the rollups say about a goal on a day: (observed value, workouts that week)"""
+    kind = goal_kind(goal)
+    if kind == "weight":
+        latest = history.latest("measurements")
+        return (latest or {}).get("weight"), 0
+    if kind == "lift":
+        lift = history.totals("workouts").get("lifts", {}).get(exercise_id(goal.get("exercise", "")))
+        if lift is None:
+            return None, 0
+        return lift["max_weight"] if goal.get("metric", "weight") == "weight" else lift["e1rm"], 0
+    week = period_key(datetime.date.fromordinal(day).isoformat(), "week")
+    return None, history.rollup("workouts", "week", week).get("count", 0)
+
+
+def evaluate_goal(goal, observed, week_count, day):
+    """Fold an observation into an active goal's progress
+
+    `observed` is a new weight for weight goals or a lift for lift goals
+    (None when there is nothing new), `week_count` the workouts so far in
+    the week of day ordinal `day`. Frequency goals count consecutive weeks
+    with at least `per_week` workouts; a week that ends short resets the
+    streak. Reaching the target marks the goal completed for good.
+    """
+    kind = goal_kind(goal)
+    target = _number(goal.get("target_value"))
+    if kind is None or target is None or goal.get("completed"):
+        return
+
+    progress = None
+    if kind == "weight":
+        if observed is not None:
+            goal["current_value"] = observed
+            if goal.get("start_value") is None:
+                goal["start_value"] = observed
+        if goal.get("current_value") is not None:
+            span = goal["start_value"] - target
+            progress = 1.0 if span == 0 else (goal["start_value"] - goal["current_value"]) / span
+    elif kind == "lift":
+        current = goal.get("current_value") or 0.0
+        if observed is not None and observed > current:
+            current = observed
+        goal["current_value"] = current
+        progress = current / target if target > 0 else 1.0
+    else:
+        week = week_of(day)
+        streak, last = goal.get("streak", 0), goal.get("last_met")
+        if week_count >= goal.get("per_week", 3) and last != week:
+            streak = streak + 1 if last == week - 7 else 1
+            last = week
+        elif last is not None and last < week - 7:
+            streak = 0
+        goal["streak"], goal["last_met"] = streak, last
+        goal["current_value"] = streak
+        progress = streak / target if target > 0 else 1.0
+
+    if progress is not None:
+        goal["progress"] = round(min(max(progress, 0.0), 1.0), 3)
+        if progress >= 1:
+            goal["completed"] = True
+            goal["completed_date"] = datetime.date.fromordinal(day).isoformat()
+    deadline = _ordinal(goal.get("target_date"))
+    goal["overdue"] = not goal["completed"] and deadline is not None and deadline < day
+
+
+class GoalEvaluator:
+    """Keeps a tracker's goals up to date from each new workout and measurement
+
+    Every record only touches the active goals it can move: a weight goal
+    takes the new weight, a lift goal the record's best set for its
+    exercise, a frequency goal the workout count of the record's week. New
+    goals are seeded from the series rollups, so history is never rescanned.
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        tracker.subscribe(self.on_record)
+
+    def start(self, goal, day=None):
+        """Seed a new goal with where the client stands today"""
+        day = day or datetime.date.today().toordinal()
+        observed, week_count = observe(self.tracker.history, goal, day)
+        if goal_kind(goal) == "frequency":
+            goal["week"], goal["week_count"] = week_of(day), week_count
+        evaluate_goal(goal, observed, week_count, day)
+
+    def on_record(self, name, record):
+        day = _ordinal(record["date"])
+        changed = False
+        for goal in self.tracker.data["goals"]:
+            kind = goal_kind(goal)
+            if goal.get("completed") or kind is None:
+                continue
+            before = dict(goal)
+            observed = None
+            if kind == "weight" and name == "measurements":
+                observed = record.get("weight")
+            elif kind == "lift" and name == "workouts":
+                observed = best_lift(record, goal)
+            elif kind == "frequency" and name == "workouts":
+                if goal.get("week") != week_of(day):
+                    goal["week"], goal["week_count"] = week_of(day), 0
+                goal["week_count"] += 1
+            else:
+                continue
+            evaluate_goal(goal, observed, goal.get("week_count", 0), day)
+            changed = changed or goal != before
+        if changed:
+            self.tracker.save_data()
+
+
+def _frequency_state(goal):
+    if goal_kind(goal) != "frequency":
+        return 0, -1
+    last = goal.get("last_met")
+    return goal.get("streak", 0), last if last is not None else -1
+
+
+def evaluate_all(trackers, day=None):
+    """Re-evaluate every active goal of every tracker in one pass; returns the trackers changed
+
+    Every goal is observed from its client's rollups, then the goals of all
+    clients are evaluated together with NumPy when it is installed (evaluate_goal per
+    goal otherwise). This is also what notices streaks broken by a week
+    without workouts and goals whose target date has passed.
+    """
+    day = day or datetime.date.today().toordinal()
+    week = week_of(day)
+    rows = []
+    for tracker in trackers:
+        tracker.history.refresh()
+        for goal in tracker.data["goals"]:
+            if goal_kind(goal) is None or goal.get("completed") or _number(goal.get("target_value")) is None:
+                continue
+            observed, week_count = observe(tracker.history, goal, day)
+            if goal_kind(goal) == "frequency":
+                # The week's count comes from the rollups, so it includes other processes' workouts
+                goal["week"], goal["week_count"] = week, week_count
+            rows.append((tracker, goal, dict(goal), observed, week_count))
+
+    if np is None or not rows:
+        for _, goal, _, observed, week_count in rows:
+            evaluate_goal(goal, observed, week_count, day)
+    else:
+        _evaluate_vectorized([row[1] for row in rows], [row[3] for row in rows],
+                             [row[4] for row in rows], day)
+
+    changed = []
+    for tracker, goal, before, _, _ in rows:
+        if goal != before and tracker not in changed:
+            changed.append(tracker)
+    for tracker in changed:
+        tracker.save_data()
+    return changed
+
+
+def _evaluate_vectorized(goals, observed, week_counts, day):
+    """evaluate_goal over many goals at once; same rules, NumPy arrays"""
+    nan = float("nan")
+    week = week_of(day)
+    kind = np.array([KIND_CODES[goal_kind(goal)] for goal in goals])
+    target = np.array([_number(goal["target_value"]) for goal in goals])
+    start = np.array([nan if goal.get("start_value") is None else goal["start_value"]
+                      for goal in goals], dtype=float)
+    current = np.array([nan if goal.get("current_value") is None else goal["current_value"]
+                        for goal in goals], dtype=float)
+    seen = np.array([nan if value is None else value for value in observed], dtype=float)
+    state = np.array([_frequency_state(goal) for goal in goals], dtype=np.int64).reshape(-1, 2)
+    streak, last = state[:, 0], state[:, 1]
+    counts = np.array(week_counts, dtype=np.int64)
+    per_week = np.array([goal.get("per_week", 3) for goal in goals], dtype=np.int64)
+    deadline = np.array([_ordinal(goal.get("target_date")) or np.iinfo(np.int64).max
+                         for goal in goals], dtype=np.int64)
+
+    weight, lift, frequency = kind == 0, kind == 1, kind == 2
+    has_seen = ~np.isnan(seen)
+
+    # Weight goals take the newest weight; the first one seen is where they started
+    current = np.where(weight & has_seen, seen, current)
+    start = np.where(weight & np.isnan(start), current, start)
+
+    # Lift goals keep the best lift
+    current = np.where(lift & has_seen & ~(seen <= current), seen, current)
+    current = np.where(lift & np.isnan(current), 0.0, current)
+
+    # Frequency goals extend or reset their streak
+    met = frequency & (counts >= per_week) & (last != week)
+    broken = frequency & ~met & (last != -1) & (last < week - 7)
+    streak = np.where(met, np.where(last == week - 7, streak + 1, 1), np.where(broken, 0, streak))
+    last = np.where(met, week, last)
+    current = np.where(frequency, streak, current)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        span = start - target
+        progress = np.where(weight, np.where(span == 0, 1.0, (start - current) / span),
+                            np.where(target > 0, current / target, 1.0))
+    progress = np.where(weight & np.isnan(current), nan, progress)
+    done = progress >= 1
+    overdue = ~done & (deadline < day)
+    rounded = np.round(np.clip(progress, 0.0, 1.0), 3)
+
+    completed_date = datetime.date.fromordinal(day).isoformat()
+    for i, goal in enumerate(goals):
+        if weight[i]:
+            if not np.isnan(current[i]):
+                goal["current_value"] = current[i].item()
+                goal["start_value"] = start[i].item()
+        elif lift[i]:
+            goal["current_value"] = current[i].item()
+        else:
+            goal["streak"] = int(streak[i])
+            goal["current_value"] = int(streak[i])
+            goal["last_met"] = int(last[i]) if last[i] != -1 else None
+        if not np.isnan(progress[i]):
+            goal["progress"] = rounded[i].item()
+        if done[i]:
+            goal["completed"] = True
+            goal["completed_date"] = completed_date
+        goal["overdue"] = bool(overdue[i])
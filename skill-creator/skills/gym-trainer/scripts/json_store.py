@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Gym Trainer - JSON Data Store
+Locked, atomic JSON file saves that merge concurrent writers instead of losing their updates.
+
+A trimmed copy of the JSON store in gym-receptionist's storage.py, since
+skills are installed on their own and can't import from one another. It
+keeps only what the profile/goal files and the series index need: history
+pages, the journal and SQLite backends and transactions are left out.
+Changes to the locking or merge rules belong in both copies.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # no advisory locks (Windows); writes are still atomic renames
+
+_MISSING = object()
+
+
+def atomic_write_json(path, data, **options):
+    """Write JSON to a temporary file renamed over `path`, so readers never see a torn file"""
+    path = Path(path)
+    tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, **options)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+class FileLock:
+    """Advisory fcntl lock on a sidecar file; re-entrant within a process"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def merge_json(base, ours, theirs):
+    """Three-way merge of our data with the file's newer data
+
+    Whatever only one side changed since `base` is kept; dicts merge key by
+    key, and lists neither side shortened merge entry by entry, then keep
+    the entries they appended followed by ours. Where both changed the same
+    value ours wins.
+    """
+    if ours == base:
+        return theirs
+    if theirs == base:
+        return ours
+
+    if isinstance(ours, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = {}
+        for key in list(theirs) + [key for key in ours if key not in theirs]:
+            old = base.get(key, _MISSING)
+            mine = ours.get(key, _MISSING)
+            other = theirs.get(key, _MISSING)
+            if mine is _MISSING:
+                if old is _MISSING or other != old:
+                    merged[key] = other
+            elif other is _MISSING:
+                if old is _MISSING or mine != old:
+                    merged[key] = mine
+            else:
+                merged[key] = merge_json(old, mine, other)
+        return merged
+
+    if isinstance(ours, list) and isinstance(theirs, list) and isinstance(base, list):
+        length = len(base)
+        if len(ours) >= length and len(theirs) >= length:
+            return ([merge_json(old, mine, other) for old, mine, other in zip(base, ours, theirs)]
+                    + theirs[length:] + ours[length:])
+    return ours
+
+
+class JsonFileStore:
+    """JSON data file saved atomically under a lock, with a version counter
+
+    If another process saved since this one last loaded or saved, our data
+    is merged with theirs (merge_json) before writing and `on_merge` is
+    called with the merged data for the owner to adopt.
+    """
+
+    def __init__(self, data_file, on_merge=None):
+        self.data_file = Path(data_file)
+        self.on_merge = on_merge
+        self.lock = FileLock(self.data_file.with_suffix(".lock"))
+        self.version = 0
+        self._base = None
+
+    def _read(self):
+        with open(self.data_file, 'r') as f:
+            data = json.load(f)
+        return data, data.pop("version", 0)
+
+    def _snapshot(self, data):
+        """Deep copy of data as last synced with the file"""
+        return json.loads(json.dumps(data))
+
+    def load(self, default):
+        """Load the data file or fall back to the default structure"""
+        with self.lock:
+            if self.data_file.exists():
+                data, self.version = self._read()
+            else:
+                data = default
+        self._base = self._snapshot(data)
+        return data
+
+    def save(self, data):
+        """Write the data to disk, merging first if another process saved"""
+        with self.lock:
+            if self.data_file.exists():
+                theirs, version = self._read()
+                if version != self.version:
+                    data = merge_json(self._base, data, theirs)
+                    self.version = version
+                    if self.on_merge is not None:
+                        self.on_merge(data)
+            self.version += 1
+            atomic_write_json(self.data_file, dict(data, version=self.version), indent=2)
+        self._base = self._snapshot(data)
+
+    def close(self):
+        self.lock.close()
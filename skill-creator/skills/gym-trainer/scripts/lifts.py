@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Gym Trainer - Lift Records
+Structured exercise sets, estimated one-rep maxes and the muscle groups each lift trains.
+"""
+
+import re
+
+# Muscle groups credited with an exercise's volume; unknown exercises count as "other"
+MUSCLE_GROUPS = {
+    "squat": ("quads", "glutes"),
+    "bodyweight_squat": ("quads", "glutes"),
+    "front_squat": ("quads", "glutes"),
+    "leg_press": ("quads", "glutes"),
+    "lunge": ("quads", "glutes"),
+    "deadlift": ("hamstrings", "glutes", "back"),
+    "romanian_deadlift": ("hamstrings", "glutes"),
+    "leg_curl": ("hamstrings",),
+    "glute_bridge": ("glutes",),
+    "calf_raise": ("calves",),
+    "bench_press": ("chest", "triceps", "shoulders"),
+    "incline_press": ("chest", "shoulders", "triceps"),
+    "push_up": ("chest", "triceps"),
+    "dip": ("chest", "triceps"),
+    "chest_fly": ("chest",),
+    "overhead_press": ("shoulders", "triceps"),
+    "lateral_raise": ("shoulders",),
+    "rear_delt_fly": ("shoulders",),
+    "face_pull": ("shoulders", "back"),
+    "pull_up": ("back", "biceps"),
+    "row": ("back", "biceps"),
+    "dumbbell_row": ("back", "biceps"),
+    "bicep_curl": ("biceps",),
+    "preacher_curl": ("biceps",),
+    "tricep_extension": ("triceps",),
+    "skullcrusher": ("triceps",),
+    "plank": ("core",)
+}
+
+
+def exercise_id(name):
+    """Canonical exercise id: "Bench Press" and "bench-press" both become "bench_press" """
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def make_set(exercise, weight, reps, rpe=None):
+    """A structured set record; weight in kg (0 for bodyweight)"""
+    if reps < 1:
+        raise ValueError(f"A set needs at least one rep, got {reps}")
+    return {
+        "exercise": exercise_id(exercise),
+        "weight": float(weight),
+        "reps": int(reps),
+        "rpe": float(rpe) if rpe is not None else None
+    }
+
+
+def parse_set(text):
+    """Parse "exercise weight reps [rpe]", e.g. "bench press 80 5 8.5" """
+    parts = text.split()
+    numbers = []
+    while parts and len(numbers) < 3 and re.fullmatch(r"\d+(\.\d+)?", parts[-1]):
+        numbers.insert(0, float(parts.pop()))
+    if not parts or len(numbers) < 2:
+        raise ValueError(f"Expected 'exercise weight reps [rpe]', got {text!r}")
+    return make_set(" ".join(parts), *numbers)
+
+
+def estimated_1rm(weight, reps):
+    """Epley estimate of the one-rep max a set shows"""
+    if reps == 1:
+        return weight
+    return round(weight * (1 + reps / 30), 1)
+
+
+def add_sets(bucket, record):
+    """Fold a workout's sets into a rollup bucket
+
+    Keeps per-exercise set, rep and volume totals with the heaviest set and
+    best estimated 1RM (and when they happened), and volume per muscle group.
+    """
+    for entry in record.get("sets", ()):
+        lift = bucket.setdefault("lifts", {}).setdefault(entry["exercise"], {
+            "sets": 0, "reps": 0, "volume": 0,
+            "max_weight": None, "max_weight_reps": None, "max_weight_date": None,
+            "e1rm": None, "e1rm_date": None
+        })
+        volume = entry["weight"] * entry["reps"]
+        lift["sets"] += 1
+        lift["reps"] += entry["reps"]
+        lift["volume"] += volume
+
+        if lift["max_weight"] is None or entry["weight"] > lift["max_weight"] or (
+                entry["weight"] == lift["max_weight"] and entry["reps"] > lift["max_weight_reps"]):
+            lift["max_weight"] = entry["weight"]
+            lift["max_weight_reps"] = entry["reps"]
+            lift["max_weight_date"] = record["date"]
+        e1rm = estimated_1rm(entry["weight"], entry["reps"])
+        if lift["e1rm"] is None or e1rm > lift["e1rm"]:
+            lift["e1rm"] = e1rm
+            lift["e1rm_date"] = record["date"]
+
+        groups = bucket.setdefault("muscle_volume", {})
+        for group in MUSCLE_GROUPS.get(entry["exercise"], ("other",)):
+            groups[group] = groups.get(group, 0) + volume
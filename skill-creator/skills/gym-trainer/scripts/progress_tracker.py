@@ -4,33 +4,75 @@ Gym Trainer - Progress Tracking System
 Tracks workouts, measurements, and progress over time.
 """
 
-import json
 import datetime
 from pathlib import Path
 
+from goals import GoalEvaluator, goal_kind
+from json_store import JsonFileStore
+from lifts import exercise_id, parse_set
+from timeseries import SeriesStore, period_key
+from trends import cohort_trends
+
 class ProgressTracker:
-    def __init__(self, user_id="default"):
+    def __init__(self, user_id="default", directory=".", write_back=False):
         self.user_id = user_id
-        self.data_file = Path(f"gym_progress_{user_id}.json")
+        self.data_file = Path(directory) / f"gym_progress_{user_id}.json"
+        self.store = JsonFileStore(self.data_file, on_merge=self._adopt)
+        # Workouts and measurements live in append-only segments with rollups
+        self.history = SeriesStore(Path(directory) / f"gym_progress_{user_id}")
+        # With write-back, profile and goal changes are saved by flush()
+        self.write_back = write_back
+        self.dirty = False
+        self._subscribers = []
         self.load_data()
+        self.goal_evaluator = GoalEvaluator(self)
 
     def load_data(self):
-        """Load existing progress data or create new structure"""
-        if self.data_file.exists():
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
-        else:
-            self.data = {
-                "user_profile": {},
-                "workouts": [],
-                "measurements": [],
-                "goals": []
-            }
+        """Load profile and goals, moving any inline history into the series store"""
+        self.data = self.store.load({
+            "user_profile": {},
+            "goals": []
+        })
+
+        # Older files kept every workout and measurement in the JSON file
+        legacy = {name: self.data.pop(name) for name in ("workouts", "measurements")
+                  if name in self.data}
+        if legacy:
+            for name, records in legacy.items():
+                # A non-empty series means an earlier move got this far already
+                if not self.history.count(name):
+                    self.history.append_many(name, records)
+            self.save_data()
+
+    def _adopt(self, data):
+        """Take over data merged with another process's save"""
+        self.data = data
 
     def save_data(self):
-        """Save progress data to file"""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        """Save progress data to file, keeping entries other processes saved meanwhile"""
+        if self.write_back:
+            self.dirty = True
+            return
+        self.store.save(self.data)
+
+    def flush(self):
+        """Write profile and goal changes held back by write-back mode"""
+        if self.dirty:
+            self.store.save(self.data)
+            self.dirty = False
+
+    def close(self):
+        self.flush()
+        self.store.close()
+        self.history.close()
+
+    def subscribe(self, callback):
+        """Call callback(series, record) after every workout or measurement"""
+        self._subscribers.append(callback)
+
+    def _notify(self, name, record):
+        for callback in list(self._subscribers):
+            callback(name, record)
 
     def add_profile(self, name, age, weight, height, fitness_level):
         """Add or update user profile"""
@@ -45,16 +87,18 @@ class ProgressTracker:
         self.save_data()
         print("Profile updated successfully!")
 
-    def add_workout(self, workout_type, exercises, notes=""):
-        """Add a completed workout"""
+    def add_workout(self, workout_type, exercises, notes="", sets=()):
+        """Add a completed workout; `sets` are structured sets from lifts.make_set"""
         workout = {
             "date": datetime.datetime.now().isoformat(),
             "type": workout_type,
             "exercises": exercises,
             "notes": notes
         }
-        self.data["workouts"].append(workout)
-        self.save_data()
+        if sets:
+            workout["sets"] = list(sets)
+        self.history.append("workouts", workout)
+        self._notify("workouts", workout)
         print("Workout logged successfully!")
 
     def add_measurement(self, weight, body_fat=None, chest=None, waist=None, arms=None, legs=None):
@@ -68,12 +112,17 @@ class ProgressTracker:
             "arms": arms,
             "legs": legs
         }
-        self.data["measurements"].append(measurement)
-        self.save_data()
+        self.history.append("measurements", measurement)
+        self._notify("measurements", measurement)
         print("Measurement recorded successfully!")
 
-    def add_goal(self, goal_type, target_value, target_date, description=""):
-        """Add a fitness goal"""
+    def add_goal(self, goal_type, target_value, target_date, description="", **details):
+        """Add a fitness goal
+
+        Weight, lift and frequency goals are tracked automatically; lift goals
+        take `exercise` (and `metric="e1rm"` to target an estimated 1RM),
+        frequency goals `per_week` workouts to keep up for target_value weeks.
+        """
         goal = {
             "type": goal_type,
             "target_value": target_value,
@@ -82,16 +131,36 @@ class ProgressTracker:
             "start_date": datetime.datetime.now().isoformat(),
             "completed": False
         }
+        goal.update(details)
+        self.goal_evaluator.start(goal)
         self.data["goals"].append(goal)
         self.save_data()
         print("Goal added successfully!")
 
+    def summary(self):
+        """Progress summary as a dict, read from the rollups rather than the history"""
+        self.history.refresh()
+        summary = {
+            "user_id": self.user_id,
+            "profile": self.data["user_profile"],
+            "latest_measurement": self.history.latest("measurements"),
+            "weight_change": None,
+            "workouts": self.history.totals("workouts"),
+            "goals": self.data["goals"]
+        }
+        latest = summary["latest_measurement"]
+        if latest and self.history.count("measurements") > 1:
+            first = self.history.first("measurements")
+            summary["weight_change"] = latest['weight'] - first['weight']
+        return summary
+
     def get_progress_summary(self):
         """Get a summary of progress"""
-        profile = self.data["user_profile"]
-        measurements = self.data["measurements"]
-        workouts = self.data["workouts"]
-        goals = self.data["goals"]
+        summary = self.summary()
+        profile = summary["profile"]
+        latest = summary["latest_measurement"]
+        workouts = summary["workouts"]
+        goals = summary["goals"]
 
         print("\n" + "="*50)
         print("PROGRESS SUMMARY")
@@ -102,8 +171,7 @@ class ProgressTracker:
             print(f"Fitness Level: {profile['fitness_level']}")
             print(f"Height: {profile['height']}cm")
 
-        if measurements:
-            latest = measurements[-1]
+        if latest:
             print(f"\nLatest Measurements:")
             print(f"Weight: {latest['weight']}kg")
             if latest.get('body_fat'):
@@ -113,31 +181,110 @@ class ProgressTracker:
             if latest.get('waist'):
                 print(f"Waist: {latest['waist']}cm")
 
-            if len(measurements) > 1:
-                first = measurements[0]
-                weight_change = latest['weight'] - first['weight']
+            weight_change = summary["weight_change"]
+            if weight_change is not None:
                 print(f"\nWeight Change: {'+' if weight_change > 0 else ''}{weight_change:.1f}kg")
 
         print(f"\nWorkout Statistics:")
-        print(f"Total Workouts: {len(workouts)}")
-        if workouts:
-            # Count workout types
-            types = {}
-            for w in workouts:
-                types[w['type']] = types.get(w['type'], 0) + 1
+        print(f"Total Workouts: {workouts.get('count', 0)}")
+        for workout_type, count in workouts.get("types", {}).items():
+            print(f"  {workout_type}: {count}")
 
-            for workout_type, count in types.items():
-                print(f"  {workout_type}: {count}")
+        if workouts.get("lifts"):
+            print(f"\nPersonal Records:")
+            for exercise, lift in sorted(workouts["lifts"].items()):
+                print(f"  {exercise}: {lift['max_weight']}kg x {lift['max_weight_reps']} "
+                      f"(est. 1RM {lift['e1rm']}kg)")
 
         if goals:
             print(f"\nGoals:")
             for i, goal in enumerate(goals, 1):
                 status = "✓ Completed" if goal['completed'] else "✗ Active"
+                if not goal['completed'] and goal.get('progress') is not None:
+                    status += f", {goal['progress']:.0%}"
                 print(f"  {i}. {goal['type']}: {goal['target_value']} ({status})")
 
+    def personal_record(self, exercise):
+        """Heaviest set and best estimated 1RM for an exercise, or None if never done"""
+        self.history.refresh()
+        return self.history.totals("workouts").get("lifts", {}).get(exercise_id(exercise))
+
+    def weekly_volume(self, date=None):
+        """Volume (kg x reps) per muscle group in the week of `date`, this week by default"""
+        self.history.refresh()
+        date = date or datetime.datetime.now().isoformat()
+        week = self.history.rollup("workouts", "week", period_key(date, "week"))
+        return week.get("muscle_volume", {})
+
+    def weight_target(self):
+        """Target of the first active weight goal, or None"""
+        for goal in self.data["goals"]:
+            if goal_kind(goal) == "weight" and not goal["completed"]:
+                return goal["target_value"]
+        return None
+
+    def trend_inputs(self):
+        """Measurement history and weight target, as trends.cohort_trends takes them"""
+        self.history.refresh()
+        return list(self.history.records("measurements")), self.weight_target()
+
+    def get_measurement_trends(self, **options):
+        """Rolling, linear and EWMA weight trends with the projected goal date"""
+        records, target = self.trend_inputs()
+        return cohort_trends([records], [target], **options)[0]
+
+    def print_measurement_trends(self):
+        """Print the weight trend and body-fat change"""
+        trends = self.get_measurement_trends()
+        print("\nMEASUREMENT TRENDS:")
+        print("-" * 40)
+        if not trends["measurements"]:
+            print("No measurements recorded yet.")
+            return
+
+        print(f"Weight: {trends['weight']}kg (7-day average {trends['rolling_weight']}kg, "
+              f"smoothed {trends['ewma_weight']}kg)")
+        if trends["trend_per_week"] is not None:
+            change = trends["trend_per_week"]
+            print(f"Trend: {'+' if change > 0 else ''}{change}kg/week")
+        if trends["target_weight"] is not None:
+            projected = trends["projected_date"] or "not on the current trend"
+            print(f"Target {trends['target_weight']}kg: {projected}")
+        if trends["body_fat_change"] is not None:
+            change = trends["body_fat_change"]
+            print(f"Body Fat: {trends['body_fat']}% ({'+' if change > 0 else ''}{change} since first)")
+
+    def get_trends(self, period="month"):
+        """Weight and workout rollups per "week" or "month", oldest first"""
+        self.history.refresh()
+        weights = self.history.rollups("measurements", period)
+        workouts = self.history.rollups("workouts", period)
+        return {key: {"measurements": weights.get(key, {}), "workouts": workouts.get(key, {})}
+                for key in sorted(set(weights) | set(workouts))}
+
+    def print_trends(self, period="month", limit=12):
+        """Print the most recent weekly or monthly rollups"""
+        trends = list(self.get_trends(period).items())[-limit:]
+        print(f"\n{period.upper()}LY TRENDS (Last {len(trends)}):")
+        print("-" * 40)
+
+        for key, trend in trends:
+            weights = trend["measurements"]
+            line = f"{key}: {trend['workouts'].get('count', 0)} workouts"
+            if "weight_mean" in weights:
+                line += (f", weight {weights['weight_mean']}kg "
+                         f"({weights['weight_min']}-{weights['weight_max']})")
+            print(line)
+            for workout_type, count in trend["workouts"].get("types", {}).items():
+                print(f"   • {workout_type}: {count}")
+            volume = trend["workouts"].get("muscle_volume", {})
+            if volume:
+                print("   Volume: " + ", ".join(f"{group} {kg:g}kg" for group, kg in sorted(volume.items())))
+
     def print_workout_log(self, limit=10):
         """Print recent workout log"""
-        workouts = self.data["workouts"][-limit:]
+        self.history.refresh()
+        workouts = self.history.tail("workouts", limit)
         print(f"\nRECENT WORKOUTS (Last {len(workouts)}):")
         print("-" * 40)
 
@@ -148,6 +295,9 @@ class ProgressTracker:
                 print(f"   Notes: {workout['notes']}")
             for exercise in workout['exercises']:
                 print(f"   • {exercise}")
+            for entry in workout.get('sets', ()):
+                rpe = f" @ RPE {entry['rpe']}" if entry['rpe'] is not None else ""
+                print(f"   - {entry['exercise']}: {entry['weight']}kg x {entry['reps']}{rpe}")
 
 if __name__ == "__main__":
     tracker = ProgressTracker()
@@ -162,9 +312,11 @@ if __name__ == "__main__":
         print("4. Add Goal")
         print("5. View Progress Summary")
         print("6. View Workout Log")
-        print("7. Exit")
+        print("7. View Trends")
+        print("8. View Measurement Trends")
+        print("9. Exit")
 
-        choice = input("\nEnter your choice (1-7): ")
+        choice = input("\nEnter your choice (1-9): ")
 
         if choice == '1':
             name = input("Name: ")
@@ -179,7 +331,17 @@ if __name__ == "__main__":
             exercises = input("Exercises (comma-separated): ").split(',')
             exercises = [e.strip() for e in exercises]
             notes = input("Notes (optional): ")
-            tracker.add_workout(workout_type, exercises, notes)
+            sets = []
+            print("Sets as 'exercise weight reps [rpe]', blank line to finish:")
+            while True:
+                line = input("  Set: ").strip()
+                if not line:
+                    break
+                try:
+                    sets.append(parse_set(line))
+                except ValueError as e:
+                    print(f"  {e}")
+            tracker.add_workout(workout_type, exercises, notes, sets)
 
         elif choice == '3':
             weight = float(input("Weight (kg): "))
@@ -203,7 +365,12 @@ if __name__ == "__main__":
             target = input("Target Value: ")
             date = input("Target Date (YYYY-MM-DD): ")
             desc = input("Description: ")
-            tracker.add_goal(goal_type, target, date, desc)
+            details = {}
+            if goal_kind({"type": goal_type}) == "lift":
+                details["exercise"] = input("Exercise: ")
+            elif goal_kind({"type": goal_type}) == "frequency":
+                details["per_week"] = int(input("Workouts per week: "))
+            tracker.add_goal(goal_type, target, date, desc, **details)
 
         elif choice == '5':
             tracker.get_progress_summary()
@@ -213,6 +380,13 @@ if __name__ == "__main__":
             tracker.print_workout_log(limit)
 
         elif choice == '7':
+            period = input("Period (week/month): ").strip() or "month"
+            tracker.print_trends(period if period in ("week", "month") else "month")
+
+        elif choice == '8':
+            tracker.print_measurement_trends()
+
+        elif choice == '9':
             print("Thanks for using Gym Progress Tracker!")
             break
 
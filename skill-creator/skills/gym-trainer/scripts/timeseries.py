@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Gym Trainer - Time-Series Store
+Append-only segment files of workouts and measurements, with weekly and monthly rollups.
+"""
+
+import datetime
+import json
+import os
+from pathlib import Path
+
+from json_store import FileLock, atomic_write_json
+from lifts import add_sets
+
+PERIODS = ("week", "month")
+
+
+def period_key(date, period):
+    """Rollup bucket of an ISO timestamp: "2024-W07" for weeks, "2024-02" for months"""
+    day = datetime.datetime.fromisoformat(date)
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day.strftime("%Y-%m")
+
+
+def add_measurement(bucket, record):
+    """Fold a measurement into a rollup bucket: count and weight sum/min/max"""
+    bucket["count"] = bucket.get("count", 0) + 1
+    weight = record.get("weight")
+    if weight is None:
+        return
+    bucket["weighed"] = bucket.get("weighed", 0) + 1
+    bucket["weight_sum"] = bucket.get("weight_sum", 0) + weight
+    bucket["weight_min"] = min(bucket.get("weight_min", weight), weight)
+    bucket["weight_max"] = max(bucket.get("weight_max", weight), weight)
+
+
+def add_workout(bucket, record):
+    """Fold a workout into a rollup bucket: count overall and per workout type, plus its sets"""
+    bucket["count"] = bucket.get("count", 0) + 1
+    types = bucket.setdefault("types", {})
+    types[record["type"]] = types.get(record["type"], 0) + 1
+    add_sets(bucket, record)
+
+
+# How each series is rolled up
+ROLLUPS = {"measurements": add_measurement, "workouts": add_workout}
+
+
+def rollup_summary(bucket):
+    """Readable copy of a rollup bucket, with the mean weight worked out"""
+    summary = {key: value for key, value in bucket.items() if key not in ("weighed", "weight_sum")}
+    if bucket.get("weighed"):
+        summary["weight_mean"] = round(bucket["weight_sum"] / bucket["weighed"], 2)
+    return summary
+
+
+class SeriesStore:
+    """One user's workout and measurement history in a directory of segment files
+
+    Each series is a run of JSON-lines segments; records are only ever
+    appended, and a new segment is started every `segment_records` records.
+    `index.json` lists the segments with their committed sizes and keeps
+    the first and latest record and the weekly, monthly and all-time
+    rollups, so summaries never read the segments. A write that crashed
+    before the index was updated is cut off on the next append.
+    """
+
+    def __init__(self, directory, segment_records=1000):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_records = segment_records
+        self.index_file = self.directory / "index.json"
+        self.lock = FileLock(self.directory / "index.lock")
+        self._synced = None
+        with self.lock:
+            self._load_index()
+
+    def _identity(self):
+        try:
+            stat = os.stat(self.index_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load_index(self):
+        if self.index_file.exists():
+            with open(self.index_file, 'r') as f:
+                self.index = json.load(f)
+        else:
+            self.index = {"series": {}}
+        self._synced = self._identity()
+
+    def _series(self, name):
+        return self.index["series"].get(name) or {
+            "segments": [], "first": None, "latest": None,
+            "rollups": {"all": {}, "week": {}, "month": {}}
+        }
+
+    def append(self, name, record):
+        """Append one record to a series"""
+        self.append_many(name, [record])
+
+    def append_many(self, name, records):
+        """Append records to a series, with one index write"""
+        if not records:
+            return
+        with self.lock:
+            if self._identity() != self._synced:
+                self._load_index()  # another process appended meanwhile
+            series = self._series(name)
+            lines = [json.dumps(record, separators=(",", ":")) + "\n" for record in records]
+            while lines:
+                segments = series["segments"]
+                if not segments or segments[-1]["count"] >= self.segment_records:
+                    segments.append({"file": f"{name}-{len(segments) + 1:06d}.jsonl",
+                                     "count": 0, "size": 0})
+                segment = segments[-1]
+                batch = lines[:self.segment_records - segment["count"]]
+                lines = lines[len(batch):]
+                segment["size"] = self._write_segment(segment, "".join(batch))
+                segment["count"] += len(batch)
+
+            fold = ROLLUPS.get(name)
+            rollups = series["rollups"]
+            for record in records:
+                if fold is not None:
+                    fold(rollups["all"], record)
+                    for period in PERIODS:
+                        key = period_key(record["date"], period)
+                        fold(rollups[period].setdefault(key, {}), record)
+            if series["first"] is None:
+                series["first"] = records[0]
+            series["latest"] = records[-1]
+
+            self.index["series"][name] = series
+            atomic_write_json(self.index_file, self.index, separators=(",", ":"))
+            self._synced = self._identity()
+
+    def _write_segment(self, segment, text):
+        """Append to a segment after its committed size; returns the new size"""
+        path = self.directory / segment["file"]
+        with open(path, 'r+b' if path.exists() else 'wb') as f:
+            f.seek(segment["size"])
+            f.write(text.encode())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def refresh(self):
+        """Pick up records other processes appended"""
+        with self.lock:
+            if self._identity() != self._synced:
+                self._load_index()
+
+    def count(self, name):
+        return self._series(name)["rollups"]["all"].get("count", 0)
+
+    def first(self, name):
+        return self._series(name)["first"]
+
+    def latest(self, name):
+        return self._series(name)["latest"]
+
+    def totals(self, name):
+        """All-time rollup of a series"""
+        return rollup_summary(self._series(name)["rollups"]["all"])
+
+    def rollups(self, name, period="month"):
+        """{period key: rollup summary}, oldest first, for "week" or "month" buckets"""
+        buckets = self._series(name)["rollups"][period]
+        return {key: rollup_summary(buckets[key]) for key in sorted(buckets)}
+
+    def rollup(self, name, period, key):
+        """Summary of one week or month bucket, e.g. rollup("workouts", "week", "2024-W07")"""
+        return rollup_summary(self._series(name)["rollups"][period].get(key, {}))
+
+    def _read_segment(self, segment):
+        with open(self.directory / segment["file"], 'rb') as f:
+            data = f.read(segment["size"])
+        return [json.loads(line) for line in data.splitlines()]
+
+    def tail(self, name, limit):
+        """The last `limit` records of a series, oldest first, reading only the newest segments"""
+        records = []
+        for segment in reversed(self._series(name)["segments"]):
+            if len(records) >= limit:
+                break
+            records[:0] = self._read_segment(segment)
+        return records[-limit:] if limit else []
+
+    def records(self, name):
+        """Every record of a series, oldest first"""
+        for segment in self._series(name)["segments"]:
+            yield from self._read_segment(segment)
+
+    def close(self):
+        self.lock.close()
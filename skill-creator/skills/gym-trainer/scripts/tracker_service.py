@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Gym Trainer - Tracker Service
+Progress trackers for many clients, sharded on disk and cached in memory.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from goals import evaluate_all
+from progress_tracker import ProgressTracker
+from trends import cohort_trends
+
+
+def shard_dir(root, user_id, depth=2):
+    """Directory of a user's files: `depth` levels named from a hash of the id"""
+    digest = hashlib.sha1(str(user_id).encode()).hexdigest()
+    return Path(root).joinpath(*(digest[2 * level:2 * level + 2] for level in range(depth)))
+
+
+def tracker_cost(tracker):
+    """Rough in-memory size of a tracker: its data and series index as JSON"""
+    return len(json.dumps(tracker.data)) + len(json.dumps(tracker.history.index))
+
+
+class _Entry:
+    """A cached tracker with its pin count and estimated size"""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.pins = 0
+        self.cost = tracker_cost(tracker)
+
+
+class TrackerService:
+    """ProgressTrackers for many users behind a size-bounded LRU cache
+
+    User files live under `root`, sharded two hash levels deep so no
+    directory holds more than a few hundred clients. Trackers are opened in
+    write-back mode: profile and goal changes are saved when a tracker is
+    evicted, on flush() and on close(); workouts and measurements are
+    appended to their series straight away. Trackers in use through
+    `tracker()` are pinned and never evicted. One tracker should only be
+    changed by one thread at a time; batch reads fan out over a thread pool.
+    """
+
+    def __init__(self, root="gym_progress", max_users=256, max_bytes=64 * 1024 * 1024,
+                 workers=8, depth=2, legacy_dir=None):
+        self.root = Path(root)
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.depth = depth
+        self.legacy_dir = Path(legacy_dir) if legacy_dir is not None else None
+        self._cache = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+    def _open(self, user_id):
+        directory = shard_dir(self.root, user_id, self.depth)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._adopt_legacy(user_id, directory)
+        return ProgressTracker(user_id, directory, write_back=True)
+
+    def _adopt_legacy(self, user_id, directory):
+        """Move a user's files from the old one-directory layout into their shard"""
+        if self.legacy_dir is None:
+            return
+        for name in (f"gym_progress_{user_id}.json", f"gym_progress_{user_id}"):
+            source = self.legacy_dir / name
+            if source.exists() and not (directory / name).exists():
+                os.replace(source, directory / name)
+
+    @contextlib.contextmanager
+    def tracker(self, user_id):
+        """Pin a user's tracker, loading it on a cache miss"""
+        entry = self._checkout(user_id)
+        try:
+            yield entry.tracker
+        finally:
+            self._release(entry)
+
+    def _checkout(self, user_id):
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is not None:
+                self._cache.move_to_end(user_id)
+                entry.pins += 1
+                return entry
+
+        # Load without the lock so misses for different users load in parallel
+        tracker = self._open(user_id)
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is None:
+                entry = self._cache[user_id] = _Entry(tracker)
+                self._bytes += entry.cost
+                tracker = None
+            else:
+                self._cache.move_to_end(user_id)
+            entry.pins += 1
+        if tracker is not None:
+            tracker.close()  # another thread loaded the same user first
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.pins -= 1
+            cost = tracker_cost(entry.tracker)
+            self._bytes += cost - entry.cost
+            entry.cost = cost
+            evicted = self._evict()
+        for tracker in evicted:
+            tracker.close()
+
+    def _evict(self):
+        """Drop unpinned trackers, least recently used first, until within bounds"""
+        evicted = []
+        for user_id in list(self._cache):
+            if len(self._cache) <= self.max_users and self._bytes <= self.max_bytes:
+                break
+            entry = self._cache[user_id]
+            if entry.pins:
+                continue
+            del self._cache[user_id]
+            self._bytes -= entry.cost
+            evicted.append(entry.tracker)
+        return evicted
+
+    def _call(self, user_id, method, *args):
+        with self.tracker(user_id) as tracker:
+            return getattr(tracker, method)(*args)
+
+    def map(self, method, user_ids, *args):
+        """Call a tracker method for every user across the thread pool; {user_id: result}"""
+        user_ids = list(user_ids)
+        results = self._pool.map(lambda user_id: self._call(user_id, method, *args), user_ids)
+        return dict(zip(user_ids, results))
+
+    def summaries_for(self, user_ids):
+        """{user_id: progress summary dict} for a dashboard of clients"""
+        return self.map("summary", user_ids)
+
+    def trends_for(self, user_ids, period="month"):
+        """{user_id: weekly or monthly trends}"""
+        return self.map("get_trends", user_ids, period)
+
+    def trend_report(self, user_ids, **options):
+        """{user_id: measurement trends}; histories load over the pool, trends compute in one batch"""
+        inputs = self.map("trend_inputs", user_ids)
+        reports = cohort_trends([records for records, _ in inputs.values()],
+                                [target for _, target in inputs.values()], **options)
+        return dict(zip(inputs, reports))
+
+    def evaluate_goals(self, user_ids, day=None):
+        """Nightly goal re-evaluation; returns the ids of users whose goals changed
+
+        Users are loaded over the thread pool in cache-sized chunks and each
+        chunk's goals are evaluated in one goals.evaluate_all pass. If a user
+        fails to load, the trackers already pinned for the chunk are released.
+        """
+        user_ids = list(user_ids)
+        changed = []
+        for offset in range(0, len(user_ids), max(self.max_users, 1)):
+            futures = [self._pool.submit(self._checkout, user_id)
+                       for user_id in user_ids[offset:offset + self.max_users]]
+            entries = []
+            try:
+                for future in futures:
+                    entries.append(future.result())
+                trackers = [entry.tracker for entry in entries]
+                updated = evaluate_all(trackers, day)
+                for tracker in updated:
+                    tracker.flush()
+                changed.extend(tracker.user_id for tracker in updated)
+            finally:
+                # Checkouts still running after a failure pin their trackers too
+                for future in futures[len(entries):]:
+                    if future.exception() is None:
+                        entries.append(future.result())
+                for entry in entries:
+                    self._release(entry)
+        return changed
+
+    def cached_users(self):
+        with self._lock:
+            return list(self._cache)
+
+    def flush(self):
+        """Save every cached tracker's held-back changes"""
+        with self._lock:
+            trackers = [entry.tracker for entry in self._cache.values()]
+        for tracker in trackers:
+            tracker.flush()
+
+    def close(self):
+        self._pool.shutdown()
+        with self._lock:
+            entries = list(self._cache.values())
+            self._cache.clear()
+            self._bytes = 0
+        for entry in entries:
+            entry.tracker.close()
+
+
+def main():
+    """Print a one-line summary per client: tracker_service.py <root> <user_id>..."""
+    if len(sys.argv) < 3:
+        print("Usage: tracker_service.py <root> <user_id> [<user_id>...]")
+        return
+
+    service = TrackerService(sys.argv[1], legacy_dir=".")
+    try:
+        for user_id, summary in service.summaries_for(sys.argv[2:]).items():
+            latest = summary["latest_measurement"] or {}
+            weight = f"{latest['weight']}kg" if latest.get("weight") is not None else "-"
+            active = sum(1 for goal in summary["goals"] if not goal["completed"])
+            print(f"{user_id}: {summary['workouts'].get('count', 0)} workouts, "
+                  f"weight {weight}, {active} active goals")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Gym Trainer - Measurement Trends
+Rolling averages, linear and EWMA weight trends, projected goal dates and body-fat changes,
+for one client or a whole cohort at once.
+"""
+
+import csv
+import datetime
+import math
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EPOCH = datetime.datetime(1970, 1, 1)
+FIELDS = ("measurements", "weight", "rolling_weight", "ewma_weight", "trend_weight",
+          "trend_per_week", "body_fat", "body_fat_change", "target_weight", "projected_date")
+
+
+def _day(date):
+    """Days since 1970 of an ISO timestamp, as a float"""
+    return (datetime.datetime.fromisoformat(date) - EPOCH).total_seconds() / 86400
+
+
+def _value(value):
+    return float("nan") if value is None else float(value)
+
+
+def series_rows(records):
+    """(days, weights, body fats) of measurement records, NaN where a value is missing"""
+    return ([_day(record["date"]) for record in records],
+            [_value(record.get("weight")) for record in records],
+            [_value(record.get("body_fat")) for record in records])
+
+
+def _round(value, digits=2):
+    return None if value is None or math.isnan(value) else round(float(value), digits)
+
+
+def _projected(latest_day, fitted, slope, target):
+    """Date the fitted trend reaches the target, None if it is heading away or already there"""
+    if math.isnan(target) or math.isnan(slope) or slope == 0:
+        return None
+    days = (target - fitted) / slope
+    if not days > 0 or days > 3650:
+        return None
+    return (EPOCH + datetime.timedelta(days=latest_day + days)).date().isoformat()
+
+
+def _report(count, weight, rolling, ewma, fitted, slope, body_fat, body_fat_change,
+            target, latest_day):
+    return {
+        "measurements": int(count),
+        "weight": _round(weight),
+        "rolling_weight": _round(rolling),
+        "ewma_weight": _round(ewma),
+        "trend_weight": _round(fitted),
+        "trend_per_week": _round(slope * 7, 3),
+        "body_fat": _round(body_fat),
+        "body_fat_change": _round(body_fat_change),
+        "target_weight": _round(target),
+        "projected_date": None if math.isnan(latest_day) else _projected(latest_day, fitted, slope, target)
+    }
+
+
+def cohort_trends(cohort, targets=None, window=7, fit_days=90, alpha=0.3):
+    """Trend report per client for a list of measurement record lists, oldest record first
+
+    `rolling_weight` averages the last `window` days, `trend_weight` and
+    `trend_per_week` come from a least-squares line over the last
+    `fit_days` (once they span a day or more), `ewma_weight` smooths every weighing with factor `alpha`.
+    `projected_date` is when that line reaches the client's target weight.
+    All clients are computed together as padded NumPy arrays when NumPy is
+    installed; otherwise each client is worked through in plain Python.
+    """
+    targets = [_value(target) for target in (targets or [None] * len(cohort))]
+    if np is None:
+        return [_trends_python(series_rows(records), target, window, fit_days, alpha)
+                for records, target in zip(cohort, targets)]
+    if not cohort:
+        return []
+
+    # One flat parse of every record, scattered into clients x records arrays padded with NaN
+    records = [record for client in cohort for record in client]
+    sizes = np.array([len(client) for client in cohort])
+    filled = np.arange(max(1, sizes.max())) < sizes[:, None]
+    days = np.full(filled.shape, np.nan)
+    weights = np.full(filled.shape, np.nan)
+    fats = np.full(filled.shape, np.nan)
+    moments = np.array([record["date"] for record in records], dtype="datetime64[us]")
+    days[filled] = (moments - np.datetime64(EPOCH, "us")) / np.timedelta64(1, "D")
+    weights[filled] = np.array([record.get("weight") for record in records], dtype=float)
+    fats[filled] = np.array([record.get("body_fat") for record in records], dtype=float)
+    target = np.array(targets)
+    rows, length = filled.shape
+
+    weighed = ~np.isnan(weights)
+    count = weighed.sum(axis=1)
+    has = count > 0
+    index = np.arange(rows)
+    last = length - 1 - np.argmax(weighed[:, ::-1], axis=1)
+    latest_day = np.where(has, days[index, last], np.nan)
+    weight = np.where(has, weights[index, last], np.nan)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Rolling mean over the trailing window
+        recent = weighed & (days > latest_day[:, None] - window)
+        rolling = np.where(recent, weights, 0).sum(axis=1) / recent.sum(axis=1)
+
+        # Least-squares line over the fit window, x measured back from the latest weighing
+        fit = weighed & (days >= latest_day[:, None] - fit_days)
+        x = np.where(fit, days - latest_day[:, None], 0)
+        y = np.where(fit, weights, 0)
+        n = fit.sum(axis=1)
+        sx, sy = x.sum(axis=1), y.sum(axis=1)
+        sxx, sxy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+        denominator = n * sxx - sx * sx
+        spread = np.where(fit, -x, 0).max(axis=1)
+        slope = np.where((denominator > 0) & (spread >= 1), (n * sxy - sx * sy) / denominator, np.nan)
+        fitted = np.where(n > 0, (sy - np.nan_to_num(slope) * sx) / n, np.nan)
+
+    # EWMA steps through the columns, every client at once
+    ewma = np.full(rows, np.nan)
+    for column in range(length):
+        value = weights[:, column]
+        ewma = np.where(np.isnan(value), ewma,
+                        np.where(np.isnan(ewma), value, alpha * value + (1 - alpha) * ewma))
+
+    measured = ~np.isnan(fats)
+    has_fat = measured.any(axis=1)
+    first_fat = fats[index, np.argmax(measured, axis=1)]
+    last_fat = fats[index, length - 1 - np.argmax(measured[:, ::-1], axis=1)]
+    body_fat = np.where(has_fat, last_fat, np.nan)
+    body_fat_change = np.where(has_fat, last_fat - first_fat, np.nan)
+
+    return [_report(count[i], weight[i], rolling[i], ewma[i], fitted[i], slope[i],
+                    body_fat[i], body_fat_change[i], target[i], latest_day[i])
+            for i in range(rows)]
+
+
+def _trends_python(row, target, window, fit_days, alpha):
+    """cohort_trends for one client without NumPy"""
+    nan = float("nan")
+    points = [(day, weight) for day, weight, _ in zip(*row) if not math.isnan(weight)]
+    fats = [fat for fat in row[2] if not math.isnan(fat)]
+    if not points:
+        return _report(0, nan, nan, nan, nan, nan, fats[-1] if fats else nan,
+                       fats[-1] - fats[0] if fats else nan, target, nan)
+
+    latest_day, weight = points[-1]
+    recent = [value for day, value in points if day > latest_day - window]
+    fit = [(day - latest_day, value) for day, value in points if day >= latest_day - fit_days]
+    n = len(fit)
+    sx, sy = sum(x for x, _ in fit), sum(y for _, y in fit)
+    sxx, sxy = sum(x * x for x, _ in fit), sum(x * y for x, y in fit)
+    denominator = n * sxx - sx * sx
+    spread = -min(x for x, _ in fit)
+    slope = (n * sxy - sx * sy) / denominator if denominator > 0 and spread >= 1 else nan
+    fitted = (sy - (0 if math.isnan(slope) else slope) * sx) / n
+
+    ewma = points[0][1]
+    for _, value in points[1:]:
+        ewma = alpha * value + (1 - alpha) * ewma
+
+    return _report(len(points), weight, sum(recent) / len(recent), ewma, fitted, slope,
+                   fats[-1] if fats else nan, fats[-1] - fats[0] if fats else nan,
+                   target, latest_day)
+
+
+def main():
+    """CSV trend export for a client review: trends.py <root> <user_id>..."""
+    if len(sys.argv) < 3:
+        print("Usage: trends.py <root> <user_id> [<user_id>...]")
+        return
+
+    from tracker_service import TrackerService
+
+    service = TrackerService(sys.argv[1])
+    try:
+        reports = service.trend_report(sys.argv[2:])
+    finally:
+        service.close()
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(("user_id",) + FIELDS)
+    for user_id, report in reports.items():
+        writer.writerow([user_id] + ["" if report[field] is None else report[field]
+                                     for field in FIELDS])
+
+
+if __name__ == "__main__":
+    main()
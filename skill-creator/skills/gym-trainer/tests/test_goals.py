@@ -0,0 +1,100 @@
+import copy
+import datetime
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import goals  # noqa: E402
+from goals import evaluate_all, evaluate_goal, week_of  # noqa: E402
+from lifts import make_set  # noqa: E402
+from progress_tracker import ProgressTracker  # noqa: E402
+
+DAY = datetime.date(2024, 3, 6).toordinal()
+
+
+def random_goal(rng):
+    """A goal part-way through, with the observation a nightly run would make"""
+    kind = rng.choice(["weight_loss", "weight_gain", "lift", "frequency"])
+    goal = {"type": kind, "completed": False}
+    if rng.random() < 0.5:
+        goal["target_date"] = datetime.date.fromordinal(DAY + rng.randint(-10, 10)).isoformat()
+    observed, week_count = None, 0
+    if kind.startswith("weight"):
+        goal["target_value"] = rng.choice([70, 75, 80, 85.5])
+        if rng.random() < 0.8:
+            goal["start_value"] = rng.choice([goal["target_value"], 72, 78, 90])
+            goal["current_value"] = rng.uniform(65, 95)
+        if rng.random() < 0.6:
+            observed = rng.uniform(65, 95)
+    elif kind == "lift":
+        goal["target_value"] = rng.choice([0, 60, 100, 140])
+        goal["current_value"] = rng.choice([None, 0.0, 50, 99.5, 120])
+        if rng.random() < 0.6:
+            observed = rng.uniform(40, 160)
+    else:
+        goal["target_value"] = rng.choice([0, 1, 2, 4])
+        goal["per_week"] = rng.choice([1, 3])
+        last = rng.choice([None, week_of(DAY), week_of(DAY) - 7, week_of(DAY) - 14])
+        goal["last_met"] = last
+        goal["streak"] = 0 if last is None else rng.randint(1, 3)
+        week_count = rng.randint(0, 4)
+    return goal, observed, week_count
+
+
+def test_vectorized_evaluation_matches_evaluate_goal():
+    pytest.importorskip("numpy")
+    rng = random.Random(7)
+    rows = [random_goal(rng) for _ in range(500)]
+    one_by_one = [copy.deepcopy(goal) for goal, _, _ in rows]
+    batch = [copy.deepcopy(goal) for goal, _, _ in rows]
+
+    for goal, (_, observed, week_count) in zip(one_by_one, rows):
+        evaluate_goal(goal, observed, week_count, DAY)
+    goals._evaluate_vectorized(batch, [row[1] for row in rows], [row[2] for row in rows], DAY)
+
+    assert batch == one_by_one
+    assert any(goal["completed"] for goal in batch)
+    assert any(goal["overdue"] for goal in batch)
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_nightly_batch_matches_live_updates(vectorized, tmp_path, monkeypatch, capsys):
+    if vectorized:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(goals, "np", None)
+
+    tracker = ProgressTracker("client", tmp_path)
+    try:
+        tracker.add_measurement(84)
+        tracker.add_goal("weight_loss", 75, "2030-01-01")
+        tracker.add_goal("weight_loss", 80, "2030-01-01")
+        tracker.add_goal("lift", 100, "2030-01-01", exercise="Bench Press")
+        tracker.add_goal("lift", 130, "2030-01-01", exercise="Squat", metric="e1rm")
+        tracker.add_goal("frequency", 2, "2030-01-01", per_week=3)
+        tracker.add_goal("frequency", 1, "2020-01-01", per_week=5)
+        seeded = copy.deepcopy(tracker.data["goals"])
+
+        tracker.add_measurement(81)
+        tracker.add_measurement(79.5)
+        tracker.add_workout("strength", ["Bench Press"], sets=[make_set("Bench Press", 90, 5)])
+        tracker.add_workout("strength", ["Squat"], sets=[make_set("Squat", 110, 3),
+                                                         make_set("Squat", 100, 8)])
+        tracker.add_workout("strength", ["Bench Press"], sets=[make_set("Bench Press", 102.5, 1)])
+        live = copy.deepcopy(tracker.data["goals"])
+
+        tracker.data["goals"] = seeded
+        evaluate_all([tracker])
+        nightly = tracker.data["goals"]
+    finally:
+        tracker.close()
+
+    fields = ("progress", "current_value", "completed", "completed_date", "streak", "overdue")
+    assert [{key: goal.get(key) for key in fields} for goal in nightly] == [
+        {key: goal.get(key) for key in fields} for goal in live]
+    assert [goal["completed"] for goal in nightly] == [False, True, True, False, False, False]
+    assert [goal["overdue"] for goal in nightly] == [False, False, False, False, False, True]
@@ -0,0 +1,85 @@
+import json
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from json_store import JsonFileStore  # noqa: E402
+from progress_tracker import ProgressTracker  # noqa: E402
+
+
+def read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_concurrent_saves_are_merged(tmp_path):
+    path = tmp_path / "data.json"
+    merged = []
+    first = JsonFileStore(path)
+    second = JsonFileStore(path, on_merge=merged.append)
+    ours = first.load({"user_profile": {}, "goals": []})
+    theirs = second.load({"user_profile": {}, "goals": []})
+
+    ours["goals"].append({"type": "weight", "target_value": 75})
+    first.save(ours)
+    theirs["user_profile"] = {"name": "Sam"}
+    theirs["goals"].append({"type": "lift", "target_value": 100})
+    second.save(theirs)
+
+    saved = read(path)
+    assert saved["user_profile"] == {"name": "Sam"}
+    assert [goal["type"] for goal in saved["goals"]] == ["weight", "lift"]
+    assert saved["version"] == 2
+    assert merged and merged[-1]["goals"] == saved["goals"]
+
+    # The first store catches up in turn instead of dropping the second's changes
+    ours["goals"][0]["target_value"] = 72
+    first.save(ours)
+    saved = read(path)
+    assert [goal["target_value"] for goal in saved["goals"]] == [72, 100]
+    assert saved["user_profile"] == {"name": "Sam"}
+    first.close()
+    second.close()
+
+
+def test_saves_from_many_writers_are_all_kept(tmp_path):
+    path = tmp_path / "data.json"
+
+    def writer(number):
+        state = {}
+        store = JsonFileStore(path, on_merge=lambda data: state.update(data=data))
+        state["data"] = store.load({"goals": []})
+        for count in range(10):
+            state["data"]["goals"].append({"writer": number, "count": count})
+            store.save(state["data"])
+        store.close()
+
+    threads = [threading.Thread(target=writer, args=(number,)) for number in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    goals = read(path)["goals"]
+    assert len(goals) == 40
+    for number in range(4):
+        assert [goal["count"] for goal in goals if goal["writer"] == number] == list(range(10))
+
+
+def test_two_trackers_of_one_client_keep_both_goals(tmp_path, capsys):
+    desk = ProgressTracker("client", tmp_path)
+    phone = ProgressTracker("client", tmp_path)
+    desk.add_profile("Sam", 30, 80, 180, "beginner")
+    phone.add_goal("weight_loss", 75, "2030-01-01")
+    desk.add_goal("frequency", 4, "2030-01-01", per_week=3)
+    desk.close()
+    phone.close()
+
+    reloaded = ProgressTracker("client", tmp_path)
+    try:
+        assert reloaded.data["user_profile"]["name"] == "Sam"
+        assert [goal["type"] for goal in reloaded.data["goals"]] == ["weight_loss", "frequency"]
+    finally:
+        reloaded.close()
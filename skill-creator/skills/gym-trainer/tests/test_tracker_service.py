@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from tracker_service import TrackerService  # noqa: E402
+
+
+def test_failed_load_releases_the_rest_of_the_chunk(tmp_path, monkeypatch):
+    service = TrackerService(tmp_path / "clients", max_users=8, workers=4)
+    open_tracker = service._open
+
+    def flaky_open(user_id):
+        if user_id == "broken":
+            raise OSError("unreadable profile")
+        return open_tracker(user_id)
+
+    monkeypatch.setattr(service, "_open", flaky_open)
+    try:
+        with pytest.raises(OSError):
+            service.evaluate_goals(["a", "b", "broken", "c", "d"])
+        assert sorted(service.cached_users()) == ["a", "b", "c", "d"]
+        assert [entry.pins for entry in service._cache.values()] == [0, 0, 0, 0]
+
+        assert service.evaluate_goals(["a", "b", "c", "d"]) == []
+    finally:
+        service.close()